@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+""" Startup benchmark
+
+Measures the time from launching the editor to the first paint of its main window, with the offscreen Qt platform so
+it runs without a display:
+    python benchmarks/startup.py --runs 7 --budget 0.4
+
+Every run starts a new interpreter, so the imports are measured as a user launching the editor pays them. The first
+run is not counted, it compiles the .ui files into the cache (see src/ui_cache.py) like the first launch after an
+update does. The median of the runs is compared to the budget, and the script exits with status 1 when it is over it.
+
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+
+# Median launch to first paint time in seconds above which the benchmark fails, loading the plotting stack and parsing
+# the .ui files at startup takes over half a second
+DEFAULT_BUDGET = 0.4
+
+# Launches the editor and prints the times of its startup as JSON once the main window is first painted, then quits
+_CHILD_SCRIPT = '''
+import time
+start = time.perf_counter()
+import json
+import os
+import sys
+sys.path.insert(0, {source_directory!r})
+os.chdir({source_directory!r})
+from PyQt5.QtCore import QEvent, QObject
+from PyQt5.QtWidgets import QApplication
+import app
+imported = time.perf_counter()
+
+
+class FirstPaintFilter(QObject):
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint and not painted:
+            painted.append(time.perf_counter())
+            print(json.dumps({{'import': imported - start, 'first_paint': painted[0] - start}}), flush=True)
+            application.quit()
+        return False
+
+
+painted = []
+application = QApplication(sys.argv)
+paint_filter = FirstPaintFilter()
+application.installEventFilter(paint_filter)
+window = app.CsvEditor()
+application.exec_()
+'''
+
+
+def measure_startup():
+    """
+    Launches the editor once
+    Returns a dictionary of the seconds from the launch to the first paint ('launch'), and from the start of the
+    interpreter to the end of the imports ('import') and to the first paint ('first_paint')
+    """
+    environment = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    script = _CHILD_SCRIPT.format(source_directory=os.path.abspath(SOURCE_DIRECTORY))
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, '-c', script], env=environment, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, universal_newlines=True)
+    try:
+        line = child.stdout.readline()
+        launch = time.perf_counter() - start
+    finally:
+        child.stdout.close()
+        child.wait()
+    if not line:
+        raise RuntimeError('The editor exited with status {} before painting its window'.format(child.returncode))
+    times = json.loads(line)
+    times['launch'] = launch
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the launch time of the editor to its first paint.')
+    parser.add_argument('--runs', type=int, default=5, help='number of measured launches')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='maximum median launch time in seconds, {} by default'.format(DEFAULT_BUDGET))
+    parser.add_argument('--json', help='file to write the measures to')
+    arguments = parser.parse_args(argv)
+
+    # Fills the cache of the compiled .ui files
+    measure_startup()
+    runs = [measure_startup() for _ in range(arguments.runs)]
+    result = {name: statistics.median(run[name] for run in runs) for name in ('launch', 'import', 'first_paint')}
+    result['budget'] = arguments.budget
+    result['runs'] = runs
+
+    print('launch to first paint {:.3f}s (imports {:.3f}s), median of {} runs, budget {:.3f}s'.format(
+        result['launch'], result['import'], arguments.runs, arguments.budget))
+    if arguments.json:
+        with open(arguments.json, 'w') as json_file:
+            json.dump(result, json_file, indent=2)
+
+    if result['launch'] > arguments.budget:
+        print('Over budget by {:.3f}s'.format(result['launch'] - arguments.budget))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+""" Benchmark suite
+
+Times the operations of the editor which depend on the size of the file, on synthetic files (see synthetic.py) with
+the offscreen Qt platform so it runs without a display:
+    python benchmarks/suite.py --shape tall --shape wide --repeat 3 --output results.json
+    python benchmarks/suite.py --rows 1000000 --columns 8 --types int=1,float=1 --quoting all --compare results.json
+
+The measured operations are:
+    parse           CsvLoaderWorker.process_loading_file, the rows being consumed as soon as they are parsed
+    load            opening the file in the editor, until the last row is in the table
+    select_all      selecting the whole table, until cell_selection_changed has updated the state depending on it
+    save            save_file, until the saver thread has replaced the file
+    plot_<type>     plot of the first two numeric columns, including draw_plot and the fit of the smooth curve
+    delete_rows     delete_selection of the first half of the rows
+    delete_columns  delete_selection of the first half of the columns
+    delete_cells    delete_selection of the cells of the first half of the columns in all the rows but the last
+
+Every file is measured by a new process, so its peak resident memory (peak_rss, in bytes) is not mixed with the one
+of the other files. The peak is given after every operation and for the whole run. The results are written as JSON
+with the commit they were measured on, and the results of another run given by --compare are printed next to them.
+
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic
+
+SOURCE_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+# Number of rows and columns of the predefined shapes of files
+SHAPES = {
+    'tall': (200000, 12),
+    'wide': (2000, 400),
+}
+
+DEFAULT_DATA_DIRECTORY = os.path.join(tempfile.gettempdir(), 'gui-csv-editor-benchmarks')
+
+
+def peak_rss():
+    """
+    Returns the peak resident memory of this process in bytes, or None if the platform does not report it
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes by Linux and in bytes by macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def commit_id():
+    """
+    Returns the id of the checked out commit of the repository, or None if it is not known
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=SOURCE_DIRECTORY, universal_newlines=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class EditorBenchmark(object):
+    """
+    Drives an editor window through the measured operations, the dialogs asking the user are answered automatically
+    """
+
+    def __init__(self, csv_file_path, repeat, paged):
+        """
+        :param csv_file_path: path of the file to measure
+        :param repeat: number of times every operation is measured
+        :param paged: whether the file is opened in the paged mode whatever its size
+        """
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        sys.path.insert(0, SOURCE_DIRECTORY)
+        os.chdir(SOURCE_DIRECTORY)
+
+        from PyQt5.QtWidgets import QApplication, QFileDialog, QMessageBox
+        import app
+
+        self.csv_file_path = csv_file_path
+        self.repeat = repeat
+        self.save_path = os.path.join(tempfile.mkdtemp(prefix='gui-csv-editor-benchmark-'), 'saved.csv')
+        self.results = {}
+
+        QFileDialog.getOpenFileName = staticmethod(lambda *args, **kwargs: (self.csv_file_path, ''))
+        QFileDialog.getSaveFileName = staticmethod(lambda *args, **kwargs: (self.save_path, ''))
+        QMessageBox.about = staticmethod(lambda *args, **kwargs: None)
+        # Neither saving before closing the file nor saving in the sorted order
+        QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.No)
+        if paged:
+            app.CsvLoaderWorker.paged_mode_threshold = 0
+
+        self.app = app
+        self.application = QApplication.instance() or QApplication([])
+        self.window = app.CsvEditor()
+        self.window.show()
+
+    def run(self):
+        """
+        Measures all the operations
+        Returns a dictionary of the results of every operation, see measure
+        """
+        try:
+            for _ in range(self.repeat):
+                self.measure('parse', self.parse)
+                self.measure('load', self.load)
+                self.measure('select_all', self.select_all)
+                self.measure('save', self.save)
+                self.measure_plots()
+                self.measure_deletion('delete_rows', self.select_rows)
+                self.measure_deletion('delete_columns', self.select_columns)
+                self.measure_deletion('delete_cells', self.select_cells)
+        finally:
+            os.remove(self.save_path) if os.path.exists(self.save_path) else None
+            os.rmdir(os.path.dirname(self.save_path))
+        return self.results
+
+    def measure(self, name, operation, *args):
+        """
+        Times an operation once, the events it posted are processed before it is timed
+        Its result holds the seconds of every measure ('seconds'), their median ('median'), and the peak resident
+        memory of the process once it has run ('peak_rss')
+        """
+        self.application.processEvents()
+        start = time.perf_counter()
+        operation(*args)
+        self.application.processEvents()
+        seconds = time.perf_counter() - start
+
+        result = self.results.setdefault(name, {'seconds': []})
+        result['seconds'].append(seconds)
+        result['median'] = statistics.median(result['seconds'])
+        result['peak_rss'] = peak_rss()
+
+    def wait_for(self, signal):
+        """
+        Processes the events until signal is emitted
+        """
+        from PyQt5.QtCore import QEventLoop
+        loop = QEventLoop()
+        signal.connect(loop.quit)
+        loop.exec_()
+
+    def parse(self):
+        worker = self.app.CsvLoaderWorker((self.csv_file_path, ''))
+        # The worker lives in this thread, the chunks are consumed right away by a direct connection
+        worker.rows_parsed.connect(lambda rows: worker.chunk_consumed())
+        worker.process_loading_file()
+
+    def load(self):
+        self.window.load_csv()
+        # The loader thread only stops once the GUI thread has appended the last chunk, see on_loading_finish
+        self.wait_for(self.window.loading_thread.finished)
+
+    def select_all(self):
+        self.window.csv_data_table.selectAll()
+        self.window.flush_ui_state()
+
+    def save(self):
+        self.window.save_file()
+        self.window.wait_for_saving()
+
+    def measure_plots(self):
+        store = self.window.table_model.store
+        numeric_columns = [column for column in range(store.column_count())
+                           if store.numeric_values(column) is not None][:2]
+        if len(numeric_columns) < 2:
+            return
+
+        self.select_ranges([(0, column, self.window.table_model.rowCount() - 1, column)
+                            for column in numeric_columns])
+        if self.window.figure is None:
+            # The first plot imports the plotting stack, it is not part of the measure
+            self.window.plot(self.app.plotting.PLOT_SCATTER)
+        for name in ('scatter', 'scatter_line', 'line'):
+            plot_type = getattr(self.app.plotting, 'PLOT_' + name.upper())
+            # The smooth curve is fitted again as it would be for newly selected columns
+            self.window.smooth_curve_cache = None
+            self.measure('plot_' + name, self.window.plot, plot_type)
+        self.window.close_plot_tab()
+
+    def measure_deletion(self, name, select):
+        select()
+        self.measure(name, self.window.delete_selection)
+        # Undone to delete from the same table again, the file is loaded again if the journal has dropped the edit
+        if not self.window.table_model.undo():
+            self.load()
+
+    def select_ranges(self, rectangles):
+        """
+        Selects cells of the table
+        :param rectangles: list of (top, left, bottom, right) inclusive cell ranges
+        """
+        from PyQt5.QtCore import QItemSelection, QItemSelectionModel
+        model = self.window.table_model
+        item_selection = QItemSelection()
+        for top, left, bottom, right in rectangles:
+            item_selection.select(model.index(top, left), model.index(bottom, right))
+        self.window.csv_data_table.selectionModel().select(item_selection, QItemSelectionModel.ClearAndSelect)
+
+    def select_rows(self):
+        model = self.window.table_model
+        self.select_ranges([(0, 0, max(model.rowCount() // 2, 1) - 1, model.columnCount() - 1)])
+
+    def select_columns(self):
+        model = self.window.table_model
+        self.select_ranges([(0, 0, model.rowCount() - 1, max(model.columnCount() // 2, 1) - 1)])
+
+    def select_cells(self):
+        model = self.window.table_model
+        self.select_ranges([(0, 0, max(model.rowCount() - 2, 0), max(model.columnCount() // 2, 1) - 1)])
+
+
+def measure_file(csv_file_path, repeat, paged):
+    """
+    Measures a file in a new process
+    Returns a dictionary of the results of every operation, and the peak resident memory of the whole run
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--measure', os.path.abspath(csv_file_path),
+               '--repeat', str(repeat)] + (['--paged'] if paged else [])
+    # The store cache would skip the parsing of the files measured more than once
+    output = subprocess.check_output(command, env=dict(os.environ, QT_QPA_PLATFORM='offscreen', CSV_EDITOR_CACHE='off'),
+                                     universal_newlines=True)
+    return json.loads(output.splitlines()[-1])
+
+
+def print_results(dataset, previous=None):
+    """
+    Prints the median times of a file, next to the ones of a previous run if any
+    """
+    print('{} ({:.1f} MB), peak RSS {}'.format(dataset['name'], dataset['file_size'] / 2 ** 20,
+                                               format_bytes(dataset['peak_rss'])))
+    previous_results = previous['operations'] if previous else {}
+    for name, result in dataset['operations'].items():
+        line = '    {:<18}{:>10.3f}s'.format(name, result['median'])
+        if name in previous_results:
+            line += '{:>10.3f}s  x{:.2f}'.format(previous_results[name]['median'],
+                                                 result['median'] / max(previous_results[name]['median'], 1e-9))
+        print(line)
+
+
+def format_bytes(size):
+    return 'unknown' if size is None else '{:.0f} MB'.format(size / 2 ** 20)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the operations of the editor on synthetic csv files.')
+    parser.add_argument('--shape', action='append', choices=sorted(SHAPES),
+                        help='predefined numbers of rows and columns, may be repeated, all the shapes by default')
+    parser.add_argument('--rows', type=int, help='number of data rows, overrides the one of the shapes')
+    parser.add_argument('--columns', type=int, help='number of columns, overrides the one of the shapes')
+    parser.add_argument('--types', default=synthetic.DEFAULT_TYPES,
+                        help='relative number of columns of every type among {}, {} by default'.format(
+                            ', '.join(synthetic.COLUMN_TYPES), synthetic.DEFAULT_TYPES))
+    parser.add_argument('--quoting', choices=synthetic.QUOTING_MODES, default='minimal', help='quoting of the fields')
+    parser.add_argument('--blanks', type=float, default=0.02, help='fraction of blank cells')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator of the files')
+    parser.add_argument('--repeat', type=int, default=3, help='number of times every operation is measured')
+    parser.add_argument('--paged', action='store_true', help='open the files in the paged mode whatever their size')
+    parser.add_argument('--data-directory', default=DEFAULT_DATA_DIRECTORY,
+                        help='directory where the generated files are kept for the next runs')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare the results with')
+    # Measures a single file in this process, used for every file by the other processes
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    arguments = parser.parse_args(argv)
+
+    if arguments.measure:
+        benchmark = EditorBenchmark(arguments.measure, arguments.repeat, arguments.paged)
+        operations = benchmark.run()
+        print(json.dumps({'operations': operations, 'peak_rss': peak_rss()}))
+        return 0
+
+    previous = {}
+    if arguments.compare:
+        with open(arguments.compare) as json_file:
+            previous = {dataset['name']: dataset for dataset in json.load(json_file)['datasets']}
+
+    datasets = []
+    for shape in arguments.shape or sorted(SHAPES):
+        rows = arguments.rows if arguments.rows is not None else SHAPES[shape][0]
+        columns = arguments.columns if arguments.columns is not None else SHAPES[shape][1]
+        try:
+            csv_file_path = synthetic.cached_csv(arguments.data_directory, rows, columns, arguments.types,
+                                                 arguments.quoting, arguments.blanks, arguments.seed)
+        except ValueError as error:
+            parser.error(str(error))
+
+        dataset = {
+            'name': os.path.splitext(os.path.basename(csv_file_path))[0] + ('-paged' if arguments.paged else ''),
+            'rows': rows,
+            'columns': columns,
+            'types': arguments.types,
+            'quoting': arguments.quoting,
+            'blanks': arguments.blanks,
+            'seed': arguments.seed,
+            'paged': arguments.paged,
+            'file_size': os.path.getsize(csv_file_path),
+        }
+        dataset.update(measure_file(csv_file_path, arguments.repeat, arguments.paged))
+        print_results(dataset, previous.get(dataset['name']))
+        datasets.append(dataset)
+
+    if arguments.output:
+        results = {
+            'commit': commit_id(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': arguments.repeat,
+            'datasets': datasets,
+        }
+        with open(arguments.output, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+""" Synthetic csv files
+
+Generation of the csv files used by the benchmarks. A file is described by its number of rows and columns, the mix of
+the types of its columns, how its fields are quoted and the fraction of blank cells:
+    python benchmarks/synthetic.py tall.csv --rows 200000 --columns 12 --types int=3,float=3,text=4,date=2
+
+The files are generated from a seeded random generator, so the same description always gives the same file, and they
+are written as comma separated values quoted with double quotes. The columns of every type are spread evenly
+over the file, and are named after their type.
+
+This module does not depend on Qt.
+
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+
+import numpy as np
+
+COLUMN_TYPES = ('int', 'float', 'text', 'date')
+
+# Ways of quoting the fields: never needed, only the fields holding a delimiter or a quote, every field
+QUOTING_MODES = ('none', 'minimal', 'all')
+
+DEFAULT_TYPES = 'int=3,float=3,text=4,date=2'
+
+# Part of the names of the cached files, bumped whenever the generated contents change so stale files are not reused
+FILE_VERSION = 2
+
+# Number of rows generated and written at once
+_CHUNK_SIZE = 20000
+
+_WORDS = np.array(['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliett',
+                   'kilo', 'lima', 'mike', 'november', 'oscar', 'papa', 'quebec', 'romeo', 'sierra', 'tango',
+                   'uniform', 'victor', 'whiskey', 'xray', 'yankee', 'zulu'])
+
+
+def parse_types(text):
+    """
+    Parses a type mix such as int=3,text=1 into a dictionary of the relative weight of every column type
+    :raises ValueError: if the text is not a list of known types and weights
+    """
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in COLUMN_TYPES:
+            raise ValueError('Unknown column type {!r}, expected one of {}'.format(name, ', '.join(COLUMN_TYPES)))
+        weights[name] = float(weight) if weight else 1.0
+        if weights[name] < 0:
+            raise ValueError('Negative weight for the column type {!r}'.format(name))
+    if not sum(weights.values()):
+        raise ValueError('The type mix has no column type')
+    return weights
+
+
+def column_types(columns, weights):
+    """
+    Returns the type of every column, the number of columns of every type is proportional to its weight and the
+    columns of a type are interleaved with the others
+    :param columns: number of columns
+    :param weights: dictionary of the relative weight of every column type, see parse_types
+    """
+    total = sum(weights.values())
+    counts = {name: int(columns * weight / total) for name, weight in weights.items()}
+    # The columns left by the rounding go to the types which lost the most
+    remainders = sorted(weights, key=lambda name: counts[name] - columns * weights[name] / total)
+    for name in remainders[:columns - sum(counts.values())]:
+        counts[name] += 1
+
+    # Every column is placed at the middle of its share of the file
+    positions = [((index + 0.5) / count, COLUMN_TYPES.index(name), name)
+                 for name, count in counts.items() for index in range(count)]
+    return [name for _, _, name in sorted(positions)]
+
+
+def generate_column(random, column_type, row_count, quoting, blanks):
+    """
+    Returns the texts of the cells of a column as an array of strings
+    :param random: numpy RandomState the values are drawn from
+    :param column_type: one of COLUMN_TYPES
+    :param row_count: number of cells
+    :param quoting: one of QUOTING_MODES, the text cells only hold delimiters and quotes when they get quoted
+    :param blanks: fraction of the cells left blank
+    """
+    if column_type == 'int':
+        texts = random.randint(-1000000, 1000000, row_count).astype(str)
+    elif column_type == 'float':
+        texts = np.char.mod('%.4f', random.normal(0, 1000, row_count))
+    elif column_type == 'date':
+        texts = (np.datetime64('2000-01-01') + random.randint(0, 10000, row_count)).astype(str)
+    else:
+        texts = np.char.add(np.char.add(_WORDS[random.randint(0, len(_WORDS), row_count)], ' '),
+                            random.randint(0, 1000, row_count).astype(str))
+        if quoting != 'none':
+            # Some cells need quoting, with an escaped quote character for a few of them
+            special = random.random_sample(row_count)
+            texts = np.where(special < 0.1, np.char.add(texts, ', ' + _WORDS[0]), texts)
+            texts = np.where(special < 0.01, np.char.add(texts, ' "quoted"'), texts)
+
+    if blanks:
+        texts = np.where(random.random_sample(row_count) < blanks, '', texts)
+    return texts
+
+
+def generate_csv(csv_file_path, rows, columns, types=DEFAULT_TYPES, quoting='minimal', blanks=0.0, seed=0):
+    """
+    Writes a synthetic csv file
+    :param csv_file_path: path of the file to write
+    :param rows: number of data rows
+    :param columns: number of columns
+    :param types: mix of the column types, see parse_types
+    :param quoting: one of QUOTING_MODES
+    :param blanks: fraction of the cells left blank
+    :param seed: seed of the random generator
+    """
+    if quoting not in QUOTING_MODES:
+        raise ValueError('Unknown quoting {!r}, expected one of {}'.format(quoting, ', '.join(QUOTING_MODES)))
+    types = column_types(columns, parse_types(types))
+    random = np.random.RandomState(seed)
+
+    with io.open(csv_file_path, 'w', encoding='utf-8', newline='') as csv_file:
+        writer = csv.writer(csv_file, delimiter=',', quotechar='"',
+                            quoting=csv.QUOTE_ALL if quoting == 'all' else csv.QUOTE_MINIMAL)
+        writer.writerow(['{}_{}'.format(column_type, column) for column, column_type in enumerate(types)])
+        for start in range(0, rows, _CHUNK_SIZE):
+            row_count = min(_CHUNK_SIZE, rows - start)
+            cells = [generate_column(random, column_type, row_count, quoting, blanks).tolist()
+                     for column_type in types]
+            writer.writerows(zip(*cells))
+
+
+def cached_csv(directory, rows, columns, types=DEFAULT_TYPES, quoting='minimal', blanks=0.0, seed=0):
+    """
+    Returns the path of a synthetic csv file in directory, the file is only generated if it does not exist yet
+    The name of the file is made of its description, see generate_csv for the parameters
+    """
+    name = '{}x{}-{}-{}-{}-{}-v{}.csv'.format(rows, columns, types.replace('=', '').replace(',', '_'), quoting,
+                                              blanks, seed, FILE_VERSION)
+    csv_file_path = os.path.join(directory, name)
+    if not os.path.exists(csv_file_path):
+        os.makedirs(directory, exist_ok=True)
+        # Written under a temporary name so an interrupted generation is not reused
+        temp_path = csv_file_path + '.tmp'
+        generate_csv(temp_path, rows, columns, types, quoting, blanks, seed)
+        os.replace(temp_path, csv_file_path)
+    return csv_file_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic csv file.')
+    parser.add_argument('output', help='csv file to write')
+    parser.add_argument('--rows', type=int, default=100000, help='number of data rows')
+    parser.add_argument('--columns', type=int, default=12, help='number of columns')
+    parser.add_argument('--types', default=DEFAULT_TYPES,
+                        help='relative number of columns of every type among {}, {} by default'.format(
+                            ', '.join(COLUMN_TYPES), DEFAULT_TYPES))
+    parser.add_argument('--quoting', choices=QUOTING_MODES, default='minimal', help='quoting of the fields')
+    parser.add_argument('--blanks', type=float, default=0.0, help='fraction of blank cells')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    arguments = parser.parse_args(argv)
+
+    try:
+        generate_csv(arguments.output, arguments.rows, arguments.columns, arguments.types, arguments.quoting,
+                     arguments.blanks, arguments.seed)
+    except ValueError as error:
+        parser.error(str(error))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -29,17 +29,45 @@ Features:
 The below code uses PEP 8 style guide for Python
 
 """
-from PyQt5 import uic, QtCore
-from PyQt5.QtCore import QObject, pyqtSignal, QThread
-from PyQt5.QtWidgets import QMainWindow, QApplication, QFileDialog, QTableWidgetItem, QDialog, \
-    QMessageBox, QVBoxLayout, QCheckBox, QProgressDialog, QInputDialog, QLineEdit
+from PyQt5 import QtCore
+from PyQt5.QtCore import QObject, pyqtSignal, QThread, QAbstractTableModel, QAbstractListModel, QModelIndex, \
+    QEventLoop, QTimer, QItemSelection, QItemSelectionModel
+from PyQt5.QtWidgets import QMainWindow, QApplication, QFileDialog, QDialog, \
+    QMessageBox, QProgressDialog, QInputDialog, QLineEdit, QHeaderView, QStyle, QStyleOptionHeader
 import os
 import sys
 import csv
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
-from scipy.interpolate import make_interp_spline  # Below two libraries are used to plot the smooth curve
+import threading
+import time
+import itertools
+import lzma
+import zipfile
+import csv_io
+import filtering
+import instrumentation
+import journal
+import search
+import selection
+import sorting
+import column_stats
+import store_cache
+import visibility
+from csv_store import ColumnStore
+from paged_store import MappedCsvStore
 import numpy as np
+import plotting
+import ui_cache
+
+# Parts of the state of the main window derived from the table, see CsvEditor.invalidate_ui_state
+UI_SELECTION = 1
+UI_TOOLBAR_INFO = 2
+UI_SAVE_OPTIONS = 4
+UI_HISTORY_OPTIONS = 8
+UI_STATISTICS = 16
+
+# File dialog filters, compressed files are read and written transparently
+OPEN_FILE_FILTER = 'CSV(*.csv *.tsv *.txt *.gz *.bz2 *.xz *.zip);;All files(*)'
+SAVE_FILE_FILTER = 'CSV(*.csv *.tsv *.txt);;Compressed CSV(*.csv.gz *.csv.bz2 *.csv.xz *.zip)'
 
 
 # Main GUI Window for the application
@@ -50,10 +78,10 @@ class CsvEditor(QMainWindow):
         # Load the layout file created in QT Creator
         # This is done to ensure that the UX remains consistent (better than writing manual code for UI)
         # and designed in optimal way using QT's own toolset
-        # define UI file paths
+        # define UI file paths, the files are compiled once and the compiled form is cached (see ui_cache)
         RESOURCE_PATH = os.path.dirname(__file__)  # <-- absolute dir the script is in
         mainwindowui_file = os.path.join(RESOURCE_PATH, "ui/mainwindow.ui")
-        uic.loadUi(mainwindowui_file, self)
+        ui_cache.load_ui(mainwindowui_file, self)
         # Save the references of all tabs to avoid garbage collection
         # which leads to crash to opening of UI loaded tabs to avoid resource duplication
         self.csv_table_tab = self.main_document_tab
@@ -73,6 +101,12 @@ class CsvEditor(QMainWindow):
         self.action_delete_selected.setEnabled(False)
         self.action_toolbar_delete_selected.setEnabled(False)
         self.action_close_file.setEnabled(False)
+        self.action_undo.setEnabled(False)
+        self.action_redo.setEnabled(False)
+        self.action_sort_ascending.setEnabled(False)
+        self.action_sort_descending.setEnabled(False)
+        self.action_clear_sort.setEnabled(False)
+        self.action_find_replace.setEnabled(False)
 
         # Flag for not detecting cell state change when opening the file
         self.check_cell_change = True
@@ -80,11 +114,49 @@ class CsvEditor(QMainWindow):
         # Flag for detecting any changes made to file (unsaved state)
         self.file_changed = False
 
+        # Flag for the rows of the file still being streamed in by the loader thread, the chunks are appended by
+        # position so the columns and the order of the rows must not change until the last one is in
+        self.rows_streaming = False
+
+        # Dialect, encoding and compression detected when the file was loaded, the file is saved back in the same format
+        self.csv_format = csv_io.CsvFormat()
+
+        # Cache of the parsed files so an unchanged file is reopened without parsing it, None when disabled
+        self.store_cache = store_cache.default_cache()
+
+        # Flag for ignoring the selection changes while many rows, columns or cells are edited at once
+        self.bulk_editing = False
+
+        # The parts of the UI state made stale by the handlers are recomputed once the pending events are processed,
+        # so a bulk edit or a drag selection updates the options and the bottom toolbar once instead of every time
+        self.stale_ui_state = 0
+        self.ui_state_timer = QTimer(self)
+        self.ui_state_timer.setSingleShot(True)
+        self.ui_state_timer.setInterval(0)
+        self.ui_state_timer.timeout.connect(self.update_ui_state)
+
+        # Summary of the current selection, updated by update_selection_state
+        self.selected_cell_count = 0
+        self.selected_columns = []
+        self.selected_column_ranges = []
+        self.selected_row_ranges = []
+
         # Disable save options before loading file
         self.set_save_enabled(False)
 
         self.csv_data_table.setAlternatingRowColors(True)
 
+        # The table view only renders the cells in the viewport, the actual data lives in the column store of the model
+        self.table_model = CsvTableModel(self)
+        self.csv_data_table.setHorizontalHeader(SelectionAwareHeaderView(QtCore.Qt.Horizontal, self.csv_data_table))
+        self.csv_data_table.setModel(self.table_model)
+
+        # Set WordWrap to True to make the cells change height according to content
+        # Currently set it to false as it looks very decent and makes cell size uniform throughout
+        self.csv_data_table.setWordWrap(False)
+        # Fixed row heights avoid measuring the contents of every row of large files
+        self.csv_data_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+
         # Disable the plot options by default
         self.set_plot_options(False)
 
@@ -97,11 +169,44 @@ class CsvEditor(QMainWindow):
 
         self.plot_inverted = False
         self.figure = None
+        # Artists drawn from decimated data as (artist, full x data, full y data, whether it is a line)
+        self.decimated_artists = []
+        # Title and axes of the current plot, updated in place by the title and flip options
+        self.plot_suptitle = None
+        self.plot_axes = None
+        # Version stamps of the plotted columns and the smooth curve computed for them
+        self.plot_data_version = None
+        self.smooth_curve_cache = None
 
         self.column_visibility_dialog_reference = None
 
+        # Non modal find and replace panel, the worker of the running search and the (thread, worker) pairs of the
+        # searches which have not stopped yet
+        self.find_dialog_reference = None
+        self.search_worker = None
+        self.search_threads = []
+
+        # Visibility of every column by index, follows the columns inserted in and removed from the model
+        self.column_visibility = visibility.ColumnVisibility()
+
+        # Thread streaming the rows to the disk while a file is being saved
+        self.saving_thread = None
+
         self.set_bottom_toolbar_info(default_values=True)
 
+        # The statistics panel of the current column is hidden until shown from the View menu, as computing the
+        # statistics of a column the first time scans it
+        self.statistics_dock.hide()
+        self.menu_View.addSeparator()
+        self.menu_View.addAction(self.statistics_dock.toggleViewAction())
+
+        # Spans and profiles of the operations, see instrumentation for the environment variables turning them on
+        instrumentation.configure_from_environment()
+        self.action_record_profile.setChecked(instrumentation.is_profiling())
+        self.action_record_profile.toggled.connect(self.on_record_profile_toggled)
+        # Span of the file being loaded, ended once the loader thread is done
+        self.loading_span = None
+
         # TODO: Add right click context menu for cell items (last stage of project if time permits)
 
         self.show()
@@ -111,8 +216,8 @@ class CsvEditor(QMainWindow):
         self.action_column_layout.triggered.connect(self.open_column_layout_dialog)
 
         # Connect cell change function
-        self.csv_data_table.cellChanged.connect(self.cell_change_current)
-        self.csv_data_table.itemSelectionChanged.connect(self.cell_selection_changed)
+        self.table_model.dataChanged.connect(self.cell_change_current)
+        self.csv_data_table.selectionModel().selectionChanged.connect(self.cell_selection_changed)
 
         # Load csv file function
         self.action_load_file.triggered.connect(self.load_csv)
@@ -158,6 +263,38 @@ class CsvEditor(QMainWindow):
         # Edit data menu item function
         self.action_edit_data.triggered.connect(self.edit_current_cell)
 
+        # Undo and redo the edits recorded in the journal of the table model
+        self.action_undo.triggered.connect(self.undo_edit)
+        self.action_redo.triggered.connect(self.redo_edit)
+        self.table_model.history_changed.connect(lambda: self.invalidate_ui_state(UI_HISTORY_OPTIONS))
+
+        # Sort the rows by the selected columns, the model only changes the order in which the view shows them
+        self.action_sort_ascending.triggered.connect(lambda: self.sort_by_selected_columns(True))
+        self.action_sort_descending.triggered.connect(lambda: self.sort_by_selected_columns(False))
+        self.action_clear_sort.triggered.connect(lambda: self.sort_rows([]))
+        self.table_model.sort_changed.connect(self.update_sort_options)
+
+        # Filter the rows with the expression typed in the filter bar above the table
+        self.filter_edit.returnPressed.connect(self.apply_filter)
+        self.filter_edit.textChanged.connect(self.on_filter_text_changed)
+        self.table_model.filter_changed.connect(self.update_filter_status)
+
+        # Keep the visibility flags aligned with the columns of the model, the view shows the new columns too
+        self.table_model.modelReset.connect(self.on_columns_reset)
+        self.table_model.columnsInserted.connect(self.on_columns_inserted)
+        self.table_model.columnsRemoved.connect(self.on_columns_removed)
+
+        # Find and replace panel, its results refer to cells by index so they are dropped once the cells move
+        self.action_find_replace.triggered.connect(self.open_find_dialog)
+        self.table_model.cells_moved.connect(self.discard_search_results)
+
+        # Statistics panel of the current column, refreshed once the pending edits are processed
+        self.statistics_dock.visibilityChanged.connect(self.on_statistics_visibility_changed)
+        for signal in (self.table_model.dataChanged, self.table_model.rowsInserted, self.table_model.rowsRemoved,
+                       self.table_model.columnsInserted, self.table_model.columnsRemoved,
+                       self.table_model.modelReset):
+            signal.connect(lambda: self.invalidate_ui_state(UI_STATISTICS))
+
         # Close file function
         self.action_close_file.triggered.connect(self.close_file)
 
@@ -165,17 +302,114 @@ class CsvEditor(QMainWindow):
         self.action_exit.triggered.connect(self.closeEvent)
 
     # Threaded functions for multi threading the loading for handling large files
-    def on_loading_finish(self):
+    def set_loaded_store(self, store):
+        """
+        Shows the store of the file being loaded in the table
+        :param store: store holding the data of the loaded file
+        """
+        self.check_cell_change = False
+        self.table_model.set_store(store)
+        self.check_cell_change = True
+
+        self.set_bottom_toolbar_info()
+
+    def on_format_detected(self, csv_format):
+        """
+        Invoked with the format of the file detected by the loader thread before it parses the file
+        :param csv_format: csv_io.CsvFormat of the file
+        """
+        self.csv_format = csv_format
+
+    def on_headers_loaded(self, headers):
+        """
+        Invoked with the header row of the file, the rows are then appended chunk by chunk as they get parsed
+        :param headers: list of the column headers of the file
+        """
+        self.set_loaded_store(ColumnStore(headers))
+
+    def append_loaded_rows(self, rows):
+        """
+        Appends a chunk of rows parsed by the loader thread to the table in a single model insert
+        The table is usable as soon as the first chunk is appended
+        :param rows: list of parsed rows
+        """
+        # Rows wider than the header add blank columns
+        with instrumentation.span('populate', rows=len(rows)):
+            self.table_model.append_rows(rows)
+
+        self.loading_worker.chunk_consumed()
+        self.invalidate_ui_state(UI_TOOLBAR_INFO)
+
+    def on_loading_finish(self, store):
+        """
+        Invoked when the loader thread is done
+        :param store: store built by the loader thread in paged mode or read back from the cache, None when the rows
+                      were streamed in chunks
+        """
+        if store is not None:
+            with instrumentation.span('populate', paged=isinstance(store, MappedCsvStore)):
+                self.set_loaded_store(store)
+        else:
+            self.cache_loaded_store()
+        self.set_rows_streaming(False)
+        self.loading_span.end(rows=self.table_model.rowCount(), columns=self.table_model.columnCount())
+
+        # Hide the progress dialog, reset() hides it without emitting canceled unlike close()
+        self.loading_progress.reset()
+
         # Change the cursor back to normal
         QApplication.restoreOverrideCursor()
         self.loading_thread.quit()
 
+    def cache_loaded_store(self):
+        """
+        Writes the columns of the file just loaded in memory to the store cache in the background
+        The columns are copied by the writer thread, which gives up if the table is edited before they are copied, the
+        rows streamed in are only cached when none of them has been edited yet
+        """
+        identity = self.loading_worker.file_identity
+        if self.store_cache is None or identity is None or self.file_changed or \
+                not self.store_cache.is_cacheable(identity):
+            return
+
+        store = self.table_model.store
+        versions = [store.column_version(column) for column in range(store.column_count())]
+        self.store_cache.save_in_background(self.store_cache.save_columns, self.loading_worker.csv_file_path[0],
+                                            identity, self.csv_format, store, versions)
+
+    def cancel_loading(self):
+        """
+        Slot for the cancel button of the loading progress dialog
+        The worker is busy in its loop, hence the flag is set directly instead of through a queued signal
+        """
+        self.loading_worker.cancel()
+
+    def on_loading_cancelled(self):
+        """
+        Invoked when the worker has stopped after the loading was cancelled, leaves the editor without any file open
+        """
+        self.loading_span.end(cancelled=True)
+        QApplication.restoreOverrideCursor()
+        self.loading_thread.quit()
+        self.close_file()
+
+    def on_loading_failed(self, message):
+        """
+        Invoked when the loader thread could not read the file, eg. a corrupted archive, leaves the editor without any
+        file open
+        :param message: description of the error
+        """
+        self.loading_span.end(failed=True)
+        self.loading_progress.reset()
+        QApplication.restoreOverrideCursor()
+        self.loading_thread.quit()
+        self.close_file()
+        QMessageBox.critical(self, "Error!", "The file could not be loaded.\n" + message)
+
     def update_loading_progress(self, value):
-        print("reading row: ", value)
         self.loading_progress.setValue(value)
 
     def set_maximum_progress_value(self, max_value):
-        print(max_value)
         self.loading_progress.setMaximum(max_value)
         self.loading_progress.setValue(0)
 
@@ -195,7 +429,7 @@ class CsvEditor(QMainWindow):
         self.file_changed = False
         self.set_save_enabled(False)
 
-        csv_file_path = QFileDialog.getOpenFileName(self, "Load CSV File", "", 'CSV(*.csv)')
+        csv_file_path = QFileDialog.getOpenFileName(self, "Load CSV File", "", OPEN_FILE_FILTER)
 
         # Proceed if and only if a valid file is selected and the file dialog is not cancelled
         if csv_file_path[0]:
@@ -204,9 +438,8 @@ class CsvEditor(QMainWindow):
             filename = filepath.split(os.sep)
             self.csv_file_name = filename[-1]
 
-            self.loading_progress = QProgressDialog("Reading Rows. Please wait...", None, 0, 100, self)
+            self.loading_progress = QProgressDialog("Reading Rows. Please wait...", "Cancel", 0, 100, self)
             self.loading_progress.setWindowTitle("Loading CSV File...")
-            self.loading_progress.setCancelButton(None)
 
             # enable custom window hint
             self.loading_progress.setWindowFlags(self.loading_progress.windowFlags() | QtCore.Qt.CustomizeWindowHint)
@@ -216,9 +449,7 @@ class CsvEditor(QMainWindow):
             # Show waiting cursor till the time file is being processed
             QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
 
-            self.loading_worker = CsvLoaderWorker(csv_file_path=csv_file_path, csv_data_table=self.csv_data_table,
-                                                  column_headers=self.column_headers,
-                                                  column_headers_all=self.column_headers_all)
+            self.loading_worker = CsvLoaderWorker(csv_file_path=csv_file_path, store_cache=self.store_cache)
 
             self.loading_thread = QThread()
             # Set higher priority to the GUI Thread so UI remains a bit smoother
@@ -228,12 +459,19 @@ class CsvEditor(QMainWindow):
             self.loading_worker.workRequested.connect(self.loading_thread.start)
             self.loading_thread.started.connect(self.loading_worker.process_loading_file)
             self.loading_worker.finished.connect(self.on_loading_finish)
+            self.loading_worker.format_detected.connect(self.on_format_detected)
+            self.loading_worker.headers_parsed.connect(self.on_headers_loaded)
+            self.loading_worker.rows_parsed.connect(self.append_loaded_rows)
+            self.loading_worker.cancelled.connect(self.on_loading_cancelled)
+            self.loading_worker.failed.connect(self.on_loading_failed)
+            self.loading_progress.canceled.connect(self.cancel_loading)
 
             self.loading_worker.relay.connect(self.update_loading_progress)
             self.loading_worker.progress_max.connect(self.set_maximum_progress_value)
-            self.loading_worker.update_bottom_toolbar.connect(self.set_bottom_toolbar_info)
 
             self.loading_progress.setValue(0)
+            self.loading_span = instrumentation.span('load', file_size=os.path.getsize(filepath))
+            self.set_rows_streaming(True)
             self.loading_worker.request_work()
 
             self.check_cell_change = True
@@ -242,23 +480,30 @@ class CsvEditor(QMainWindow):
             self.tabWidget.removeTab(0)
             self.tabWidget.insertTab(1, self.csv_table_tab, "Main Document")
 
-            # Enable Column Layout menu option
+            # Enable Column Layout menu option, the options adding data are enabled once all the rows are loaded
             self.action_column_layout.setEnabled(True)
-            self.action_add_data.setEnabled(True)
-            self.action_add_column.setEnabled(True)
-            self.action_toolbar_add_data.setEnabled(True)
+            self.action_find_replace.setEnabled(True)
             self.action_close_file.setEnabled(True)
 
+    def set_rows_streaming(self, streaming):
+        """
+        Disables the options changing the columns, the order or the number of the rows, undo and redo while the rows
+        are streamed in, the cells can still be edited
+        :param streaming: True once the loading starts, False once the last chunk is appended or the loading stopped
+        """
+        self.rows_streaming = streaming
+        self.action_add_data.setEnabled(not streaming)
+        self.action_add_column.setEnabled(not streaming)
+        self.action_toolbar_add_data.setEnabled(not streaming)
+        self.filter_edit.setEnabled(not streaming)
+        self.update_sort_options()
+        self.invalidate_ui_state(UI_SELECTION | UI_HISTORY_OPTIONS)
+
     def add_blank_data_row(self):
         """
         Adds a blank row of data to the table
         """
-        last_row_count = self.csv_data_table.rowCount()
-        column_count = self.csv_data_table.columnCount()
-        self.csv_data_table.insertRow(last_row_count)
-        for empty_col in range(0, column_count):
-            item = QTableWidgetItem('')
-            self.csv_data_table.setItem(last_row_count, empty_col, item)
+        self.table_model.insertRows(self.table_model.rowCount(), 1)
 
     def add_blank_data_column(self):
         """
@@ -268,25 +513,11 @@ class CsvEditor(QMainWindow):
         header_title, ok_pressed = QInputDialog.getText(self, "Add Column", "Enter heading for the column:",
                                                         QLineEdit.Normal, "")
         if ok_pressed and header_title != '':
-            # print(header_title)
-
             default_value, set_default_pressed = QInputDialog.getText(self, "Set Default Value",
                                                                       "Enter default value to set for column if any:",
                                                                       QLineEdit.Normal, "")
 
-            row_count = self.csv_data_table.rowCount()
-            last_column_count = self.csv_data_table.columnCount()
-            self.csv_data_table.insertColumn(last_column_count)
-            for empty_row in range(0, row_count):
-                item = QTableWidgetItem(default_value)
-                self.csv_data_table.setItem(empty_row, last_column_count, item)
-
-            # TODO: fix untraced bug present in show/hide columns
-            self.column_headers.append(header_title)
-            self.column_headers_all.append(header_title)
-            # print(self.column_headers)
-            # print(self.column_headers_all)
-            self.csv_data_table.setHorizontalHeaderLabels(self.column_headers)
+            self.table_model.insert_column(self.table_model.columnCount(), header_title, default_value)
 
     def edit_current_cell(self):
         """
@@ -295,9 +526,7 @@ class CsvEditor(QMainWindow):
         cells = self.csv_data_table.selectionModel().selectedIndexes()
         if len(cells) == 1:
             for cell in sorted(cells):
-                r = cell.row()
-                c = cell.column()
-                self.csv_data_table.editItem(self.csv_data_table.item(r, c))
+                self.csv_data_table.edit(cell)
 
     def delete_selection(self):
         """
@@ -305,58 +534,83 @@ class CsvEditor(QMainWindow):
         Automatically determiness if any row or column as a whole is to be deleted
         :return:
         """
-        # TODO: Add undo, redo etc functionality
+        # The ranges to delete are taken from the summary of the selection, which may not be updated yet
+        self.flush_ui_state()
+
+        # Every removed range changes the selection, its state is updated once at the end instead
+        self.bulk_editing = True
+        try:
+            # The whole deletion is undone as a single step
+            with self.table_model.journal.group():
+                self.delete_selected_items()
+        finally:
+            self.bulk_editing = False
+
+        # update the selection dependent options and the bottom toolbar to reflect the changes
+        self.cell_selection_changed()
+
+    def delete_selected_items(self):
+        """
+        Deletes the selected columns, rows and cells, see delete_selection
+        """
         # If whole column is selected remove that column completely
         # If whole row is selected remove that row completely
         # Else make the selected cells blank
 
-        # TODO: Remove the deleted column from the visibility modal also
+        if len(self.selected_row_ranges) > 0 or len(self.selected_column_ranges) > 0:
+            self.mark_file_changed()
 
-        selected_columns = sorted(self.selected_columns, reverse=True)
-        selected_rows = sorted(self.selected_rows, reverse=True)
+        # Consecutive columns and rows are removed as one range each, the last range first so the indices of the
+        # remaining ranges stay valid
+        # The visibility flags of the removed columns are dropped by on_columns_removed
+        for first_column, count in reversed(self.selected_column_ranges):
+            self.table_model.removeColumns(first_column, count)
 
-        fileChanged = False
-        if len(selected_rows) > 0 or len(selected_columns) > 0:
-            self.file_changed = True
-            self.set_save_enabled(True)
+        self.selected_columns = []
+        self.selected_column_ranges = []
 
-        # delete any fully selected column
-        for col in selected_columns:
-            # Remove it from the show/hide modal too
-            header_value = self.csv_data_table.horizontalHeaderItem(col).text()
-            if header_value in self.column_headers_all:
-                self.column_headers_all.remove(header_value)
-            if header_value in self.column_headers:
-                self.column_headers.remove(header_value)
-            try:
-                self.column_visibility_dialog_reference.remove_header(header_value)
-            except:
-                pass
-            self.csv_data_table.removeColumn(col)
+        # delete any fully selected row
+        for first_row, count in reversed(self.selected_row_ranges):
+            self.table_model.removeRows(first_row, count)
 
-        self.selected_columns.clear()
+        self.selected_row_ranges = []
 
-        # delete any fully selected row
-        for row in selected_rows:
-            self.csv_data_table.removeRow(row)
+        # Now check if any individual cells are to be deleted, the selection is cleared as rectangles of cells
+        ranges = [(selection_range.top(), selection_range.bottom(), selection_range.left(), selection_range.right())
+                  for selection_range in self.csv_data_table.selectionModel().selection()]
 
-        self.selected_rows.clear()
+        if len(ranges) > 0:
+            self.mark_file_changed()
 
-        # Now check if any individual cells are to be deleted
+        self.table_model.clear_ranges(ranges)
 
-        cells = self.csv_data_table.selectionModel().selectedIndexes()
+    def undo_edit(self):
+        """
+        Reverts the last edit recorded in the journal
+        """
+        if self.table_model.undo():
+            self.on_history_applied()
 
-        if len(cells) > 0:
-            self.file_changed = True
-            self.set_save_enabled(True)
+    def redo_edit(self):
+        """
+        Applies again the last edit reverted by undo
+        """
+        if self.table_model.redo():
+            self.on_history_applied()
 
-        for cell in sorted(cells):
-            r = cell.row()
-            c = cell.column()
-            self.csv_data_table.item(r, c).setText('')
+    def on_history_applied(self):
+        """
+        Updates the state of the editor after the table has been changed by undo or redo
+        """
+        self.mark_file_changed()
+        self.invalidate_ui_state(UI_TOOLBAR_INFO)
 
-        # update the bottom toolbar to reflect the changes
-        self.set_bottom_toolbar_info()
+    def update_undo_redo_options(self):
+        """
+        Enables the undo and redo options iff there is something to undo or redo
+        """
+        self.action_undo.setEnabled(not self.rows_streaming and self.table_model.journal.can_undo())
+        self.action_redo.setEnabled(not self.rows_streaming and self.table_model.journal.can_redo())
 
     def open_column_layout_dialog(self):
         """
@@ -367,14 +621,271 @@ class CsvEditor(QMainWindow):
         if self.column_visibility_dialog_reference is None:
             self.column_visibility_dialog_reference = ColumnLayoutDialog()
 
-        self.column_visibility_dialog_reference.add_header_visible_options(self.column_headers_all, self.column_headers)
+        self.column_visibility_dialog_reference.set_columns(self.table_model.store.headers,
+                                                            self.column_visibility.flags)
         self.column_visibility_dialog_reference.setModal(True)
 
         # invoke exec_() method instead of show to block the main thread till the selection is done
-        self.column_visibility_dialog_reference.exec_()
+        if self.column_visibility_dialog_reference.exec_() == QDialog.Accepted:
+            # Now hide the invisible columns
+            self.apply_column_visibility(self.column_visibility_dialog_reference.visible_flags())
+
+    def open_find_dialog(self):
+        """
+        Shows the find and replace panel, the table can still be edited while it is open
+        """
+        if self.find_dialog_reference is None:
+            self.find_dialog_reference = FindReplaceDialog(self.table_model, self)
+            dialog = self.find_dialog_reference
+            dialog.btn_find.clicked.connect(self.start_search)
+            dialog.find_edit.returnPressed.connect(self.start_search)
+            dialog.btn_cancel_search.clicked.connect(self.cancel_search)
+            dialog.btn_replace_all.clicked.connect(self.replace_all_hits)
+            dialog.results_view.activated.connect(self.show_search_hit)
+            dialog.results_view.clicked.connect(self.show_search_hit)
+            dialog.rejected.connect(self.cancel_search)
+
+        self.find_dialog_reference.show()
+        self.find_dialog_reference.raise_()
+        self.find_dialog_reference.activateWindow()
+        self.find_dialog_reference.find_edit.setFocus()
+
+    def start_search(self):
+        """
+        Searches the visible columns of the table on a worker thread, the hits are listed as they are found
+        """
+        dialog = self.find_dialog_reference
+        self.cancel_search()
+        if not dialog.find_edit.text():
+            return
+        try:
+            query = search.SearchQuery(dialog.find_edit.text(), dialog.check_regex.isChecked(),
+                                       dialog.check_case_sensitive.isChecked())
+        except search.SearchSyntaxError as error:
+            dialog.label_search_status.setText(str(error))
+            return
+
+        dialog.results_model.clear(query)
+        dialog.label_search_status.setText("Searching...")
+        dialog.btn_cancel_search.setEnabled(True)
+        dialog.btn_replace_all.setEnabled(False)
+
+        index = self.table_model.search_index if dialog.check_use_index.isChecked() else None
+        self.search_worker = SearchWorker(self.table_model.store, query, self.column_visibility.visible_columns(),
+                                          index)
+        search_thread = QThread()
+        search_work = (search_thread, self.search_worker)
+        self.search_threads.append(search_work)
+
+        self.search_worker.moveToThread(search_thread)
+        self.search_worker.workRequested.connect(search_thread.start)
+        search_thread.started.connect(self.search_worker.process_search)
+        self.search_worker.hits_found.connect(self.on_search_hits)
+        self.search_worker.finished.connect(self.on_search_finish)
+        self.search_worker.finished.connect(search_thread.quit)
+        search_thread.finished.connect(lambda: self.search_threads.remove(search_work))
+
+        self.search_worker.request_work()
+
+    def cancel_search(self):
+        """
+        Stops the running search if any, the hits found so far stay listed
+        """
+        if self.search_worker is not None:
+            self.search_worker.cancel()
+            self.finish_search(False)
+
+    def on_search_hits(self, hits, rows_searched):
+        """
+        Lists a batch of hits found by the search worker
+        :param hits: list of (row of the store, column) tuples
+        :param rows_searched: number of rows searched so far
+        """
+        # A stopped search may still deliver the hits queued before it stopped
+        if self.sender() is not self.search_worker:
+            return
+        results_model = self.find_dialog_reference.results_model
+        results_model.append_hits(hits)
+        self.find_dialog_reference.label_search_status.setText(
+            "Searching... {} cells found in {} of {} rows".format(results_model.rowCount(), rows_searched,
+                                                                   self.table_model.store.row_count()))
+
+    def on_search_finish(self, completed):
+        """
+        Invoked once the search worker is done
+        :param completed: whether all the rows were searched
+        """
+        # A stopped search has already been finished
+        if self.sender() is self.search_worker:
+            self.finish_search(completed)
 
-        # Now hide the invisible headers
-        self.hide_invisible_headers()
+    def finish_search(self, completed):
+        """
+        Shows the outcome of the search and enables replacing the hits if all the rows were searched
+        :param completed: whether all the rows were searched
+        """
+        self.search_worker = None
+        dialog = self.find_dialog_reference
+        found = dialog.results_model.rowCount()
+        dialog.btn_cancel_search.setEnabled(False)
+        dialog.btn_replace_all.setEnabled(completed and found > 0)
+        if completed:
+            dialog.label_search_status.setText("{} cells found".format(found))
+        else:
+            dialog.label_search_status.setText("Search stopped, {} cells found".format(found))
+
+    def discard_search_results(self):
+        """
+        Stops the search and drops its hits once rows or columns are inserted or removed, the hits would point to other
+        cells
+        """
+        if self.find_dialog_reference is None:
+            return
+        self.cancel_search()
+        if self.find_dialog_reference.results_model.rowCount():
+            self.find_dialog_reference.results_model.clear()
+            self.find_dialog_reference.btn_replace_all.setEnabled(False)
+            self.find_dialog_reference.label_search_status.setText("The table has changed, search again")
+
+    def show_search_hit(self, index):
+        """
+        Makes the cell of a hit the current cell of the table
+        :param index: index of the hit in the list of results
+        """
+        row, column = self.find_dialog_reference.results_model.hits[index.row()]
+        view_row = self.table_model.view_row(row)
+        if view_row < 0:
+            self.find_dialog_reference.label_search_status.setText("This row is hidden by the filter")
+            return
+        if not self.column_visibility.is_visible(column):
+            self.find_dialog_reference.label_search_status.setText("This column is hidden")
+            return
+        cell = self.table_model.index(view_row, column)
+        self.csv_data_table.setCurrentIndex(cell)
+        self.csv_data_table.scrollTo(cell)
+
+    def replace_all_hits(self):
+        """
+        Replaces the matches in all the cells found by the last search as a single edit
+        The cells edited since the search are checked again, the ones which no longer match are left untouched
+        """
+        dialog = self.find_dialog_reference
+        query = dialog.results_model.query
+        replacement = dialog.replace_edit.text()
+        store = self.table_model.store
+
+        QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            edits = []
+            for row, column in dialog.results_model.hits:
+                old_value = store.value(row, column)
+                if query.matches(old_value):
+                    new_value = query.replace(old_value, replacement)
+                    if new_value != old_value:
+                        edits.append((row, column, old_value, new_value))
+            self.table_model.edit_cells(edits)
+        except search.SearchSyntaxError as error:
+            dialog.label_search_status.setText(str(error))
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        dialog.results_model.clear()
+        dialog.btn_replace_all.setEnabled(False)
+        dialog.label_search_status.setText("Replaced in {} cells".format(len(edits)))
+
+    def sort_by_selected_columns(self, ascending):
+        """
+        Sorts the rows by the fully selected columns from left to right, or by the column of the current cell
+        Sorting again by the same columns after editing them only moves the edited rows
+        :param ascending: direction of the sort for all the columns
+        """
+        self.flush_ui_state()
+        columns = self.selected_columns
+        if not columns:
+            current = self.csv_data_table.currentIndex()
+            if not current.isValid():
+                return
+            columns = [current.column()]
+
+        self.sort_rows([sorting.SortKey(column, ascending) for column in columns])
+
+    def sort_rows(self, keys):
+        """
+        Sorts the rows by the given keys, or puts them back in the file order for an empty list
+        :param keys: list of sorting.SortKey
+        """
+        self.change_shown_rows(lambda: self.table_model.sort_rows(keys))
+
+    def apply_filter(self):
+        """
+        Shows only the rows matching the filter typed in the filter bar, all the rows for a blank filter
+        """
+        try:
+            row_filter = filtering.parse(self.filter_edit.text(), self.table_model.store.headers)
+        except filtering.FilterSyntaxError as error:
+            self.label_filter_status.setText(str(error))
+            return
+        if row_filter is None and self.table_model.row_filter is None:
+            self.update_filter_status()
+            return
+        self.change_shown_rows(lambda: self.table_model.filter_rows(row_filter))
+
+    def on_filter_text_changed(self, text):
+        """
+        Shows all the rows again once the filter bar is cleared
+        """
+        if not text and self.table_model.row_filter is not None:
+            self.apply_filter()
+
+    def update_filter_status(self):
+        """
+        Shows the number of rows kept by the filter next to the filter bar
+        """
+        if self.table_model.row_filter is None:
+            self.label_filter_status.setText('')
+        else:
+            self.label_filter_status.setText('{} of {} rows'.format(self.table_model.rowCount(),
+                                                                     self.table_model.store.row_count()))
+
+    def change_shown_rows(self, change):
+        """
+        Sorts or filters the rows of the view, the fully selected columns stay selected, any other selection is cleared
+        :param change: function changing the rows shown by the table model
+        """
+        self.flush_ui_state()
+        column_ranges = self.selected_column_ranges
+        selection_model = self.csv_data_table.selectionModel()
+        # The selection model would move every selected cell one by one to follow the rows, a whole column becomes a
+        # million of single cell ranges, so the selection is dropped during the sort and the columns selected again
+        selection_model.clearSelection()
+
+        QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            change()
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.invalidate_ui_state(UI_TOOLBAR_INFO)
+
+        last_row = self.table_model.rowCount() - 1
+        if column_ranges and last_row >= 0:
+            columns_selection = QItemSelection()
+            for first, count in column_ranges:
+                columns_selection.select(self.table_model.index(0, first),
+                                         self.table_model.index(last_row, first + count - 1))
+            selection_model.select(columns_selection, QItemSelectionModel.Select)
+
+    def update_sort_options(self):
+        """
+        Shows the direction of the most significant sort key in the header and enables going back to the file order
+        """
+        header = self.csv_data_table.horizontalHeader()
+        keys = self.table_model.sort_keys
+        if keys:
+            header.setSortIndicator(keys[0].column, QtCore.Qt.AscendingOrder if keys[0].ascending
+                                    else QtCore.Qt.DescendingOrder)
+        header.setSortIndicatorShown(bool(keys))
+        self.action_clear_sort.setEnabled(not self.rows_streaming and self.table_model.rows_reordered)
 
     def set_save_enabled(self, enabled):
         """
@@ -389,34 +900,92 @@ class CsvEditor(QMainWindow):
         Saves the file to disk by giving option to select file from file dialog
         """
 
-        file_save_path = QFileDialog.getSaveFileName(self, 'Save CSV', "", 'CSV(*.csv)')
+        file_save_path = QFileDialog.getSaveFileName(self, 'Save CSV', "", SAVE_FILE_FILTER)
 
         if file_save_path[0]:
-            with open(file_save_path[0], 'w', newline="") as csv_file:
-                writer = csv.writer(csv_file)
-                # Add the header row explicitly
-                writer.writerow(self.column_headers)
-                for row in range(self.csv_data_table.rowCount()):
-                    row_data = []
-                    for column in range(self.csv_data_table.columnCount()):
-
-                        # Check if the current column is set to be visible, if not skip it
-                        if self.csv_data_table.isColumnHidden(column):
-                            continue
-
-                        item = self.csv_data_table.item(row, column)
-                        if item is not None:
-                            row_data.append(item.text())
-                        else:
-                            row_data.append('')
-                    writer.writerow(row_data)
-
-            # Set the flag to no changes in current file state
-            self.file_changed = False
-            self.set_save_enabled(False)
-
-            # TODO: add a better variant of message box compared to about like sucess, critical, warning etc according to context
-            QMessageBox.about(self, "Success!", "Your file has been saved successfully.")
+            store = self.table_model.store
+            # Snapshot of the columns set to be visible, the hidden ones are skipped
+            visible_columns = self.column_visibility.visible_columns()
+
+            # The rows of a sorted view may be written in either order, all the rows are written even if filtered
+            row_order = self.table_model.store_order()
+            if row_order is not None:
+                choice = QMessageBox.question(self, 'Save File',
+                                              "The rows are sorted. Do you want to save them in the sorted order?\n"
+                                              "Choose No to keep their original order.",
+                                              QMessageBox.Yes | QMessageBox.No)
+                if choice != QMessageBox.Yes:
+                    row_order = None
+
+            # The dialog is modal, so the table can not be edited while the rows are streamed by the saver thread
+            self.saving_progress = QProgressDialog("Writing Rows. Please wait...", "Cancel", 0,
+                                                   CsvSaverWorker.progress_steps, self)
+            self.saving_progress.setWindowTitle("Saving CSV File...")
+            self.saving_progress.setWindowModality(QtCore.Qt.WindowModal)
+            self.saving_progress.setWindowFlags(self.saving_progress.windowFlags() | QtCore.Qt.CustomizeWindowHint)
+            self.saving_progress.setWindowFlags(self.saving_progress.windowFlags() & ~QtCore.Qt.WindowCloseButtonHint)
+            self.saving_progress.setValue(0)
+
+            self.saving_worker = CsvSaverWorker(store, visible_columns, file_save_path[0], self.csv_format,
+                                                row_order)
+            self.saving_thread = QThread()
+
+            self.saving_worker.moveToThread(self.saving_thread)
+            self.saving_worker.workRequested.connect(self.saving_thread.start)
+            self.saving_thread.started.connect(self.saving_worker.process_saving_file)
+            self.saving_worker.finished.connect(self.on_saving_finish)
+            self.saving_worker.cancelled.connect(self.on_saving_stopped)
+            self.saving_worker.failed.connect(self.on_saving_failed)
+            self.saving_worker.relay.connect(self.saving_progress.setValue)
+            self.saving_progress.canceled.connect(self.cancel_saving)
+
+            self.saving_worker.request_work()
+
+    def cancel_saving(self):
+        """
+        Slot for the cancel button of the saving progress dialog
+        The worker is busy in its loop, hence the flag is set directly instead of through a queued signal
+        """
+        self.saving_worker.cancel()
+
+    def on_saving_finish(self):
+        """
+        Invoked when the saver thread has written and replaced the destination file
+        """
+        self.on_saving_stopped()
+
+        # Set the flag to no changes in current file state
+        self.file_changed = False
+        self.set_save_enabled(False)
+
+        # TODO: add a better variant of message box compared to about like sucess, critical, warning etc according to context
+        QMessageBox.about(self, "Success!", "Your file has been saved successfully.")
+
+    def on_saving_failed(self, message):
+        """
+        Invoked when the saver thread could not write the file, the destination file is left untouched
+        :param message: description of the error
+        """
+        self.on_saving_stopped()
+        QMessageBox.critical(self, "Error!", "The file could not be saved.\n" + message)
+
+    def on_saving_stopped(self):
+        """
+        Hides the progress dialog and stops the saver thread once the saving is over, whatever the outcome
+        """
+        # reset() hides the dialog without emitting canceled unlike close()
+        self.saving_progress.reset()
+        self.saving_thread.quit()
+        self.saving_thread.wait()
+        self.saving_thread = None
+
+    def wait_for_saving(self):
+        """
+        Processes the events until the file being saved in the background is written
+        """
+        # The thread reference is cleared by the slots of the worker signals, whichever ends the saving
+        while self.saving_thread is not None:
+            QApplication.processEvents(QEventLoop.WaitForMoreEvents)
 
     def prompt_save_before_closing(self):
         """
@@ -427,6 +996,8 @@ class CsvEditor(QMainWindow):
                                           QMessageBox.Yes | QMessageBox.No)
             if choice == QMessageBox.Yes:
                 self.save_file()
+                # The file is closed or the application exits right after, so the saving must be over by then
+                self.wait_for_saving()
 
     def close_file(self):
         """
@@ -443,15 +1014,24 @@ class CsvEditor(QMainWindow):
         self.action_add_data.setEnabled(False)
         self.action_add_column.setEnabled(False)
         self.column_visibility_dialog_reference = None
+        # Disable the search and stop the running one before the store it reads is closed by the reset of the table
+        self.action_find_replace.setEnabled(False)
+        if self.find_dialog_reference is not None:
+            self.cancel_search()
+            self.find_dialog_reference.hide()
         # Disable other file related options
         self.action_toolbar_add_data.setEnabled(False)
         self.action_close_file.setEnabled(False)
 
-        self.column_headers_all = []
-        self.column_headers = []
+        # Stop treating the table as loading when the file is closed before the last chunk
+        self.rows_streaming = False
+        self.filter_edit.setEnabled(True)
 
         # Clear the populated table
-        self.csv_data_table.setRowCount(0)
+        self.table_model.set_store(ColumnStore())
+        self.filter_edit.clear()
+        self.smooth_curve_cache = None
+        self.csv_format = csv_io.CsvFormat()
 
         # Remove plot and file page tab
         try:
@@ -497,57 +1077,98 @@ class CsvEditor(QMainWindow):
          This function is a slot invoked when there is any change in the currently selected cells content
         """
 
-        # Add exception handling for case when new row is added to unmodified file to avoid crash
-        try:
-            if self.check_cell_change:
-                row = self.csv_data_table.currentRow()
-                col = self.csv_data_table.currentColumn()
-                value = self.csv_data_table.item(row, col).text()
-
-                self.set_bottom_toolbar_info()
-
-        except:
-            pass
-        finally:
-            # Set the flag to changes in current file state
-            if self.check_cell_change:
-                self.file_changed = True
-                self.set_save_enabled(True)
+        if self.check_cell_change:
+            # Set the flag to changes in current file state, the text length shown by the toolbar may have changed
+            self.mark_file_changed()
+            self.invalidate_ui_state(UI_TOOLBAR_INFO)
 
     def cell_selection_changed(self):
         """
         This slot gets invoked when the cell selection is changed
+        The selection dependent state is recomputed by update_selection_state once the pending events are processed
+        """
+        if self.bulk_editing:
+            return
+
+        self.invalidate_ui_state(UI_SELECTION)
+
+    def mark_file_changed(self):
+        """
+        Flags the file as modified, the save options are enabled by the next update of the UI state
+        """
+        self.file_changed = True
+        self.invalidate_ui_state(UI_SAVE_OPTIONS)
+
+    def invalidate_ui_state(self, parts):
+        """
+        Marks parts of the UI state as stale, they are recomputed together once the pending events are processed
+        :param parts: combination of the UI_* flags
+        """
+        self.stale_ui_state |= parts
+        if not self.ui_state_timer.isActive():
+            self.ui_state_timer.start()
+
+    def flush_ui_state(self):
+        """
+        Recomputes the stale parts of the UI state right away, for the actions relying on them
+        """
+        if self.stale_ui_state:
+            self.ui_state_timer.stop()
+            self.update_ui_state()
+
+    def update_ui_state(self):
+        """
+        Recomputes the stale parts of the UI state, invoked by the zero delay timer
+        """
+        stale, self.stale_ui_state = self.stale_ui_state, 0
+
+        if stale & UI_SELECTION:
+            self.update_selection_state()
+            # The bottom toolbar shows the selected cell count and the current cell, the statistics panel its column
+            stale |= UI_TOOLBAR_INFO | UI_STATISTICS
+        if stale & UI_TOOLBAR_INFO:
+            self.set_bottom_toolbar_info(default_values=self.toolbar_placeholders)
+        if stale & UI_SAVE_OPTIONS:
+            self.set_save_enabled(self.file_changed)
+        if stale & UI_HISTORY_OPTIONS:
+            self.update_undo_redo_options()
+        if stale & UI_STATISTICS and self.statistics_dock.isVisible():
+            self.update_statistics_panel()
+
+    def update_selection_state(self):
+        """
+        Updates the summary of the selection and the options depending on it
         This also helps us to find out if there is any selection at all and thus enabled delete, edit cell menu options
         """
+        # Everything is derived from the selected rectangles, so a selection of the whole table costs as little as
+        # a single cell
+        rectangles = [(selection_range.top(), selection_range.left(), selection_range.bottom(), selection_range.right())
+                      for selection_range in self.csv_data_table.selectionModel().selection()]
+        summary = selection.summarize(rectangles, self.table_model.rowCount(), self.table_model.columnCount())
+        self.selected_cell_count = summary.cell_count
+
         # Enable Edit Cell menu if a single cell is selection else disable it
-        self.cells_selected = self.csv_data_table.selectionModel().selectedIndexes()
-        if len(self.cells_selected) == 1:
+        if self.selected_cell_count == 1:
             self.action_edit_data.setEnabled(True)
         else:
             self.action_edit_data.setEnabled(False)
 
-        # Enable delete options iff 1 or more cells are selected
-        if len(self.cells_selected) >= 1:
+        # Enable delete and sort options iff 1 or more cells are selected and all the rows are loaded
+        if self.selected_cell_count >= 1 and not self.rows_streaming:
             self.action_delete_selected.setEnabled(True)
             self.action_toolbar_delete_selected.setEnabled(True)
         else:
             self.action_delete_selected.setEnabled(False)
             self.action_toolbar_delete_selected.setEnabled(False)
+        self.action_sort_ascending.setEnabled(self.selected_cell_count >= 1 and not self.rows_streaming)
+        self.action_sort_descending.setEnabled(self.selected_cell_count >= 1 and not self.rows_streaming)
 
-        # Add a way to identify all the currently selected columns
-        cols = self.csv_data_table.selectionModel().selectedColumns()
-        self.selected_columns = []
-        for index in sorted(cols):
-            col = index.column()
-            self.selected_columns.append(col)
-
-        rows = self.csv_data_table.selectionModel().selectedRows()
-        self.selected_rows = []
-        for index in sorted(rows):
-            row = index.row()
-            self.selected_rows.append(row)
-
-        self.set_bottom_toolbar_info()
+        # Identify all the currently selected columns, and the selected rows as ranges of consecutive rows
+        self.selected_columns = summary.columns()
+        self.selected_column_ranges = summary.column_ranges
+        self.selected_row_ranges = summary.row_ranges
+        self.csv_data_table.horizontalHeader().set_selected_sections(self.selected_columns,
+                                                                     summary.intersected_columns())
 
         # Enable plot toolbars iff exactly 2 columns are selected
         if len(self.selected_columns) == 2:
@@ -555,22 +1176,57 @@ class CsvEditor(QMainWindow):
         else:
             self.set_plot_options(False)
 
-    def hide_invisible_headers(self):
+    def on_statistics_visibility_changed(self, visible):
+        if visible:
+            self.invalidate_ui_state(UI_STATISTICS)
+
+    def update_statistics_panel(self):
+        """
+        Shows the statistics of all the rows of the column of the current cell in the statistics panel
+        The statistics are cached by the model and updated by the edits, only a column shown for the first time or
+        changed too much since is scanned
+        """
+        column = self.csv_data_table.currentIndex().column()
+        if self.toolbar_placeholders or column < 0:
+            self.label_statistics_column.setText("No column selected")
+            for name in column_stats.SUMMARY_FIELDS:
+                getattr(self, 'label_statistics_' + name).setText("-")
+            return
+
+        QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            column_statistics = self.table_model.column_statistics(column)
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        self.label_statistics_column.setText("{} (all {} rows)".format(self.table_model.header(column),
+                                                                       self.table_model.store.row_count()))
+        summary = column_stats.summarize(column_statistics, SearchResultsModel.max_text_length)
+        for name, text in summary.items():
+            getattr(self, 'label_statistics_' + name).setText(text)
+
+    def apply_column_visibility(self, flags):
         """
         Helper function for the column visibility modal window
-        core logic for actually hidding a column from view
-        :return:
+        core logic for actually hidding a column from view, only the columns whose visibility changed are updated
+        :param flags: sequence of one boolean per column, True for the columns to show
         """
-        # Hide all the non selected columns
-        col_index = 0
-        for header in self.column_headers_all:
-            if header in self.column_headers:
-                self.csv_data_table.setColumnHidden(col_index, False)
-                self.file_changed = True
-                self.set_save_enabled(True)
-            else:
-                self.csv_data_table.setColumnHidden(col_index, True)
-            col_index = col_index + 1
+        changed_columns = self.column_visibility.apply(flags)
+        for column in changed_columns:
+            self.csv_data_table.setColumnHidden(column, not self.column_visibility.is_visible(column))
+
+        # Only the visible columns are saved, so the file is modified once for the whole layout
+        if changed_columns:
+            self.mark_file_changed()
+
+    def on_columns_reset(self):
+        self.column_visibility.reset(self.table_model.columnCount())
+
+    def on_columns_inserted(self, parent, first, last):
+        self.column_visibility.insert(first, last - first + 1)
+
+    def on_columns_removed(self, parent, first, last):
+        self.column_visibility.remove(first, last - first + 1)
 
     def set_bottom_toolbar_info(self, default_values=False):
         """
@@ -578,6 +1234,9 @@ class CsvEditor(QMainWindow):
         column count, row count, selected cells, text length, source file, current selection etc
         :param default_values: boolean tells us if the file is not yet loaded and hence show the place holder values
         """
+        # The place holder values are kept by the later updates until a file is shown again
+        self.toolbar_placeholders = default_values
+
         # Fill the info for the bottom toolbar
         if default_values:
             self.action_toolbar_bottom_column_count.setIconText("Column count -")
@@ -587,21 +1246,21 @@ class CsvEditor(QMainWindow):
             self.action_toolbar_bottom_row.setIconText("Row -")
             self.action_toolbar_bottom_selected_cells.setIconText("Selected Cells -")
             self.action_toolbar_bottom_text_length.setIconText("Text Length -")
-            self.cells_selected = []
+            self.selected_cell_count = 0
             self.csv_file_name = 'No Source'
         else:
+            current = self.csv_data_table.currentIndex()
             self.action_toolbar_bottom_column_count.setIconText(
-                "Column count " + str(self.csv_data_table.columnCount()))
-            self.action_toolbar_bottom_row_count.setIconText("Row count " + str(self.csv_data_table.rowCount()))
+                "Column count " + str(self.table_model.columnCount()))
+            self.action_toolbar_bottom_row_count.setIconText("Row count " + str(self.table_model.rowCount()))
             self.action_toolbar_bottom_source.setIconText("Source: " + self.csv_file_name)
-            self.action_toolbar_bottom_column.setIconText("Column " + str(self.csv_data_table.currentColumn() + 1))
-            self.action_toolbar_bottom_row.setIconText("Row " + str(self.csv_data_table.currentRow() + 1))
-            self.action_toolbar_bottom_selected_cells.setIconText("Selected Cells " + str(len(self.cells_selected)))
-        try:
-            row = self.csv_data_table.currentRow()
-            col = self.csv_data_table.currentColumn()
-            value = self.csv_data_table.item(row, col).text()
-        except:
+            self.action_toolbar_bottom_column.setIconText("Column " + str(current.column() + 1))
+            self.action_toolbar_bottom_row.setIconText("Row " + str(current.row() + 1))
+            self.action_toolbar_bottom_selected_cells.setIconText("Selected Cells " + str(self.selected_cell_count))
+        current = self.csv_data_table.currentIndex()
+        if current.isValid():
+            value = self.table_model.data(current)
+        else:
             value = ''
         self.action_toolbar_bottom_text_length.setIconText("Text Length " + str(len(value)))
 
@@ -629,21 +1288,21 @@ class CsvEditor(QMainWindow):
         Invoke the shared plotting function with parameter 1
         1 indicates to plot scatter points
         """
-        self.plot(1)
+        self.plot(plotting.PLOT_SCATTER)
 
     def plot_scatter_points_lines(self):
         """
         Invoke the shared plotting function with parameter 2
         2 indicates to plot scatter points with smooth curve
         """
-        self.plot(2)
+        self.plot(plotting.PLOT_SCATTER_LINE)
 
     def plot_lines(self):
         """
         Invoke the shared plotting function with parameter 3
         2 indicates to plot lines
         """
-        self.plot(3)
+        self.plot(plotting.PLOT_LINE)
 
     def set_plot_title(self):
         """
@@ -652,11 +1311,10 @@ class CsvEditor(QMainWindow):
         plot_title = self.input_plot_title.text()
         if plot_title:
             self.plot_title = self.input_plot_title.text()
-            # Redraw the plot with given title
-            if not self.plot_inverted:
-                self.draw_plot(self.data_x_axis, self.data_y_axis, self.label_x_axis, self.label_y_axis)
-            else:
-                self.draw_plot(self.data_y_axis, self.data_x_axis, self.label_y_axis, self.label_x_axis)
+            # Only the title text changes, the axes and the artists are kept as they are
+            if self.plot_suptitle is not None:
+                self.plot_suptitle.set_text(self.plot_title)
+                self.canvas.draw_idle()
         else:
             QMessageBox.about(self, "Error!", "Please enter a title to set in the plot")
 
@@ -667,30 +1325,77 @@ class CsvEditor(QMainWindow):
         """
         self.plot_inverted = not self.plot_inverted
 
-        if not self.plot_inverted:
-            self.draw_plot(self.data_x_axis, self.data_y_axis, self.label_x_axis, self.label_y_axis)
-        else:
-            self.draw_plot(self.data_y_axis, self.data_x_axis, self.label_y_axis, self.label_x_axis)
+        if self.plot_axes is None or not plotting.is_numeric(self.data_x_axis) or \
+                not plotting.is_numeric(self.data_y_axis):
+            # Text values are mapped to categories of their own axis, so the plot has to be built again
+            if not self.plot_inverted:
+                self.draw_plot(self.data_x_axis, self.data_y_axis, self.label_x_axis, self.label_y_axis)
+            else:
+                self.draw_plot(self.data_y_axis, self.data_x_axis, self.label_y_axis, self.label_x_axis)
+            return
+
+        # Swap the data of the existing artists instead of building the plot again
+        ax = self.plot_axes
+        for artist in ax.lines:
+            data_x_axis, data_y_axis = artist.get_data()
+            artist.set_data(data_y_axis, data_x_axis)
+        for artist in ax.collections:
+            artist.set_offsets(artist.get_offsets()[:, ::-1])
+        self.decimated_artists = [(artist, data_y_axis, data_x_axis, line)
+                                  for artist, data_x_axis, data_y_axis, line in self.decimated_artists]
+
+        x_label, y_label = ax.get_xlabel(), ax.get_ylabel()
+        ax.set_xlabel(y_label)
+        ax.set_ylabel(x_label)
+
+        # The displayed points are the same after swapping, so the limits are swapped without decimating again
+        x_limits, y_limits = ax.get_xlim(), ax.get_ylim()
+        ax.set_xlim(y_limits, emit=False)
+        ax.set_ylim(x_limits, emit=False)
+        self.canvas.draw_idle()
+
+    @staticmethod
+    def plotted_values(store, column, numeric):
+        """
+        Returns the values of a column to plot, an array for a numeric column and the list of its texts otherwise
+        :param numeric: result of store.numeric_values for the column
+        """
+        if numeric is None:
+            return store.column_values(column)
+        values, nulls = numeric
+        return np.where(nulls, 0, values)
 
     def plot(self, plotType):
         """
         The parent function for setting parameters for plotting and calling the draw function to render the plot
         :param plotType: defines which type of plot is to be rendered
         """
-        # Build plotting data
-        self.data_x_axis = []
-        self.data_y_axis = []
-        for i in range(0, self.csv_data_table.rowCount()):
-            value = self.csv_data_table.item(i, self.selected_columns[0]).text()
-            self.data_x_axis.append(value)
-            value = self.csv_data_table.item(i, self.selected_columns[1]).text()
-            self.data_y_axis.append(value)
-
-        self.label_x_axis = self.csv_data_table.horizontalHeaderItem(self.selected_columns[0]).text()
-        self.label_y_axis = self.csv_data_table.horizontalHeaderItem(self.selected_columns[1]).text()
+        # Build plotting data from the selected columns
+        self.flush_ui_state()
+        plot_span = instrumentation.span('plot-build', plot_type=plotType)
+        store = self.table_model.store
+        # Numeric columns are already stored as arrays, blank cells are plotted as 0, the other columns are plotted as
+        # their texts without attempting the conversion, so only they are formatted to strings
+        numeric_x_axis = store.numeric_values(self.selected_columns[0])
+        numeric_y_axis = store.numeric_values(self.selected_columns[1])
+        self.data_x_axis = self.plotted_values(store, self.selected_columns[0], numeric_x_axis)
+        self.data_y_axis = self.plotted_values(store, self.selected_columns[1], numeric_y_axis)
+
+        self.label_x_axis = self.table_model.header(self.selected_columns[0])
+        self.label_y_axis = self.table_model.header(self.selected_columns[1])
+
+        # Any edit of either column, sort or filter changes a version and so invalidates the cached smooth curve
+        self.plot_data_version = (store.column_version(self.selected_columns[0]),
+                                  store.column_version(self.selected_columns[1]),
+                                  self.table_model.row_order_version)
 
         # Avoid duplication of resources if already allocated
         if self.figure is None:
+            # The plotting stack is imported by the first plot only, most sessions never plot
+            import matplotlib.pyplot as plt
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+            from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+
             self.figure = plt.figure()
             self.canvas = FigureCanvas(self.figure)
 
@@ -698,6 +1403,10 @@ class CsvEditor(QMainWindow):
             self.plot_frame_horizontal.addWidget(self.canvas)
             # self.plot_frame_horizontal.addStretch()
 
+            # Toolbar for zooming and panning, the visible range is decimated again on every zoom
+            self.plot_navigation_toolbar = NavigationToolbar(self.canvas, self.plot_page_tab)
+            self.gridLayout_3.addWidget(self.plot_navigation_toolbar, 2, 0)
+
         # Ensures only 2 tabs at max are open at a time - file and plot tabs respectively
         if self.tabWidget.count() == 1:
             self.tabWidget.insertTab(1, self.plot_page_tab, "Plot")
@@ -707,60 +1416,23 @@ class CsvEditor(QMainWindow):
         # Set plot type (1,2,3 => order according to scatter, scatter-line, line)
         self.plotType = plotType
 
-        # Convert the data to np arrays if it is purely numerical
-        try:
-            for i in range(0, len(self.data_x_axis)):
-                if self.data_x_axis[i] == '':
-                    self.data_x_axis[i] = 0
-                if self.data_y_axis[i] == '':
-                    self.data_y_axis[i] = 0
-
-                self.data_x_axis[i] = self.coerce_str_to_number(self.data_x_axis[i])
-                self.data_y_axis[i] = self.coerce_str_to_number(self.data_y_axis[i])
-
-            self.data_x_axis = np.array(self.data_x_axis)
-            self.data_y_axis = np.array(self.data_y_axis)
-
-            print(self.data_x_axis)
-            print(self.data_y_axis)
-
-            print("In specialized plotting")
-
-        except:
-            pass
-            # Dont attempt the conversion, directly plot
-            print("In generic plotting")
+        # The rows shown by the table are plotted in their order
+        row_order = self.table_model.row_order
+        if row_order is not None:
+            self.data_x_axis = self.reorder_rows(self.data_x_axis, row_order)
+            self.data_y_axis = self.reorder_rows(self.data_y_axis, row_order)
+        plot_span.end(points=len(self.data_x_axis), numeric=numeric_x_axis is not None and numeric_y_axis is not None)
 
         self.draw_plot(self.data_x_axis, self.data_y_axis, self.label_x_axis, self.label_y_axis)
 
-    # Made some modifications in function from here to suit needs
-    # https://stackoverflow.com/a/15357477/4126370
-    def isfloat(self, x):
-        try:
-            a = float(x)
-        except ValueError:
-            return False
-        else:
-            return True
-
-    def isint(self, x):
-        try:
-            a = float(x)
-            b = int(a)
-        except ValueError:
-            return False
-        else:
-            return a == b
-
-    def coerce_str_to_number(self, x):
-        if self.isint(x):
-            x = int(x)
-            return x
-        elif self.isfloat(x):
-            x = float(x)
-            return x
-        else:
-            raise ("cant coerce")
+    @staticmethod
+    def reorder_rows(data, row_order):
+        """
+        Returns the values of a column, as an array or a list, in the order of the rows of the view
+        """
+        if isinstance(data, np.ndarray):
+            return data[row_order]
+        return [data[row] for row in row_order.tolist()]
 
     def draw_plot(self, data_x_axis, data_y_axis, label_x_axis, label_y_axis):
         """
@@ -771,53 +1443,61 @@ class CsvEditor(QMainWindow):
         :param label_y_axis: text for label for y axis
         """
 
-        # Flipped tells us whether to invert the current x, y axis
-        self.figure.clear()
-
-        # Fix for plot having cutoff text or labels
-        self.figure.tight_layout()
-        self.figure.subplots_adjust(left=0.1, right=0.9, bottom=0.3, top=0.9)
-
-        self.figure.suptitle(self.plot_title)
-
-        ax = self.figure.add_subplot(111)
-
-        # Add another argument fontsize = 10 to change the fontsize of the labels
-        ax.set_xlabel(label_x_axis)
-        ax.set_ylabel(label_y_axis)
-
-        ax.xaxis.set_major_locator(plt.MaxNLocator(10))
-        ax.yaxis.set_major_locator(plt.MaxNLocator(10))
-
-        if self.plotType == 1:
-            ax.scatter(data_x_axis, data_y_axis)
-
-        elif self.plotType == 2:
-            # SMOOTH CURVE CURRENTLY WORKS ONLY WITH INTEGRAL VALUES
-            # Smoothen the curve points
-            try:
-                T = data_x_axis
-                power = data_y_axis
-
-                xnew = np.linspace(T.min(), T.max(),
-                                   300)  # 300 represents number of points to make between T.min and T.max
+        with instrumentation.span('draw', plot_type=self.plotType, points=len(data_x_axis)):
+            # Flipped tells us whether to invert the current x, y axis
+            curve = self.cached_smooth_curve(data_x_axis, data_y_axis) \
+                if self.plotType == plotting.PLOT_SCATTER_LINE else None
+            self.plot_suptitle, ax, self.decimated_artists = plotting.draw_figure(
+                self.figure, data_x_axis, data_y_axis, label_x_axis, label_y_axis, self.plot_title, self.plotType,
+                max(self.canvas.width(), 100), curve)
+            self.plot_axes = ax
 
-                spl = make_interp_spline(T, power, k=3)  # BSpline object
-                power_smooth = spl(xnew)
-                ax.scatter(data_x_axis, data_y_axis)
-                ax.plot(xnew, power_smooth, marker='o')
-            except:
-                # Switch to normal plot if the data is not purely numeric in which case a smooth curve is not possible
-                ax.plot(data_x_axis, data_y_axis, marker='o')
+            if self.decimated_artists:
+                ax.callbacks.connect('xlim_changed', self.decimate_visible_range)
 
-        else:
-            ax.plot(data_x_axis, data_y_axis)
-
-        self.canvas.draw()
+            self.canvas.draw()
         # Enable the option as plot is now drawn
         self.action_save_plot_png.setEnabled(True)
         self.action_toolbar_save_plot_png.setEnabled(True)
 
+    def cached_smooth_curve(self, data_x_axis, data_y_axis):
+        """
+        Returns the smooth curve of the scatter-line plot, the spline is only fitted again when the plotted columns
+        or their versions have changed since the last fit
+        :param data_x_axis: array having the items of x axis
+        :param data_y_axis: array having the items of y axis
+        """
+        if self.smooth_curve_cache is None or self.smooth_curve_cache[0] != self.plot_data_version:
+            self.smooth_curve_cache = (self.plot_data_version, plotting.smooth_curve(data_x_axis, data_y_axis))
+        return self.smooth_curve_cache[1]
+
+    def decimate_for_canvas(self, data_x_axis, data_y_axis, line):
+        """
+        Reduces the points to what the canvas can actually show, non numeric data is returned unchanged
+        :param data_x_axis: array having the items of x axis
+        :param data_y_axis: array having the items of y axis
+        :param line: whether the points are drawn as a line (min/max per pixel) or as points (LTTB)
+        """
+        return plotting.decimate(data_x_axis, data_y_axis, line, max(self.canvas.width(), 100))
+
+    def decimate_visible_range(self, ax):
+        """
+        Invoked when the x range of the plot changes on zoom or pan
+        Decimates the visible part of the full resolution data again so zooming in reveals the details
+        :param ax: the axes whose limits have changed
+        """
+        x_min, x_max = ax.get_xlim()
+        for artist, data_x_axis, data_y_axis, line in self.decimated_artists:
+            if not plotting.is_numeric(data_x_axis) or not plotting.is_numeric(data_y_axis):
+                continue
+            visible_x, visible_y = plotting.visible_points(data_x_axis, data_y_axis, x_min, x_max)
+            visible_x, visible_y = self.decimate_for_canvas(visible_x, visible_y, line)
+            if line or not hasattr(artist, 'set_offsets'):
+                artist.set_data(visible_x, visible_y)
+            else:
+                artist.set_offsets(np.column_stack((visible_x, visible_y)))
+        self.canvas.draw_idle()
+
     def save_plot_as_png(self):
         """
         Displays file dialog to save the current plot as png when the save plot as png button is clicked
@@ -838,6 +1518,26 @@ class CsvEditor(QMainWindow):
         self.tabWidget.setCurrentIndex(0)
         self.plot_page_tab = tmp_tab_reference
 
+    def on_record_profile_toggled(self, checked):
+        """
+        Starts profiling the actions when the record profile option is checked, and saves the profile of everything
+        done meanwhile to a .prof file when it is unchecked, eg. to attach it to a bug report
+        :param checked: whether the option is now checked
+        """
+        if checked:
+            instrumentation.start_profiling()
+            return
+
+        file_save_path = QFileDialog.getSaveFileName(self, 'Save Profile', "editor.prof", "Profile (*.prof)")
+        try:
+            # The profile is discarded if the dialog is cancelled
+            instrumentation.stop_profiling(file_save_path[0])
+        except OSError as error:
+            QMessageBox.critical(self, "Error!", "The profile could not be saved.\n" + str(error))
+            return
+        if file_save_path[0]:
+            QMessageBox.about(self, "Success!", "The profile has been saved successfully.")
+
 
 # Dialog window for show/hide Column visibility feature
 class ColumnLayoutDialog(QDialog):
@@ -847,71 +1547,959 @@ class ColumnLayoutDialog(QDialog):
         # define UI file paths
         RESOURCE_PATH = os.path.dirname(__file__)  # <-- absolute dir the script is in
         contentlayoutdialogui_file = os.path.join(RESOURCE_PATH, "ui/contentlayoutdialog.ui")
-        uic.loadUi(contentlayoutdialogui_file, self)
+        ui_cache.load_ui(contentlayoutdialogui_file, self)
 
-        self.visible_headers_list = []
+        # The list view only creates the rows in its viewport, whatever the number of columns of the file
+        self.column_picker_model = ColumnPickerModel(self)
+        self.column_list_view.setModel(self.column_picker_model)
 
-        self.btn_save_header_view.clicked.connect(self.save_header_list)
+        self.column_filter_edit.textChanged.connect(self.column_picker_model.set_filter)
+        self.btn_select_all_columns.clicked.connect(lambda: self.column_picker_model.set_all_checked(True))
+        self.btn_select_no_columns.clicked.connect(lambda: self.column_picker_model.set_all_checked(False))
 
-    def add_header_visible_options(self, header_list, visible_list):
+    def set_columns(self, headers, flags):
         """
-        Populates the checkbox list for all the columns present in the table
+        Populates the list with all the columns present in the table
         Also ensures already hidden column's checkbox remains unchecked
-        :param header_list: The list of all the columns in the table
-        :param visible_list: The list of currently visible colummns in the table
+        :param headers: The list of the headers of all the columns in the table
+        :param flags: The visibility of every column, it is copied so cancelling the dialog leaves it untouched
         """
         # TODO: On hidding the columns, the bottom info bar should reflect the changes
         # It doesnot work because it uses columnCount() which ignores the state of columns
 
-        layout = QVBoxLayout()
+        self.column_filter_edit.clear()
+        self.column_picker_model.set_columns(headers, flags)
 
-        for header in header_list:
-            print(header)
-            check_box = QCheckBox(header)
-            if self.visible_headers_list:
-                if header in self.visible_headers_list:
-                    check_box.setChecked(True)
-                else:
-                    check_box.setChecked(False)
+    def visible_flags(self):
+        """
+        Returns the visibility of every column as checked in the list
+        """
+        return self.column_picker_model.flags_checked
+
+
+class FindReplaceDialog(QDialog):
+    def __init__(self, table_model, parent=None):
+        super(FindReplaceDialog, self).__init__(parent)
+
+        # define UI file paths
+        RESOURCE_PATH = os.path.dirname(__file__)  # <-- absolute dir the script is in
+        findreplacedialogui_file = os.path.join(RESOURCE_PATH, "ui/findreplacedialog.ui")
+        ui_cache.load_ui(findreplacedialogui_file, self)
+
+        # The list view only creates the rows in its viewport, whatever the number of hits
+        self.results_model = SearchResultsModel(table_model, self)
+        self.results_view.setModel(self.results_model)
+
+
+# Hits of a search listed by the find and replace panel
+# The hits are kept as (row of the store, column) tuples, the row shown is the row of the view when the hit is painted
+class SearchResultsModel(QAbstractListModel):
+    # Longest text of a cell shown in the list
+    max_text_length = 200
+
+    def __init__(self, table_model, parent=None):
+        super(SearchResultsModel, self).__init__(parent)
+        self.table_model = table_model
+        self.query = None
+        self.hits = []
+
+    def clear(self, query=None):
+        """
+        Removes all the hits
+        :param query: query of the search whose hits are listed next
+        """
+        self.beginResetModel()
+        self.query = query
+        self.hits = []
+        self.endResetModel()
+
+    def append_hits(self, hits):
+        """
+        Appends a batch of hits, the ones in rows hidden by the filter are skipped
+        :param hits: list of (row of the store, column) tuples
+        """
+        if self.table_model.row_filter is not None:
+            hits = [hit for hit in hits if self.table_model.view_row(hit[0]) >= 0]
+        if not hits:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.hits), len(self.hits) + len(hits) - 1)
+        self.hits.extend(hits)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.hits)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        row, column = self.hits[index.row()]
+        view_row = self.table_model.view_row(row)
+        text = self.table_model.store.value(row, column)[:self.max_text_length]
+        location = "Row " + str(view_row + 1) if view_row >= 0 else "Hidden row"
+        return "{}, {}: {}".format(location, self.table_model.header(column), text)
+
+
+# Checkable list of the columns of the table shown by the column layout dialog
+# Only the indices of the columns matching the filter text are kept as rows, the check states live in a flag array
+class ColumnPickerModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super(ColumnPickerModel, self).__init__(parent)
+        self.headers = []
+        self.flags_checked = np.ones(0, dtype=bool)
+        self.rows = []
+
+    def set_columns(self, headers, flags):
+        """
+        :param headers: list of the headers of all the columns
+        :param flags: visibility of every column, copied
+        """
+        self.beginResetModel()
+        self.headers = list(headers)
+        self.flags_checked = np.array(flags, dtype=bool)
+        self.rows = list(range(len(self.headers)))
+        self.endResetModel()
+
+    def set_filter(self, text):
+        """
+        Shows only the columns whose header contains the text
+        """
+        self.beginResetModel()
+        self.rows = visibility.matching_columns(self.headers, text)
+        self.endResetModel()
+
+    def set_all_checked(self, checked):
+        """
+        Checks or unchecks all the columns matching the filter
+        """
+        if not self.rows:
+            return
+        self.flags_checked[self.rows] = checked
+        self.dataChanged.emit(self.index(0), self.index(len(self.rows) - 1), [QtCore.Qt.CheckStateRole])
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        column = self.rows[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            # Blank headers are shown with their position so they can still be told apart
+            return self.headers[column] or "(Column " + str(column + 1) + ")"
+        if role == QtCore.Qt.CheckStateRole:
+            return QtCore.Qt.Checked if self.flags_checked[column] else QtCore.Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if role != QtCore.Qt.CheckStateRole or not index.isValid():
+            return False
+        self.flags_checked[self.rows[index.row()]] = value == QtCore.Qt.Checked
+        self.dataChanged.emit(index, index, [QtCore.Qt.CheckStateRole])
+        return True
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsUserCheckable
+
+
+# Horizontal header of the table taking the selected columns from the selection summary of the editor
+# The default header asks the selection model whether every painted column is selected, which checks the flags of every
+# row of the column and makes any selection change cost O(rows) on large files
+class SelectionAwareHeaderView(QHeaderView):
+    def __init__(self, orientation, parent=None):
+        super(SelectionAwareHeaderView, self).__init__(orientation, parent)
+        self.selected_sections = frozenset()
+        self.highlighted_sections = frozenset()
+        # Same behaviour as the header created by the table view
+        self.setSectionsClickable(True)
+        self.setHighlightSections(True)
+
+    def set_selected_sections(self, sections, highlighted_sections):
+        """
+        Updates the selection state of the sections
+        :param sections: list of the logical indices of the fully selected sections
+        :param highlighted_sections: list of the logical indices of the sections having any selected cell
+        """
+        self.selected_sections = frozenset(sections)
+        self.highlighted_sections = frozenset(highlighted_sections)
+        self.viewport().update()
+
+    def paintSection(self, painter, rect, logical_index):
+        if not rect.isValid():
+            return
+
+        option = QStyleOptionHeader()
+        self.initStyleOption(option)
+        option.rect = rect
+        option.section = logical_index
+        option.orientation = self.orientation()
+        option.textAlignment = self.defaultAlignment()
+        option.iconAlignment = QtCore.Qt.AlignVCenter
+        text = self.model().headerData(logical_index, self.orientation(), QtCore.Qt.DisplayRole)
+        option.text = text if text is not None else ''
+
+        option.state = QStyle.State_None | QStyle.State_Raised | QStyle.State_Horizontal
+        if self.isEnabled():
+            option.state |= QStyle.State_Enabled
+        if self.window().isActiveWindow():
+            option.state |= QStyle.State_Active
+        # Like QHeaderView, the sections with any selected cell are highlighted and the fully selected ones sunken
+        highlighted = self.highlightSections() and logical_index in self.highlighted_sections
+        if highlighted:
+            option.state |= QStyle.State_On
+            if logical_index in self.selected_sections:
+                option.state |= QStyle.State_Sunken
+
+        if self.isSortIndicatorShown() and self.sortIndicatorSection() == logical_index:
+            # Same mapping as QHeaderView, an ascending sort shows the down arrow
+            if self.sortIndicatorOrder() == QtCore.Qt.AscendingOrder:
+                option.sortIndicator = QStyleOptionHeader.SortDown
             else:
-                check_box.setChecked(True)
-            layout.addWidget(check_box)
+                option.sortIndicator = QStyleOptionHeader.SortUp
+
+        visual_index = self.visualIndex(logical_index)
+        if self.count() == 1:
+            option.position = QStyleOptionHeader.OnlyOneSection
+        elif visual_index == 0:
+            option.position = QStyleOptionHeader.Beginning
+        elif visual_index == self.count() - 1:
+            option.position = QStyleOptionHeader.End
+        else:
+            option.position = QStyleOptionHeader.Middle
+
+        previous_selected = self.logicalIndex(visual_index - 1) in self.selected_sections
+        next_selected = self.logicalIndex(visual_index + 1) in self.selected_sections
+        if previous_selected and next_selected:
+            option.selectedPosition = QStyleOptionHeader.NextAndPreviousAreSelected
+        elif previous_selected:
+            option.selectedPosition = QStyleOptionHeader.PreviousIsSelected
+        elif next_selected:
+            option.selectedPosition = QStyleOptionHeader.NextIsSelected
+        else:
+            option.selectedPosition = QStyleOptionHeader.NotAdjacent
+
+        painter.save()
+        if highlighted:
+            font = painter.font()
+            font.setBold(True)
+            painter.setFont(font)
+        self.style().drawControl(QStyle.CE_Header, option, painter, self)
+        painter.restore()
+
+
+# Table model serving the cells of the column store to the table view
+class CsvTableModel(QAbstractTableModel):
+    # Emitted whenever an edit is recorded, undone or redone
+    history_changed = pyqtSignal()
+    # Emitted whenever the rows are sorted or the sort keys change
+    sort_changed = pyqtSignal()
+    # Emitted whenever a filter is applied or removed
+    filter_changed = pyqtSignal()
+    # Emitted whenever rows or columns are inserted in or removed from the store, the cells then have other indices
+    cells_moved = pyqtSignal()
+    # Above this number of separate ranges of rows inserted or removed at once, the view is notified with a single
+    # layout change instead of one notification per range
+    max_row_notifications = 64
+
+    def __init__(self, parent=None, journal_max_size=journal.DEFAULT_MAX_SIZE):
+        """
+        :param journal_max_size: maximum memory in bytes kept for undoing the edits
+        """
+        super(CsvTableModel, self).__init__(parent)
+        self.store = ColumnStore()
+        # The public editing methods record their edits in the journal, the methods used to replay them do not
+        self.journal = journal.Journal(journal_max_size)
+
+        # The rows of the store are never moved by a sort or a filter, row_order maps every row of the view to a row of
+        # the store and view_rows maps every row of the store to its row in the view or -1 if a filter hides it, both
+        # are None while all the rows are shown in the order of the store
+        self.sort_keys = []
+        self.row_order = None
+        self.view_rows = None
+        # Whether the rows are shown in another order than the one of the store
+        self.rows_reordered = False
+        # Changes whenever row_order does, for the caches of data taken in the order of the view
+        self.row_order_version = 0
+        # Rows of the store edited or added since the last sort which may be out of order, None when too many
+        self.unsorted_rows = set()
+        self.sort_numeric_keys = []
+
+        # Filter applied to the rows, the rows edited or added while it is applied stay visible until it is applied
+        # again, and the masks of its comparisons cached per column
+        self.row_filter = None
+        self.filter_masks = filtering.MaskCache()
+
+        # Word indices of the columns used by the searches, built by the searches and kept up to date by the edits
+        self.search_index = search.SearchIndex()
+
+        # Statistics of the columns shown in the statistics panel, kept up to date by the edits
+        self.statistics = column_stats.StatisticsCache()
+
+    def set_store(self, store):
+        """
+        Replaces the data shown by the view with the given column store
+        :param store: ColumnStore holding the data of the table
+        """
+        self.beginResetModel()
+        self.store.close()
+        self.store = store
+        self.statistics.clear()
+        self.sort_keys = []
+        self.rows_reordered = False
+        self.row_filter = None
+        self.filter_masks.clear()
+        self._set_row_order(None)
+        self.unsorted_rows = set()
+        self.endResetModel()
+
+        self.journal.clear()
+        self.history_changed.emit()
+        self.sort_changed.emit()
+        self.filter_changed.emit()
+        self._cells_moved()
+
+    def record(self, command):
+        self.journal.record(command)
+        self.history_changed.emit()
+
+    def undo(self):
+        done = self.journal.undo(self)
+        self.history_changed.emit()
+        return done
+
+    def redo(self):
+        done = self.journal.redo(self)
+        self.history_changed.emit()
+        return done
+
+    def header(self, column):
+        return self.store.headers[column]
+
+    def column_statistics(self, column):
+        """
+        Returns the column_stats.ColumnStatistics of all the rows of a column, whatever the filter
+        """
+        return self.statistics.statistics(self.store, column)
 
-        self.column_layout_list_scroll_area.setLayout(layout)
-        self.visible_headers_list = visible_list
+    def store_row(self, row):
+        """
+        Returns the row of the store shown at the given row of the view
+        """
+        if self.row_order is None:
+            return row
+        return int(self.row_order[row])
 
-    def save_header_list(self):
+    def view_row(self, row):
+        """
+        Returns the row of the view showing the given row of the store, -1 if the row is hidden by the filter
+        """
+        if self.view_rows is None:
+            return row
+        return int(self.view_rows[row])
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self.row_order is not None:
+            return len(self.row_order)
+        return self.store.row_count()
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.store.column_count()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole or role == QtCore.Qt.EditRole:
+            return self.store.value(self.store_row(index.row()), index.column())
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if role != QtCore.Qt.EditRole or not index.isValid():
+            return False
+        row = self.store_row(index.row())
+        old_value = self.store.value(row, index.column())
+        self.set_cell(row, index.column(), value)
+        if value != old_value:
+            self.record(journal.CellEdit(row, index.column(), old_value, value))
+        return True
+
+    def set_cell(self, row, column, value):
+        """
+        Updates a cell given by its row in the store
+        """
+        self.statistics.cells_changing(self.store, [(row, column)])
+        self.store.set_value(row, column, value)
+        self.statistics.cells_changed(self.store, [(row, column)])
+        self._mark_unsorted([row], column)
+        self.search_index.mark_edited(row, column)
+        view_row = self.view_row(row)
+        if view_row >= 0:
+            index = self.index(view_row, column)
+            self.dataChanged.emit(index, index, [QtCore.Qt.EditRole])
+
+    def set_cells(self, cells):
+        """
+        Updates many cells with a single change notification covering all of them
+        :param cells: list of (row of the store, column, value) tuples
         """
-        When the OK button is clicked after selecting the columns to show/hide
-        Its state needs to be reflected in the original table as well
-        this function ensures that the reference of the visible list of MainWindow object also gets updated
-        All checked columns are added to the list present with the above class's visible_column_list
+        if not cells:
+            return
+        edited = list(dict.fromkeys((row, column) for row, column, _ in cells))
+        self.statistics.cells_changing(self.store, edited)
+        for row, column, value in cells:
+            self.store.set_value(row, column, value)
+            self._mark_unsorted([row], column)
+            self.search_index.mark_edited(row, column)
+        self.statistics.cells_changed(self.store, edited)
+        rows = [self.view_row(row) for row, _, _ in cells]
+        columns = [column for view_row, (_, column, _) in zip(rows, cells) if view_row >= 0]
+        rows = [row for row in rows if row >= 0]
+        if not rows:
+            return
+        self.dataChanged.emit(self.index(min(rows), min(columns)), self.index(max(rows), max(columns)),
+                              [QtCore.Qt.EditRole])
+
+    def clear_ranges(self, ranges):
         """
-        self.visible_headers_list.clear()
+        Blanks rectangles of cells of the view in one batch, recorded as a single edit
+        Every column of a rectangle is cleared as one slice of the store instead of cell by cell
+        :param ranges: list of (top row, bottom row, left column, right column) tuples of the view, inclusive
+        """
+        with self.journal.group():
+            for top, bottom, left, right in ranges:
+                rows = np.arange(top, bottom + 1) if self.row_order is None \
+                    else np.asarray(self.row_order[top:bottom + 1], dtype=np.int64)
+                for column in range(left, right + 1):
+                    cleared_rows, values = self.clear_column_cells(column, rows)
+                    if values:
+                        self.record(journal.ColumnCellsCleared(column, cleared_rows, values))
+
+    def clear_column_cells(self, column, rows):
+        """
+        Blanks cells of a column given by their rows in the store
+        Returns a tuple of (array of the rows which were not blank, list of their previous values)
+        """
+        version = self.store.column_version(column)
+        cleared_rows, values = self.store.clear_cells(rows, column)
+        if not values:
+            return cleared_rows, values
+        self.statistics.cells_cleared(self.store, column, version, values)
+        self._mark_unsorted(cleared_rows, column)
+        self.search_index.mark_rows_edited(cleared_rows.tolist(), column)
+        view_rows = cleared_rows if self.view_rows is None else self.view_rows[cleared_rows]
+        view_rows = view_rows[view_rows >= 0]
+        if len(view_rows):
+            self.dataChanged.emit(self.index(int(view_rows.min()), column), self.index(int(view_rows.max()), column),
+                                  [QtCore.Qt.EditRole])
+        return cleared_rows, values
+
+    def edit_cells(self, cells):
+        """
+        Sets many cells in one batch, recorded as a single edit
+        :param cells: list of (row of the store, column, previous value, new value) tuples
+        """
+        if cells:
+            self.set_cells([(row, column, new_value) for row, column, _, new_value in cells])
+            self.record(journal.CellsEdited(cells))
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsEditable
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return self.store.headers[section]
+        return str(section + 1)
+
+    def append_rows(self, rows):
+        """
+        Appends a chunk of rows at the end of the table with a single insert notification to the view
+        :param rows: list of rows where each row is a list of cell values
+        """
+        if not rows:
+            return
+
+        column_count = self.store.column_count()
+        widest_row = max(len(row_data) for row_data in rows)
+        if widest_row > column_count:
+            self.beginInsertColumns(QModelIndex(), column_count, widest_row - 1)
+            for column in range(column_count, widest_row):
+                self.store.insert_column(column, '')
+            self.endInsertColumns()
+
+        row_count = self.store.row_count()
+        self.beginInsertRows(QModelIndex(), row_count, row_count + len(rows) - 1)
+        self.store.append_rows(rows)
+        self.statistics.rows_added(self.store, np.arange(row_count, self.store.row_count()))
+        # The rows keep their indices, only the word indices miss the new rows
+        self.search_index.clear()
+        if self.row_order is not None:
+            # Rows loaded after a sort or a filter are shown at the end until the next sort or filter
+            new_rows = np.arange(row_count, row_count + len(rows))
+            self._set_row_order(np.concatenate((self.row_order, new_rows)))
+            self._mark_unsorted(new_rows)
+        self.endInsertRows()
+
+    def insertRows(self, row, count, parent=QModelIndex()):
+        if self.row_order is None:
+            position = row
+            self.beginInsertRows(parent, row, row + count - 1)
+            self.store.insert_rows(position, count)
+            self.endInsertRows()
+        elif not self.rows_reordered:
+            # In a filtered view the new rows are added to the store before the row shown at the requested row
+            position = self.store_row(row) if row < len(self.row_order) else self.store.row_count()
+            order = self.row_order + (self.row_order >= position) * count
+            self.beginInsertRows(parent, row, row + count - 1)
+            self.store.insert_rows(position, count)
+            self._set_row_order(np.insert(order, row, np.arange(position, position + count)))
+            self.endInsertRows()
+        else:
+            # In a sorted view the new rows are added at the end of the store and shown at the requested row
+            position = self.store.row_count()
+            new_rows = np.arange(position, position + count)
+            self.beginInsertRows(parent, row, row + count - 1)
+            self.store.insert_rows(position, count)
+            self._set_row_order(np.insert(self.row_order, row, new_rows))
+            self._mark_unsorted(new_rows)
+            self.endInsertRows()
+        self.statistics.rows_added(self.store, np.arange(position, position + count))
+        self._cells_moved()
+        self.record(journal.RowsInserted(position, count))
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if self.row_order is None:
+            removed = self.remove_row_range(row, count)
+            self.record(journal.RowsRemoved(row, count, removed))
+        else:
+            # Consecutive rows of a sorted or filtered view are scattered in the store
+            rows = np.sort(self.row_order[row:row + count])
+            removed = self.remove_row_set(rows)
+            self.record(journal.RowSetRemoved(rows, removed))
+        return True
+
+    def remove_row_range(self, row, count):
+        if self.row_order is not None:
+            return self._remove_rows(np.arange(row, row + count), lambda: self.store.remove_rows(row, count))
+
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        self.statistics.rows_removing(self.store, np.arange(row, row + count))
+        removed = self.store.remove_rows(row, count)
+        self.statistics.rows_removed(self.store)
+        self.endRemoveRows()
+        self._cells_moved()
+        return removed
+
+    def restore_rows(self, row, removed):
+        if self.row_order is not None:
+            self._insert_rows(np.arange(row, row + removed.count), lambda: self.store.restore_rows(row, removed))
+            return
+
+        self.beginInsertRows(QModelIndex(), row, row + removed.count - 1)
+        self.store.restore_rows(row, removed)
+        self.statistics.rows_added(self.store, np.arange(row, row + removed.count))
+        self.endInsertRows()
+        self._cells_moved()
+
+    def remove_row_set(self, rows):
+        return self._remove_rows(rows, lambda: self.store.remove_row_set(rows))
+
+    def restore_row_set(self, rows, removed):
+        self._insert_rows(rows, lambda: self.store.restore_row_set(rows, removed))
+
+    def _remove_rows(self, rows, remove):
+        """
+        Removes rows of the store from the view, then from the store
+        :param rows: sorted array of the rows of the store to remove
+        :param remove: function removing the rows from the store and returning them
+        """
+        indexed_view = self.row_order is not None
+        if not indexed_view:
+            self._set_row_order(np.arange(self.store.row_count()))
+
+        # The rows hidden by the filter are only removed from the store
+        view_rows = self.view_rows[rows]
+        view_rows = np.sort(view_rows[view_rows >= 0])
+        ranges = sorting.index_ranges(view_rows)
+        if len(ranges) > self.max_row_notifications:
+            # Move the rows to remove after the others, then remove them as a single range
+            kept = np.ones(len(self.row_order), dtype=bool)
+            kept[view_rows] = False
+            self.layoutAboutToBeChanged.emit()
+            self.row_order = np.concatenate((self.row_order[kept], self.row_order[view_rows]))
+            self.layoutChanged.emit()
+            ranges = [(len(self.row_order) - len(view_rows), len(view_rows))]
+
+        for first, count in reversed(ranges):
+            self.beginRemoveRows(QModelIndex(), first, first + count - 1)
+            self.row_order = np.delete(self.row_order, np.s_[first:first + count])
+            self.endRemoveRows()
+
+        self.statistics.rows_removing(self.store, rows)
+        removed = remove()
+        self.statistics.rows_removed(self.store)
+        # The remaining rows of the store move up by the number of removed rows before them
+        order = self.row_order - np.searchsorted(rows, self.row_order)
+        self._set_row_order(order if indexed_view else None)
+        if self.unsorted_rows:
+            removed_rows = set(rows.tolist())
+            self.unsorted_rows = {row - int(np.searchsorted(rows, row)) for row in self.unsorted_rows
+                                  if row not in removed_rows}
+        self._cells_moved()
+        return removed
+
+    def _insert_rows(self, rows, restore):
+        """
+        Inserts back rows in the store, then shows them in the view at their place in the sort order
+        :param rows: sorted array of the indices of the rows in the store once inserted
+        :param restore: function inserting the rows in the store
+        """
+        indexed_view = self.row_order is not None
+        order = self.row_order if indexed_view else np.arange(self.store.row_count())
+        restore()
+        self.statistics.rows_added(self.store, rows)
+
+        # The rows of the store move down by the number of inserted rows before them
+        positions = rows - np.arange(len(rows))
+        order = order + np.searchsorted(positions, order, side='right')
+        if self.unsorted_rows:
+            self.unsorted_rows = {row + int(np.searchsorted(positions, row, side='right'))
+                                  for row in self.unsorted_rows}
+
+        if self.rows_reordered:
+            points, rows = sorting.RowOrdering(self.store, self.sort_keys).insertion_points(order, rows.tolist())
+            # The binary search is only exact if the other rows are all in order
+            if self.unsorted_rows != set():
+                self._mark_unsorted(rows)
+        else:
+            # The rows shown in the order of the store, all of them or the ones kept by the filter, stay in order
+            points = np.searchsorted(order, rows)
+        points = np.asarray(points, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(points)) + 1))
+        if len(starts) > self.max_row_notifications:
+            # Insert the rows after the others, then move them to their place in a single layout change
+            self.beginInsertRows(QModelIndex(), len(order), len(order) + len(rows) - 1)
+            self.row_order = np.concatenate((order, rows))
+            self.endInsertRows()
+            self.layoutAboutToBeChanged.emit()
+            self.row_order = np.insert(order, points, rows)
+            self.layoutChanged.emit()
+        else:
+            self.row_order = order
+            stops = np.concatenate((starts[1:], [len(rows)]))
+            for start, stop in zip(starts, stops):
+                # The rows inserted by the previous ranges shift the insertion point
+                first = int(points[start]) + start
+                self.beginInsertRows(QModelIndex(), first, first + stop - start - 1)
+                self.row_order = np.insert(self.row_order, first, rows[start:stop])
+                self.endInsertRows()
+
+        self._set_row_order(self.row_order if indexed_view else None)
+        self._cells_moved()
+
+    def insert_column(self, column, header, value=''):
+        """
+        Inserts a new column with the given heading and default value for its cells
+        """
+        self.beginInsertColumns(QModelIndex(), column, column)
+        self.store.insert_column(column, header, value)
+        self.statistics.clear()
+        self.endInsertColumns()
+        self._shift_sort_keys(column, 1)
+        self._cells_moved()
+        self.record(journal.ColumnInserted(column))
+
+    def removeColumns(self, column, count, parent=QModelIndex()):
+        removed = self.remove_column_range(column, count)
+        self.record(journal.ColumnsRemoved(column, removed))
+        return True
+
+    def remove_column_range(self, column, count):
+        self.beginRemoveColumns(QModelIndex(), column, column + count - 1)
+        removed = [self.store.remove_column(column) for _ in range(count)]
+        self.statistics.clear()
+        self.endRemoveColumns()
+        self._shift_sort_keys(column, -count)
+        self._cells_moved()
+        return removed
+
+    def restore_columns(self, column, removed):
+        self.beginInsertColumns(QModelIndex(), column, column + len(removed) - 1)
+        for offset, removed_column in enumerate(removed):
+            self.store.restore_column(column + offset, removed_column)
+        self.statistics.clear()
+        self.endInsertColumns()
+        self._shift_sort_keys(column, len(removed))
+        self._cells_moved()
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self.sort_rows([sorting.SortKey(column, order == QtCore.Qt.AscendingOrder)])
+
+    def sort_rows(self, keys):
+        """
+        Sorts the view by the given keys, the rows of the store are not moved
+        Sorting again by the same keys only moves the rows edited or added since the last sort
+        :param keys: list of sorting.SortKey, the first key being the most significant, an empty list shows the rows
+                     in the order of the store again
+        """
+        if keys:
+            ordering = sorting.RowOrdering(self.store, keys)
+            if keys == self.sort_keys and ordering.numeric_keys == self.sort_numeric_keys and \
+                    self.rows_reordered and self.unsorted_rows is not None:
+                unsorted_rows = [row for row in sorted(self.unsorted_rows) if self.view_row(row) >= 0]
+                order = ordering.resort(self.row_order, unsorted_rows)
+            else:
+                order = ordering.order()
+            self.sort_numeric_keys = ordering.numeric_keys
+        elif self.row_filter is not None:
+            order = np.sort(self.row_order)
+        else:
+            order = None
 
-        check_box_list = self.column_layout_list_scroll_area.findChildren(QCheckBox)
-        for loop in range(len(check_box_list)):
-            if check_box_list[loop].isChecked():
-                self.visible_headers_list.append(check_box_list[loop].text())
+        # A filtered view keeps showing the same rows
+        if order is not None and self.row_filter is not None:
+            order = order[self.view_rows[order] >= 0]
 
-    def remove_header(self, header_title):
-        if header_title in self.visible_headers_list:
-            self.visible_headers_list.remove(header_title)
+        self.layoutAboutToBeChanged.emit()
+        self._set_row_order(order)
+        self.layoutChanged.emit()
+
+        self.sort_keys = list(keys)
+        self.rows_reordered = bool(keys)
+        self.unsorted_rows = set()
+        self.sort_changed.emit()
+
+    def filter_rows(self, row_filter):
+        """
+        Shows only the rows matching a filter, in the current sort order
+        The rows edited or added since a sort are put at their place in the sort order
+        :param row_filter: expression returned by filtering.parse, None shows all the rows
+        """
+        if self.rows_reordered:
+            order = sorting.RowOrdering(self.store, self.sort_keys).order()
+        else:
+            order = None
+        if row_filter is not None:
+            mask = row_filter.mask(self.store, self.filter_masks)
+            order = order[mask[order]] if order is not None else np.flatnonzero(mask)
+
+        # The rows are shown again or hidden at the end of the view, then the view is reordered at once
+        old_count, new_count = self.rowCount(), self.store.row_count() if order is None else len(order)
+        if new_count < old_count:
+            self.beginRemoveRows(QModelIndex(), new_count, old_count - 1)
+            self.row_order = np.arange(new_count)
+            self.endRemoveRows()
+        elif new_count > old_count:
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+            self.row_order = np.arange(new_count)
+            self.endInsertRows()
+        self.layoutAboutToBeChanged.emit()
+        self._set_row_order(order)
+        self.layoutChanged.emit()
+
+        self.row_filter = row_filter
+        self.unsorted_rows = set()
+        self.filter_changed.emit()
+
+    def store_order(self):
+        """
+        Returns all the rows of the store in the order of the view as an array, the rows hidden by the filter
+        being at their place in the sort order, or None if the rows are in the order of the store
+        """
+        if not self.rows_reordered:
+            return None
+        if self.row_filter is None:
+            return self.row_order
+        order = sorting.RowOrdering(self.store, self.sort_keys).order()
+        # The shown rows keep the order of the view, even if edited since the sort
+        order[self.view_rows[order] >= 0] = self.row_order
+        return order
+
+    def _cells_moved(self):
+        """
+        Drops what depends on the indices of the cells once rows or columns are inserted in or removed from the store
+        """
+        self.search_index.clear()
+        self.cells_moved.emit()
+
+    def _set_row_order(self, order):
+        self.row_order = order
+        self.row_order_version += 1
+        if order is None:
+            self.view_rows = None
+        else:
+            self.view_rows = np.full(self.store.row_count(), -1, dtype=np.int64)
+            self.view_rows[order] = np.arange(len(order))
+
+    def _mark_unsorted(self, rows, column=None):
+        """
+        Remembers rows which may be out of order, rows edited in a column which is not a sort key are not
+        :param rows: rows of the store
+        :param column: edited column, None when the whole rows are new
+        """
+        if not self.rows_reordered or self.unsorted_rows is None:
+            return
+        if column is not None and all(key.column != column for key in self.sort_keys):
+            return
+        self.unsorted_rows.update(int(row) for row in rows)
+        if len(self.unsorted_rows) > sorting.INCREMENTAL_LIMIT:
+            self.unsorted_rows = None
+
+    def _shift_sort_keys(self, column, count):
+        """
+        Updates the sort keys once count columns are inserted before column, or removed from it if count is negative
+        The rows may be out of order once a key is removed
+        """
+        keys = []
+        for key in self.sort_keys:
+            if key.column >= column - min(count, 0):
+                keys.append(sorting.SortKey(key.column + count, key.ascending))
+            elif count < 0 and key.column >= column:
+                self.unsorted_rows = None
+            else:
+                keys.append(key)
+        if keys != self.sort_keys:
+            self.sort_keys = keys
+            self.sort_changed.emit()
+
+
+class SearchWorker(QObject):
+    workRequested = pyqtSignal()
+    # Hits of a batch of rows as a list of (row, column) tuples and the number of rows searched so far
+    hits_found = pyqtSignal(object, int)
+    # Emitted with whether all the rows were searched
+    finished = pyqtSignal(bool)
+
+    def __init__(self, store, query, columns, index=None, parent=None):
+        """
+        :param store: store holding the cells to search
+        :param query: search.SearchQuery
+        :param columns: indices of the columns to search
+        :param index: optional search.SearchIndex of the store for the literal searches
+        """
+        super(SearchWorker, self).__init__(parent)
+        self.store = store
+        self.query = query
+        self.columns = columns
+        self.index = index
+        self.is_cancelled = False
+
+    def cancel(self):
+        """
+        Requests the worker to stop, the flag is checked between the batches of searched rows
+        """
+        self.is_cancelled = True
+
+    def request_work(self):
+        """
+        Signal to begin the search
+        """
+        self.workRequested.emit()
+
+    def process_search(self):
+        completed = False
+        with instrumentation.thread_profile():
+            try:
+                for rows_searched, hits in search.find(self.store, self.query, self.columns, self.index):
+                    if self.is_cancelled:
+                        return
+                    self.hits_found.emit(hits, rows_searched)
+                completed = True
+            except (IndexError, KeyError, ValueError):
+                # Rows or columns removed from the store, or the paged store closed, while it is searched, the search
+                # has been stopped by then
+                pass
+            finally:
+                # Always reported so the thread quits whatever happened
+                self.finished.emit(completed)
+
+
+# Raised inside the loading worker to unwind the parsing once the loading is cancelled
+class LoadingCancelled(Exception):
+    pass
 
 
 class CsvLoaderWorker(QObject):
+    # Number of parsed rows handed over to the GUI thread at once, the first chunk is smaller to show the table quickly
+    chunk_size = 10000
+    first_chunk_size = 500
+    # Maximum number of chunks parsed but not yet appended by the GUI thread, bounds the memory used by the queue
+    max_pending_chunks = 4
+    # Files at least this large are parsed by a pool of processes when more than one CPU is available
+    parallel_mode_threshold = 64 * 1024 * 1024
+    # Files at least this large are opened in the read mostly paged mode instead of being loaded in memory
+    paged_mode_threshold = 512 * 1024 * 1024
+    # Progress is reported in per mille of the bytes read and at most once per interval (in seconds)
+    progress_steps = 1000
+    progress_interval = 0.2
+
     workRequested = pyqtSignal()
-    finished = pyqtSignal()
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+    format_detected = pyqtSignal(object)
+    headers_parsed = pyqtSignal(object)
+    rows_parsed = pyqtSignal(object)
     relay = pyqtSignal(int)
     progress_max = pyqtSignal(int)
-    update_bottom_toolbar = pyqtSignal()
 
-    def __init__(self, csv_file_path, csv_data_table, column_headers, column_headers_all, parent=None):
+    def __init__(self, csv_file_path, store_cache=None, parent=None):
+        """
+        :param csv_file_path: tuple of the path of the file and the filter given by the file dialog
+        :param store_cache: optional store_cache.StoreCache to read the file from, the caller caches the files loaded
+                            in memory and the loader the files opened in paged mode
+        """
         super(CsvLoaderWorker, self).__init__(parent)
         self.csv_file_path = csv_file_path
-        self.csv_data_table = csv_data_table
-        self.column_headers = column_headers
-        self.column_headers_all = column_headers_all
+        self.store_cache = store_cache
+        # Identity of the file taken before it is parsed, None without a cache
+        self.file_identity = None
+        self.is_cancelled = False
+        self.last_progress_time = 0
+        self.pending_chunks = threading.Semaphore(self.max_pending_chunks)
+
+    def cancel(self):
+        """
+        Requests the worker to stop, the flag is checked between the batches of parsed rows
+        """
+        self.is_cancelled = True
+
+    def chunk_consumed(self):
+        """
+        Called by the GUI thread once a chunk is appended to the table, frees a slot for the next chunk
+        """
+        self.pending_chunks.release()
+
+    def hand_over_chunk(self, rows):
+        """
+        Sends a chunk of parsed rows to the GUI thread through the queued rows_parsed signal
+        Blocks while too many chunks are waiting to be appended so the parser does not outrun the GUI thread
+        """
+        while not self.pending_chunks.acquire(timeout=0.1):
+            if self.is_cancelled:
+                raise LoadingCancelled()
+        self.rows_parsed.emit(rows)
+
+    def report_progress(self, bytes_read, file_size):
+        """
+        Relays the progress to the GUI thread, throttled so the event loop is not flooded with signals
+        Also the point where a requested cancellation interrupts the loading
+        :param bytes_read: number of bytes of the file consumed so far
+        :param file_size: total size of the file in bytes
+        """
+        if self.is_cancelled:
+            raise LoadingCancelled()
+
+        now = time.monotonic()
+        if now - self.last_progress_time >= self.progress_interval:
+            self.last_progress_time = now
+            self.relay.emit(bytes_read * self.progress_steps // max(file_size, 1))
 
     def request_work(self):
         """
@@ -921,58 +2509,170 @@ class CsvLoaderWorker(QObject):
 
     def process_loading_file(self):
         """
-        Starts the thread for populating table from the file without blocking the main UI thread
+        Starts the thread for parsing the file without blocking the main UI thread
+        The widgets and the table model are never touched from here, everything is handed over through signals
+        """
+        file_size = os.path.getsize(self.csv_file_path[0])
+        self.progress_max.emit(self.progress_steps)
+
+        try:
+            if self.store_cache is not None:
+                self.file_identity = store_cache.file_identity(self.csv_file_path[0])
+                cached = self.store_cache.load(self.csv_file_path[0], self.file_identity)
+                if cached is not None:
+                    store, csv_format = cached
+                    self.format_detected.emit(csv_format)
+                    self.finished.emit(store)
+                    return
+
+            csv_format = csv_io.detect_format(self.csv_file_path[0])
+            self.format_detected.emit(csv_format)
+            # Compressed files and the files in wide encodings can only be streamed, they are always loaded in memory
+            paged = file_size >= self.paged_mode_threshold and not csv_format.streamed
+
+            # In memory, the parsing also waits for the GUI thread to append the chunks handed over
+            with instrumentation.thread_profile(), instrumentation.span('parse', file_size=file_size, paged=paged,
+                                                                        compression=csv_format.compression):
+                if paged:
+                    store = self.load_paged(file_size, csv_format)
+                else:
+                    self.load_in_memory(file_size, csv_format)
+                    store = None
+        except LoadingCancelled:
+            self.cancelled.emit()
+            return
+        except (OSError, EOFError, csv.Error, UnicodeDecodeError, zipfile.BadZipFile, lzma.LZMAError) as error:
+            self.failed.emit(str(error))
+            return
+
+        self.finished.emit(store)
+
+        # The offset index of a paged store is never modified, it is cached as is while the file is already shown
+        if paged and self.file_identity is not None and self.store_cache.is_cacheable(self.file_identity):
+            self.store_cache.save_in_background(self.store_cache.save_offsets, self.csv_file_path[0],
+                                                self.file_identity, csv_format, store.record_offsets,
+                                                store.source_column_count)
+
+    def load_in_memory(self, file_size, csv_format):
+        """
+        Parses the file in a single pass and streams the rows to the GUI thread in chunks
+        The rows are only parsed here, the GUI thread owns the column store and appends the chunks to it
+        Large files are sharded over a pool of processes to use all the CPUs, compressed files are decompressed on the
+        fly by a single reader and their progress is counted in compressed bytes
+        :param file_size: size of the file in bytes
+        :param csv_format: csv_io.CsvFormat of the file
+        """
+        # Fetch the column headers, the data rows start after them
+        headers, data_start = csv_io.read_header(self.csv_file_path[0], csv_format.delimiter, csv_format.quotechar,
+                                                 csv_format.encoding, csv_format.compression)
+        self.headers_parsed.emit(headers)
+
+        chunk_sizes = itertools.chain([self.first_chunk_size], itertools.repeat(self.chunk_size))
+        parallel = file_size >= self.parallel_mode_threshold and csv_io.cpu_count() > 1
+
+        for rows, bytes_read in csv_io.iter_row_chunks(self.csv_file_path[0], data_start, chunk_sizes,
+                                                       csv_format.delimiter, csv_format.quotechar,
+                                                       csv_format.encoding, csv_format.compression,
+                                                       parallel=parallel):
+            self.hand_over_chunk(rows)
+            self.report_progress(bytes_read, file_size)
+
+    def load_paged(self, file_size, csv_format):
         """
-        column_headers = []
-        column_headers_all = []
+        Opens the file in paged mode, only the row offset index is built here and the rows are parsed on demand
+        :param file_size: size of the file in bytes
+        :param csv_format: csv_io.CsvFormat of the file, it must not be streamed
+        """
+        def relay_scanned_bytes(scanned_bytes):
+            self.report_progress(scanned_bytes, file_size)
 
-        # Open the file once to get idea of the total rowcount to display progress
-        with open(self.csv_file_path[0], newline='') as csv_file:
-            self.progress_max.emit(len(csv_file.readlines()) - 2)
+        return MappedCsvStore(self.csv_file_path[0], delimiter=csv_format.delimiter, quotechar=csv_format.quotechar,
+                              encoding=csv_format.encoding, progress_callback=relay_scanned_bytes)
 
-        with open(self.csv_file_path[0], newline='') as csv_file:
 
-            self.csv_data_table.setRowCount(0)
-            self.csv_data_table.setColumnCount(0)
+# Raised in the saver thread to abort the saving once the user has cancelled it
+class SavingCancelled(Exception):
+    pass
 
-            csv_file_read = csv.reader(csv_file, delimiter=',', quotechar='|')
 
-            # Fetch the column headers and move the iterator to actual data
-            column_headers = next(csv_file_read)
+# Writes the rows of a store to a csv file in a background thread
+class CsvSaverWorker(QObject):
+    # Progress is reported in per mille of the rows written and at most once per interval (in seconds)
+    progress_steps = 1000
+    progress_interval = 0.2
 
-            # Reflect back the changes in the reference to the column headers
-            for header in column_headers:
-                self.column_headers.append(header)
-                # A backup to keep a list of all the headers to toogle their view later
-                self.column_headers_all.append(header)
+    workRequested = pyqtSignal()
+    finished = pyqtSignal()
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+    relay = pyqtSignal(int)
 
-            # TODO: Increase the reading speed by decreasing load on actual table population
+    def __init__(self, store, columns, csv_file_path, csv_format, row_order=None, parent=None):
+        """
+        :param store: store holding the rows to save, it must not be modified until the saving is over
+        :param columns: indices of the columns to save
+        :param csv_file_path: path of the destination file
+        :param csv_format: csv_io.CsvFormat giving the dialect and the encoding to write, the compression is picked from
+                           the extension of the destination
+        :param row_order: optional permutation of the rows of the store to write them in, the order of the store by
+                          default
+        """
+        super(CsvSaverWorker, self).__init__(parent)
+        self.store = store
+        self.columns = columns
+        self.csv_file_path = csv_file_path
+        self.csv_format = csv_format
+        self.row_order = row_order
+        self.is_cancelled = False
+        self.last_progress_time = 0
 
-            # self.csv_data_table.hide()
+    def cancel(self):
+        """
+        Requests the worker to stop, the flag is checked between the batches of written rows
+        """
+        self.is_cancelled = True
 
-            for row_data in csv_file_read:
+    def report_progress(self, rows_written):
+        """
+        Relays the progress to the GUI thread, throttled so the event loop is not flooded with signals
+        Also the point where a requested cancellation interrupts the saving
+        :param rows_written: number of rows written so far
+        """
+        if self.is_cancelled:
+            raise SavingCancelled()
 
-                self.relay.emit(self.csv_data_table.rowCount())
-                # self.relay.emit(self.x)
-                # self.x = self.x + 1
-                row = self.csv_data_table.rowCount()
-                self.csv_data_table.insertRow(row)
-                self.csv_data_table.setColumnCount(len(row_data))
-                for column, stuff in enumerate(row_data):
-                    item = QTableWidgetItem(stuff)
-                    self.csv_data_table.setItem(row, column, item)
+        now = time.monotonic()
+        if now - self.last_progress_time >= self.progress_interval:
+            self.last_progress_time = now
+            self.relay.emit(rows_written * self.progress_steps // max(self.store.row_count(), 1))
 
-            self.csv_data_table.setHorizontalHeaderLabels(self.column_headers)
+    def request_work(self):
+        """
+        Signal to begin the saving process
+        """
+        self.workRequested.emit()
 
-        # Set WordWrap to True to make the cells change height according to content
-        # Currently set it to false as it looks very decent and makes cell size uniform throughout
-        self.csv_data_table.setWordWrap(False)
-        # Uncomment below line to stretch to fill the column width according to content
-        # self.csv_data_table.resizeColumnsToContents()
-        self.csv_data_table.resizeRowsToContents()
+    def process_saving_file(self):
+        """
+        Streams the rows to a temporary file which replaces the destination once completely written
+        A paged store keeps reading its source file while saving, so it may safely be saved over its own source
+        """
+        try:
+            with instrumentation.thread_profile(), \
+                    instrumentation.span('save', rows=self.store.row_count(), columns=len(self.columns)):
+                csv_io.write_csv(self.csv_file_path, [self.store.headers[column] for column in self.columns],
+                                 self.store.iter_rows(self.columns, order=self.row_order),
+                                 delimiter=self.csv_format.delimiter, quotechar=self.csv_format.quotechar,
+                                 encoding=self.csv_format.encoding,
+                                 compression=csv_io.compression_for_path(self.csv_file_path),
+                                 progress_callback=self.report_progress)
+        except SavingCancelled:
+            self.cancelled.emit()
+            return
+        except (OSError, csv.Error, UnicodeEncodeError) as error:
+            self.failed.emit(str(error))
+            return
 
-        # Update the bottom toolbar to reflect changes
-        self.update_bottom_toolbar.emit()
         self.finished.emit()
 
 
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+""" Command line
+
+Batch processing of csv files without the editor, for scheduled jobs. Run from the src directory:
+    python -m cli select-columns data.csv -c id -c latency -o selected.csv
+    python -m cli delete-rows data.csv --where 'status == FAILED or latency > 500' -o kept.csv
+    python -m cli delete-rows data.csv --rows 1-10,15 -o kept.csv
+    python -m cli plot data.csv --type line --x time --y latency -o latency.png
+    python -m cli stats data.csv -c latency --json
+
+The files are parsed by the parser of the editor and streamed chunk by chunk, so the memory used does not grow with
+the size of the file: the rows are written out as they are read, the plotted series are decimated as they are read and
+the statistics are running aggregates. The filters of delete-rows are the ones of the filter bar, they are evaluated
+over the typed columns of every chunk, so a column is compared by value in the chunks where all its cells are numbers.
+The dialect, encoding and compression of the files are detected like the editor does. The files are written like the
+editor saves them, atomically replacing the destination, in the dialect and encoding of the input file and compressed
+after the extension of the output file.
+
+This module does not depend on Qt, and neither do the modules it imports.
+
+"""
+import argparse
+import itertools
+import json
+import lzma
+import sys
+import zipfile
+
+import numpy as np
+
+import csv_io
+import filtering
+import column_stats
+from csv_store import ColumnStore, infer_format, parse_numeric_column
+
+# Number of rows parsed and processed at once
+CHUNK_SIZE = 50000
+
+PLOT_TYPES = ('scatter', 'scatter-line', 'line')
+
+
+class CommandError(Exception):
+    """
+    Raised for invalid arguments found while running a command, the message is meant to be shown to the user
+    """
+    pass
+
+
+def read_csv(csv_file_path, csv_format=None):
+    """
+    Opens a file for streaming
+    Returns a tuple of (list of headers, iterator over the chunks of data rows)
+    :param csv_format: csv_io.CsvFormat of the file, detected when not given
+    """
+    csv_format = csv_format or csv_io.detect_format(csv_file_path)
+    headers, data_start = csv_io.read_header(csv_file_path, csv_format.delimiter, csv_format.quotechar,
+                                             csv_format.encoding, csv_format.compression)
+    chunks = (rows for rows, _ in csv_io.iter_row_chunks(csv_file_path, data_start, itertools.repeat(CHUNK_SIZE),
+                                                         csv_format.delimiter, csv_format.quotechar,
+                                                         csv_format.encoding, csv_format.compression))
+    return headers, chunks
+
+
+def write_csv(csv_file_path, headers, rows, csv_format):
+    """
+    Writes a file in the dialect and encoding of the file read, compressed after the extension of the path
+    :param csv_format: csv_io.CsvFormat of the file read
+    """
+    csv_io.write_csv(csv_file_path, headers, rows, csv_format.delimiter, csv_format.quotechar, csv_format.encoding,
+                     csv_io.compression_for_path(csv_file_path))
+
+
+def find_columns(headers, names):
+    """
+    Returns the indices of the columns given by their headers, an exact match wins over a case insensitive one
+    :raises CommandError: if a column does not exist
+    """
+    lower_headers = [header.lower() for header in headers]
+    columns = []
+    for name in names:
+        if name in headers:
+            columns.append(headers.index(name))
+        elif name.lower() in lower_headers:
+            columns.append(lower_headers.index(name.lower()))
+        else:
+            raise CommandError('No column named {!r}'.format(name))
+    return columns
+
+
+def parse_row_ranges(text):
+    """
+    Parses row numbers such as 1-10,15 into a sorted array of row indices, the rows being numbered from 1
+    :raises CommandError: if the text is not a list of row numbers and ranges
+    """
+    rows = []
+    for part in text.split(','):
+        first, _, last = part.strip().partition('-')
+        try:
+            first = int(first)
+            last = int(last) if last else first
+        except ValueError:
+            raise CommandError('Invalid row range {!r}'.format(part.strip()))
+        if first < 1 or last < first:
+            raise CommandError('Invalid row range {!r}'.format(part.strip()))
+        rows.append(np.arange(first - 1, last))
+    return np.unique(np.concatenate(rows))
+
+
+def cell(row_data, column):
+    """
+    Returns the text of a cell of a parsed row, the rows shorter than the header have blank cells
+    """
+    return row_data[column] if column < len(row_data) else ''
+
+
+def chunk_store(headers, rows):
+    """
+    Returns a ColumnStore holding a chunk of rows, typed like the columns of the editor
+    """
+    store = ColumnStore(list(headers))
+    store.append_rows(rows)
+    return store
+
+
+def select_columns(arguments):
+    csv_format = csv_io.detect_format(arguments.input)
+    headers, chunks = read_csv(arguments.input, csv_format)
+    columns = find_columns(headers, arguments.column)
+    if arguments.exclude:
+        excluded = set(columns)
+        columns = [column for column in range(len(headers)) if column not in excluded]
+
+    rows = ([cell(row_data, column) for column in columns] for chunk in chunks for row_data in chunk)
+    write_csv(arguments.output, [headers[column] for column in columns], rows, csv_format)
+
+
+def delete_rows(arguments):
+    if arguments.where is None and arguments.rows is None:
+        raise CommandError('Give the rows to delete with --where or --rows')
+    csv_format = csv_io.detect_format(arguments.input)
+    headers, chunks = read_csv(arguments.input, csv_format)
+    try:
+        row_filter = filtering.parse(arguments.where, headers) if arguments.where is not None else None
+    except filtering.FilterSyntaxError as error:
+        raise CommandError('Invalid filter: {}'.format(error))
+    deleted_rows = parse_row_ranges(arguments.rows) if arguments.rows is not None else None
+
+    def kept_rows():
+        start = 0
+        for chunk in chunks:
+            deleted = np.zeros(len(chunk), dtype=bool)
+            if row_filter is not None:
+                deleted |= row_filter.mask(chunk_store(headers, chunk), filtering.MaskCache())
+            if deleted_rows is not None:
+                in_chunk = deleted_rows[np.searchsorted(deleted_rows, start):
+                                        np.searchsorted(deleted_rows, start + len(chunk))]
+                deleted[in_chunk - start] = True
+            start += len(chunk)
+            for row_data in itertools.compress(chunk, (~deleted).tolist()):
+                yield row_data
+
+    write_csv(arguments.output, headers, kept_rows(), csv_format)
+
+
+def numeric_chunks(csv_file_path, headers, columns):
+    """
+    Reads numeric columns of a file chunk by chunk
+    Yields a list of one array per column for every chunk, blank cells are read as 0 like the editor plots them
+    :raises CommandError: if a column is not numeric
+    """
+    _, chunks = read_csv(csv_file_path)
+    for chunk in chunks:
+        arrays = []
+        for column in columns:
+            numeric = parse_numeric_column([cell(row_data, column) for row_data in chunk])
+            if numeric is None:
+                raise CommandError('Column {!r} is not numeric, only numeric columns can be plotted from the '
+                                   'command line'.format(headers[column]))
+            arrays.append(np.where(numeric[1], 0, numeric[0]))
+        yield arrays
+
+
+def plot(arguments):
+    # matplotlib is only needed, and only imported, by this command, the Agg canvas renders without a display
+    import plotting
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    headers, _ = read_csv(arguments.input)
+    columns = find_columns(headers, [arguments.x, arguments.y])
+    plot_type = PLOT_TYPES.index(arguments.type) + plotting.PLOT_SCATTER
+
+    decimator = plotting.StreamingDecimator(plot_type == plotting.PLOT_LINE, arguments.width)
+    x_min, x_max = np.inf, -np.inf
+    for data_x_axis, data_y_axis in numeric_chunks(arguments.input, headers, columns):
+        decimator.add(data_x_axis, data_y_axis)
+        finite_x = data_x_axis[np.isfinite(data_x_axis)]
+        if len(finite_x):
+            x_min, x_max = min(x_min, finite_x.min()), max(x_max, finite_x.max())
+    data_x_axis, data_y_axis = decimator.points()
+
+    curve = None
+    if plot_type == plotting.PLOT_SCATTER_LINE and x_min <= x_max:
+        # The whole series is never held in memory, the smooth curve is fitted through the means of the points of
+        # narrow x ranges, computed by a second pass over the file
+        means = plotting.BinnedMeans(float(x_min), float(x_max))
+        for arrays in numeric_chunks(arguments.input, headers, columns):
+            means.add(*arrays)
+        curve = plotting.smooth_curve(*means.points())
+
+    figure = Figure(figsize=(arguments.width / arguments.dpi, arguments.height / arguments.dpi), dpi=arguments.dpi)
+    FigureCanvasAgg(figure)
+    plotting.draw_figure(figure, data_x_axis, data_y_axis, headers[columns[0]], headers[columns[1]],
+                         arguments.title, plot_type, arguments.width, curve)
+    figure.savefig(arguments.output, bbox_inches='tight')
+
+
+def column_statistics(arguments):
+    headers, chunks = read_csv(arguments.input)
+    requested_columns = find_columns(headers, arguments.column) if arguments.column else list(range(len(headers)))
+    columns = list(dict.fromkeys(requested_columns))
+
+    results = {}
+    # Columns typed as numeric by their first chunk with text in a later chunk, their statistics are computed again
+    # from the texts by a second pass over the file
+    text_columns = []
+    for chunk in chunks:
+        for column in columns:
+            texts = [cell(row_data, column) for row_data in chunk]
+            if column not in results:
+                dtype, _ = infer_format(texts)
+                results[column] = column_stats.ColumnStatistics(dtype is not None)
+            results[column].add(texts)
+            if results[column].stale:
+                results[column] = column_stats.ColumnStatistics(False)
+                text_columns.append(column)
+        columns = [column for column in columns if column not in text_columns]
+
+    if text_columns:
+        _, chunks = read_csv(arguments.input)
+        for chunk in chunks:
+            for column in text_columns:
+                results[column].add([cell(row_data, column) for row_data in chunk])
+
+    # Files without any data row
+    for column in requested_columns:
+        results.setdefault(column, column_stats.ColumnStatistics(False))
+
+    columns = list(dict.fromkeys(requested_columns))
+    if arguments.json:
+        json.dump([statistics_record(headers[column], results[column]) for column in columns], sys.stdout,
+                  indent=2)
+        sys.stdout.write('\n')
+        return
+
+    titles = {'count': 'Values', 'nulls': 'Blanks', 'distinct': 'Distinct', 'minimum': 'Min', 'maximum': 'Max',
+              'mean': 'Mean', 'std': 'Std. dev.', 'top_values': 'Most common'}
+    for column in columns:
+        print(headers[column])
+        for name, text in column_stats.summarize(results[column], max_text_length=80).items():
+            print('    {:<12}{}'.format(titles[name], text.replace('\n', ', ')))
+
+
+def statistics_record(header, column_statistics):
+    """
+    Returns the statistics of a column as a dictionary which can be serialized to JSON
+    """
+    distinct_count, exact = column_statistics.distinct_count()
+    return {
+        'column': header,
+        'numeric': column_statistics.numeric,
+        'count': column_statistics.count,
+        'nulls': column_statistics.nulls,
+        'distinct': distinct_count,
+        'distinct_exact': exact,
+        'minimum': column_statistics.minimum,
+        'maximum': column_statistics.maximum,
+        'mean': column_statistics.mean(),
+        'std': column_statistics.standard_deviation(),
+        'top_values': [[value, count] for value, count in column_statistics.top_values()],
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m cli', description='Process csv files without the editor.')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    command = commands.add_parser('select-columns', help='keep only some columns of a file')
+    command.add_argument('input', help='csv file to read')
+    command.add_argument('-c', '--column', action='append', required=True,
+                         help='header of a column to keep, in the order given, may be repeated')
+    command.add_argument('--exclude', action='store_true', help='drop the given columns and keep the others')
+    command.add_argument('-o', '--output', required=True, help='csv file to write')
+    command.set_defaults(run=select_columns)
+
+    command = commands.add_parser('delete-rows', help='delete the rows matching a filter or given by number')
+    command.add_argument('input', help='csv file to read')
+    command.add_argument('--where', help='filter of the rows to delete, in the syntax of the filter bar')
+    command.add_argument('--rows', help='numbers of the data rows to delete counted from 1, eg. 1-10,15')
+    command.add_argument('-o', '--output', required=True, help='csv file to write')
+    command.set_defaults(run=delete_rows)
+
+    command = commands.add_parser('plot', help='plot two numeric columns to a png file')
+    command.add_argument('input', help='csv file to read')
+    command.add_argument('--type', choices=PLOT_TYPES, default='scatter', help='kind of plot, scatter by default')
+    command.add_argument('--x', required=True, help='header of the column of the x axis')
+    command.add_argument('--y', required=True, help='header of the column of the y axis')
+    command.add_argument('--title', default='Plot Title', help='title of the plot')
+    command.add_argument('--width', type=int, default=800, help='width of the image in pixels')
+    command.add_argument('--height', type=int, default=600, help='height of the image in pixels')
+    command.add_argument('--dpi', type=int, default=100, help='resolution of the image')
+    command.add_argument('-o', '--output', required=True, help='png file to write')
+    command.set_defaults(run=plot)
+
+    command = commands.add_parser('stats', help='print the statistics of the columns of a file')
+    command.add_argument('input', help='csv file to read')
+    command.add_argument('-c', '--column', action='append',
+                         help='header of a column to describe, may be repeated, all the columns by default')
+    command.add_argument('--json', action='store_true', help='print the statistics as JSON')
+    command.set_defaults(run=column_statistics)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    arguments = parser.parse_args(argv)
+    try:
+        arguments.run(arguments)
+    except CommandError as error:
+        parser.error(str(error))
+    except (OSError, EOFError, zipfile.BadZipFile, lzma.LZMAError) as error:
+        # Also the corrupted archives
+        print('error: {}'.format(error), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,540 @@
+# -*- coding: utf-8 -*-
+""" Column Statistics
+
+Summary statistics of the columns of a store: count of the non blank cells, blanks, distinct values, min/max,
+mean/standard deviation of the numeric columns and the most common values.
+
+The statistics of a column are first computed with NumPy over the typed column, then kept up to date by running
+aggregates as the cells are edited and the rows inserted or removed: the counts and the sums of the values and of their
+squares are updated with the added and removed values only. The distinct values are counted exactly while there are
+few of them, above EXACT_DISTINCT_LIMIT they are estimated by a HyperLogLog sketch. A sketch can not forget a value,
+so it is built again once the removed values could have moved the estimate by more than its own error. Removing the
+minimum or the maximum makes only the bounds computed again, from the typed column.
+
+This module does not depend on Qt.
+
+"""
+import heapq
+
+import numpy as np
+
+from csv_store import format_numbers, parse_numbers
+
+# Above this number of distinct values the distinct count is estimated by a HyperLogLog sketch
+EXACT_DISTINCT_LIMIT = 100000
+
+# Number of the most common values reported, and of the values whose count is tracked once the column is sketched
+TOP_VALUES_COUNT = 5
+TRACKED_VALUES_COUNT = 100
+
+# Names of the statistics given by summarize, in the order they are shown
+SUMMARY_FIELDS = ('count', 'nulls', 'distinct', 'minimum', 'maximum', 'mean', 'std', 'top_values')
+
+# log2 of the number of registers of the sketches, 2 ** 14 registers give a standard error of 0.8%
+SKETCH_PRECISION = 14
+
+
+def _mix(hashes):
+    """
+    Spreads the bits of 64 bit hashes over the whole word (the splitmix64 finalizer)
+    :param hashes: array of uint64
+    """
+    with np.errstate(over='ignore'):
+        hashes = hashes ^ (hashes >> np.uint64(30))
+        hashes = hashes * np.uint64(0xbf58476d1ce4e5b9)
+        hashes = hashes ^ (hashes >> np.uint64(27))
+        hashes = hashes * np.uint64(0x94d049bb133111eb)
+        return hashes ^ (hashes >> np.uint64(31))
+
+
+def is_number(text):
+    """
+    Returns whether a text is a number
+    """
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def hash_values(values):
+    """
+    Returns the 64 bit hashes of an array of numbers or a list of strings as an array of uint64
+    """
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        # Equal numbers must hash equally whatever the sign of their zero
+        bits = (values.astype(np.float64) + 0.0).view(np.uint64)
+    else:
+        bits = np.fromiter((hash(value) for value in values), dtype=np.int64, count=len(values)).view(np.uint64)
+    return _mix(bits)
+
+
+class HyperLogLog(object):
+    """
+    Estimator of the number of distinct values of a multiset, using a fixed memory of 2 ** precision bytes
+    """
+
+    def __init__(self, precision=SKETCH_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        """
+        Adds an array of numbers or a list of strings
+        """
+        if len(values) == 0:
+            return
+        hashes = hash_values(values)
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # The rank is the position of the leftmost 1 bit of the remainder, frexp gives its bit length exactly
+        _, bit_lengths = np.frexp(remainder.astype(np.float64))
+        ranks = (64 - self.precision + 1 - bit_lengths).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def estimate(self):
+        register_count = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / register_count)
+        estimate = alpha * register_count ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty_registers = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * register_count and empty_registers:
+            # Linear counting is more accurate for the small cardinalities
+            estimate = register_count * np.log(register_count / empty_registers)
+        return int(round(estimate))
+
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+
+class ColumnStatistics(object):
+    """
+    Statistics of the cells of a column, kept as running aggregates
+    The values are numbers for numeric columns and texts otherwise, blank cells are only counted
+    version is the version stamp of the column the statistics describe, stale is set once they can no longer follow
+    the changes of the column and must be computed again
+    """
+
+    def __init__(self, numeric):
+        self.numeric = numeric
+        self.version = None
+        self.stale = False
+        self.count = 0
+        self.nulls = 0
+        # Sums of the values minus shift and of their squares, the shift keeps the variance accurate for large values
+        self.shift = 0.0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.minimum = None
+        self.maximum = None
+        # Set once the minimum or maximum is removed, the bounds are then computed again from the column
+        self.bounds_stale = False
+        # Exact count of every value, None once the column has too many distinct values
+        self.counts = {}
+        # Sketch of the distinct values, counts of the most common values and number of values removed since the
+        # sketch was built, used once counts is None
+        self.sketch = None
+        self.tracked_counts = None
+        self.sketch_removals = 0
+        # Number of the values of a text column which are numbers, a store typing its columns on demand sees the
+        # column as numeric once all of them are
+        self.number_count = 0
+
+    @classmethod
+    def compute(cls, store, column):
+        """
+        Computes the statistics of a column of a store from scratch
+        """
+        numeric = store.numeric_values(column)
+        if numeric is not None:
+            statistics = cls(True)
+            values, nulls = numeric
+            values = values[~nulls].astype(np.float64)
+            statistics.nulls = int(np.count_nonzero(nulls))
+            statistics._add_numbers(values)
+        else:
+            statistics = cls(False)
+            statistics.add(store.column_values(column))
+        statistics.version = store.column_version(column)
+        return statistics
+
+    def add(self, texts):
+        """
+        Adds the texts of cells to the statistics
+        """
+        values, blank_count = self._parse(texts)
+        if values is None:
+            return
+        self.nulls += blank_count
+        if self.numeric:
+            self._add_numbers(values)
+        else:
+            self._add_texts(values)
+
+    def remove(self, texts):
+        """
+        Removes the texts of cells from the statistics
+        """
+        values, blank_count = self._parse(texts)
+        if values is None:
+            return
+        self.nulls -= blank_count
+        if len(values) == 0:
+            return
+        self.count -= len(values)
+        if self.numeric:
+            shifted = values - self.shift
+            self.total -= float(shifted.sum())
+            self.total_squares -= float(np.square(shifted).sum())
+            lowest, highest = values.min(), values.max()
+            distinct, counts = np.unique(values, return_counts=True)
+            distinct = distinct.tolist()
+        else:
+            lowest, highest = min(values), max(values)
+            distinct, counts = zip(*self._count_texts(values).items())
+            self.number_count -= sum(count for value, count in zip(distinct, counts) if is_number(value))
+
+        if self.count == 0:
+            self.minimum = self.maximum = None
+            self.bounds_stale = False
+        elif lowest <= self.minimum or highest >= self.maximum:
+            self.bounds_stale = True
+
+        if self.counts is not None:
+            for value, count in zip(distinct, counts):
+                remaining = self.counts.get(value, 0) - int(count)
+                if remaining < 0:
+                    # The removed values were never added, the statistics lost track of the column
+                    self.stale = True
+                    return
+                if remaining:
+                    self.counts[value] = remaining
+                else:
+                    del self.counts[value]
+        else:
+            for value, count in zip(distinct, counts):
+                if value in self.tracked_counts:
+                    self.tracked_counts[value] -= int(count)
+            self.sketch_removals += len(values)
+            # The removed values may have been the last of their kind, the estimate keeps counting them
+            if self.sketch_removals > self.sketch.relative_error() * self.sketch.estimate():
+                self.stale = True
+
+    def _parse(self, texts):
+        """
+        Splits texts into an array of their non blank values, numbers for numeric columns, and the count of blanks
+        Returns (None, 0) and marks the statistics stale if a text is not a number of a numeric column
+        """
+        values = [text for text in texts if text != '']
+        blank_count = len(texts) - len(values)
+        if not self.numeric:
+            return values, blank_count
+        try:
+            return parse_numbers(values, np.float64)[0], blank_count
+        except ValueError:
+            self.stale = True
+            return None, 0
+
+    @staticmethod
+    def _count_texts(texts):
+        counts = {}
+        for text in texts:
+            counts[text] = counts.get(text, 0) + 1
+        return counts
+
+    def _add_numbers(self, values):
+        if len(values) == 0:
+            return
+        if self.count == 0:
+            # The sums of no values are zero, shifting them by the first value added keeps them small
+            self.shift = float(values[0])
+            self.total = self.total_squares = 0.0
+        self.count += len(values)
+        shifted = values - self.shift
+        self.total += float(shifted.sum())
+        self.total_squares += float(np.square(shifted).sum())
+        lowest, highest = float(values.min()), float(values.max())
+        self.minimum = lowest if self.minimum is None else min(self.minimum, lowest)
+        self.maximum = highest if self.maximum is None else max(self.maximum, highest)
+        distinct, counts = np.unique(values, return_counts=True)
+        self._add_counts(distinct, counts)
+
+    def _add_texts(self, values):
+        if not values:
+            return
+        self.count += len(values)
+        counts = self._count_texts(values)
+        lowest, highest = min(counts), max(counts)
+        self.minimum = lowest if self.minimum is None else min(self.minimum, lowest)
+        self.maximum = highest if self.maximum is None else max(self.maximum, highest)
+        self.number_count += sum(count for value, count in counts.items() if is_number(value))
+        self._add_counts(list(counts.keys()), list(counts.values()))
+
+    def _add_counts(self, distinct, counts):
+        """
+        Counts new occurrences of values, switches to a sketch once there are too many distinct values
+        :param distinct: array or list of distinct values
+        :param counts: number of occurrences of every value
+        """
+        if self.counts is not None and len(distinct) <= EXACT_DISTINCT_LIMIT:
+            if isinstance(distinct, np.ndarray):
+                distinct, counts = distinct.tolist(), counts.tolist()
+            for value, count in zip(distinct, counts):
+                self.counts[value] = self.counts.get(value, 0) + count
+            if len(self.counts) > EXACT_DISTINCT_LIMIT:
+                self._start_sketch()
+            return
+
+        if self.counts is not None:
+            # The values added at once are too many to be counted exactly, the ones counted before join the sketch
+            self._start_sketch()
+        self._add_sketched(distinct, counts)
+
+    def _start_sketch(self):
+        """
+        Replaces the exact counts by a sketch, only the most common values keep being counted
+        """
+        counts, self.counts = self.counts, None
+        self.sketch = HyperLogLog()
+        self.tracked_counts = {}
+        if counts:
+            self._add_sketched(list(counts.keys()), list(counts.values()))
+
+    def _add_sketched(self, distinct, counts):
+        if not isinstance(distinct, np.ndarray):
+            self.sketch.add(np.array(distinct, dtype=np.float64) if self.numeric else distinct)
+        else:
+            self.sketch.add(distinct)
+        # Only the values among the most common of the added ones or already tracked are tracked
+        if len(distinct) > TRACKED_VALUES_COUNT:
+            counts = np.asarray(counts)
+            top = np.argpartition(counts, -TRACKED_VALUES_COUNT)[-TRACKED_VALUES_COUNT:]
+            for offset in top.tolist():
+                value = distinct[offset]
+                value = value.item() if isinstance(value, np.generic) else value
+                self.tracked_counts[value] = self.tracked_counts.get(value, 0) + int(counts[offset])
+        else:
+            for value, count in zip(distinct, counts):
+                value = value.item() if isinstance(value, np.generic) else value
+                self.tracked_counts[value] = self.tracked_counts.get(value, 0) + int(count)
+        if len(self.tracked_counts) > 2 * TRACKED_VALUES_COUNT:
+            self.tracked_counts = dict(heapq.nlargest(TRACKED_VALUES_COUNT, self.tracked_counts.items(),
+                                                      key=lambda item: item[1]))
+
+    def refresh_bounds(self, store, column):
+        """
+        Computes the minimum and maximum again from the column once one of them was removed
+        """
+        if not self.bounds_stale:
+            return
+        self.bounds_stale = False
+        if self.numeric:
+            values, nulls = store.numeric_values(column)
+            values = values[~nulls]
+            if len(values):
+                self.minimum, self.maximum = float(values.min()), float(values.max())
+        elif self.counts is not None:
+            self.minimum, self.maximum = min(self.counts), max(self.counts)
+        else:
+            texts = [text for text in store.column_values(column) if text != '']
+            if texts:
+                self.minimum, self.maximum = min(texts), max(texts)
+
+    def may_be_numeric(self):
+        """
+        Whether the values of a text column are all numbers, the column is then numeric if its store types it by its
+        current values
+        """
+        return not self.numeric and self.number_count == self.count
+
+    def distinct_count(self):
+        """
+        Returns a tuple of (number of distinct values, whether it is exact)
+        """
+        if self.counts is not None:
+            return len(self.counts), True
+        return self.sketch.estimate(), False
+
+    def mean(self):
+        if not self.numeric or self.count == 0:
+            return None
+        return self.shift + self.total / self.count
+
+    def standard_deviation(self):
+        """
+        Returns the sample standard deviation, None for less than two values
+        """
+        if not self.numeric or self.count < 2:
+            return None
+        variance = (self.total_squares - self.total ** 2 / self.count) / (self.count - 1)
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def top_values(self, count=TOP_VALUES_COUNT):
+        """
+        Returns the list of the most common values as (value, count) tuples, most common first
+        The counts are exact while the distinct values are counted exactly
+        """
+        counts = self.counts if self.counts is not None else self.tracked_counts
+        return heapq.nlargest(count, ((value, count) for value, count in counts.items() if count > 0),
+                              key=lambda item: item[1])
+
+
+def summarize(statistics, max_text_length=None):
+    """
+    Returns the statistics formatted for display as {field of SUMMARY_FIELDS: text}, '-' for the ones not defined
+    The numbers are formatted like the cells of a numeric column, the most common values are given one per line
+    :param statistics: ColumnStatistics to format
+    :param max_text_length: optional maximum length of the texts shown, longer texts are cut
+    """
+    def format_value(value):
+        if value is None:
+            return '-'
+        if statistics.numeric:
+            return str(format_numbers(np.array([value]), np.float64)[0])
+        if max_text_length is not None and len(value) > max_text_length:
+            return value[:max_text_length] + '...'
+        return value
+
+    def format_number(value):
+        return '-' if value is None else '{:.6g}'.format(value)
+
+    distinct_count, exact = statistics.distinct_count()
+    return {
+        'count': str(statistics.count),
+        'nulls': str(statistics.nulls),
+        'distinct': str(distinct_count) if exact else '~{}'.format(distinct_count),
+        'minimum': format_value(statistics.minimum),
+        'maximum': format_value(statistics.maximum),
+        'mean': format_number(statistics.mean()),
+        'std': format_number(statistics.standard_deviation()),
+        'top_values': '\n'.join('{} ({})'.format(format_value(value), count)
+                                for value, count in statistics.top_values()) or '-',
+    }
+
+
+class StatisticsCache(object):
+    """
+    Statistics of the columns of a store computed on demand, updated by the edits instead of being computed again
+    The statistics are keyed by column index, they must be dropped with clear() once columns are inserted or removed
+    The store calls the update methods around every change of its cells or rows, statistics which missed a change are
+    dropped and computed again by the next call of statistics()
+    """
+
+    def __init__(self):
+        self.columns = {}
+
+    def clear(self):
+        self.columns = {}
+
+    def statistics(self, store, column):
+        """
+        Returns the statistics of a column, computed again if the column changed in a way the updates could not follow
+        """
+        statistics = self.columns.get(column)
+        if statistics is None or statistics.stale or statistics.version != store.column_version(column) \
+                or statistics.may_be_numeric() and store.numeric_values(column) is not None:
+            statistics = ColumnStatistics.compute(store, column)
+            self.columns[column] = statistics
+        statistics.refresh_bounds(store, column)
+        return statistics
+
+    def cells_changing(self, store, cells):
+        """
+        Removes the current texts of cells about to be edited
+        :param cells: list of (row, column) tuples, each cell given once
+        """
+        for column, rows in self._group_by_column(store, cells).items():
+            self.columns[column].remove([store.value(row, column) for row in rows])
+
+    def cells_changed(self, store, cells):
+        """
+        Adds the new texts of edited cells
+        :param cells: list of (row, column) tuples, each cell given once
+        """
+        columns = self._group_by_column(store, cells, check_versions=False)
+        for column, rows in columns.items():
+            self.columns[column].add([store.value(row, column) for row in rows])
+        self._follow_versions(store, columns)
+
+    def cells_cleared(self, store, column, version, texts):
+        """
+        Replaces the texts of cells of a column set to blank at once
+        :param version: version stamp of the column before the cells were cleared
+        :param texts: previous texts of the cleared cells
+        """
+        statistics = self.columns.get(column)
+        if statistics is None:
+            return
+        if statistics.stale or statistics.version != version:
+            del self.columns[column]
+            return
+        statistics.remove(texts)
+        statistics.add([''] * len(texts))
+        statistics.version = store.column_version(column)
+
+    def rows_removing(self, store, rows):
+        """
+        Removes the texts of rows about to be removed
+        :param rows: sorted array of row indices
+        """
+        self._update_rows(store, rows, ColumnStatistics.remove)
+
+    def rows_removed(self, store):
+        self._follow_versions(store, list(self.columns))
+
+    def rows_added(self, store, rows):
+        """
+        Adds the texts of inserted rows
+        :param rows: sorted array of row indices
+        """
+        self._update_rows(store, rows, ColumnStatistics.add)
+        self._follow_versions(store, list(self.columns))
+
+    def _current(self, store, column):
+        """
+        Returns the statistics of a column if they describe its current version, drops them otherwise
+        """
+        statistics = self.columns.get(column)
+        if statistics is not None and (statistics.stale or statistics.version != store.column_version(column)):
+            del self.columns[column]
+            return None
+        return statistics
+
+    def _group_by_column(self, store, cells, check_versions=True):
+        """
+        Returns the rows of the cells of every column with statistics as {column: list of rows}
+        """
+        columns = {}
+        for row, column in cells:
+            if column in columns:
+                columns[column].append(row)
+            elif (self._current(store, column) if check_versions else self.columns.get(column)) is not None:
+                columns[column] = [row]
+        return columns
+
+    def _update_rows(self, store, rows, update):
+        if not self.columns:
+            return
+        # Reading back most of the rows would cost as much as computing the statistics again
+        if len(rows) * 2 > store.row_count():
+            self.clear()
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = [column for column in list(self.columns) if self._current(store, column) is not None]
+        if not columns:
+            return
+        texts = [[] for _ in columns]
+        for values in store.iter_rows(columns, stop=len(rows), order=rows):
+            for column_texts, value in zip(texts, values):
+                column_texts.append(value)
+        for column, column_texts in zip(columns, texts):
+            update(self.columns[column], column_texts)
+
+    def _follow_versions(self, store, columns):
+        """
+        Marks the statistics of the given columns, updated by the last change, as describing their current version
+        """
+        for column in columns:
+            statistics = self.columns.get(column)
+            if statistics is not None:
+                statistics.version = store.column_version(column)
@@ -0,0 +1,649 @@
+# -*- coding: utf-8 -*-
+""" CSV IO
+
+Parsing of csv files into chunks of rows, shared by the loader thread of the editor, and writing of csv files for the
+saver thread of the editor.
+
+Files are either parsed serially by a single csv reader, or in parallel by splitting them into byte ranges (shards)
+aligned to record boundaries which are parsed by a pool of processes and stitched back in order.
+
+A line break only ends a record when it is outside of a quoted field. With the usual doubled quote escaping, a
+position is inside a quoted field iff an odd number of quote characters precede it, so the shard boundaries are found
+from the parity of the quote count before them. When the quoting does not follow that convention the boundaries are
+ambiguous and the parsing falls back to a single serial reader.
+
+The format of a file is detected from a bounded sample of its start: gzip, bz2, xz and zip archives from their magic
+bytes, the encoding from its byte order mark or else the first of a few candidate encodings decoding the sample, and the
+delimiter and quote character by the csv sniffer. Compressed files, and files in encodings where a line break is not a
+single byte, can not be addressed by byte offsets. They are streamed through a single serial reader, their data rows
+start at a character offset of the decoded text, and the progress is reported in bytes of the file as stored.
+
+Files are written to a temporary file next to the destination which replaces the destination only once it has been
+completely written and flushed to the disk, so a crash or a failure while saving never leaves a truncated file.
+
+This module does not depend on Qt.
+
+"""
+import bz2
+import codecs
+import contextlib
+import csv
+import gzip
+import io
+import itertools
+import locale
+import logging
+import lzma
+import mmap
+import os
+import re
+import stat
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+
+# Raised when the shard boundaries of a file can not be determined reliably
+class ShardingAmbiguous(Exception):
+    def __init__(self, position):
+        super(ShardingAmbiguous, self).__init__(position)
+        # Byte offset of the first record which has not been parsed yet
+        self.position = position
+
+
+# Number of bytes at the start of a file sampled to detect its format
+SAMPLE_SIZE = 64 * 1024
+
+# Delimiters recognized by the detection, the first one is used when the sample is not conclusive
+DELIMITERS = ',;\t|'
+
+# Permission mask of the process, read once at import on the main thread as reading it means setting it, which would
+# race with the files created by the other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+logger = logging.getLogger('csv_io')
+
+# Name of the decoding error handler reading the bytes which are invalid in the encoding of a file as Windows-1252
+# The encoding is detected from a sample of the start of the file, so the rest of it may hold bytes of a legacy codec
+LEGACY_FALLBACK = 'csv_io.legacy_fallback'
+
+# Number of bytes decoded by the fallback on the current thread, to warn about the files needing it
+_fallbacks = threading.local()
+
+# Magic bytes at the start of the compressed files
+COMPRESSION_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'), (b'PK\x03\x04', 'zip'))
+
+# Extensions of the compressed files, used to pick the compression of a written file
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zip': 'zip'}
+
+# Byte order marks and the encodings decoding them, the longer marks first as the UTF-32 LE one starts with the
+# UTF-16 LE one
+BYTE_ORDER_MARKS = ((codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'), (codecs.BOM_UTF8, 'utf-8-sig'),
+                    (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+# Opens a stream of the decompressed contents over a raw binary file, the raw file is left open when it is closed
+_DECOMPRESSORS = {
+    'gzip': lambda raw_file: gzip.GzipFile(fileobj=raw_file, mode='rb'),
+    'bz2': lambda raw_file: bz2.BZ2File(raw_file, mode='rb'),
+    'xz': lambda raw_file: lzma.LZMAFile(raw_file, mode='rb'),
+}
+
+# Opens a stream compressing into a raw binary file, the raw file is left open when it is closed
+_COMPRESSORS = {
+    # The default level 9 of gzip is several times slower for a barely smaller file
+    'gzip': lambda raw_file: gzip.GzipFile(fileobj=raw_file, mode='wb', compresslevel=6),
+    'bz2': lambda raw_file: bz2.BZ2File(raw_file, mode='wb'),
+    'xz': lambda raw_file: lzma.LZMAFile(raw_file, mode='wb'),
+}
+
+
+class CsvFormat(object):
+    """
+    Dialect, encoding and compression of a csv file
+    """
+
+    def __init__(self, delimiter=',', quotechar='"', encoding=None, compression=None):
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.encoding = encoding or default_encoding()
+        # One of the values of COMPRESSION_EXTENSIONS, None for a plain file
+        self.compression = compression
+
+    @property
+    def streamed(self):
+        """
+        Whether the file can only be read as a stream, see is_streamed
+        """
+        return is_streamed(self.encoding, self.compression)
+
+    def __repr__(self):
+        return 'CsvFormat(delimiter={!r}, quotechar={!r}, encoding={!r}, compression={!r})'.format(
+            self.delimiter, self.quotechar, self.encoding, self.compression)
+
+
+def default_encoding():
+    return locale.getpreferredencoding(False)
+
+
+def is_streamed(encoding, compression):
+    """
+    Whether a file can not be addressed by byte offsets, it is compressed or its line breaks are not single bytes
+    The data rows of such a file start at a character offset of its decoded text
+    """
+    return compression is not None or encode_character('\n', encoding or default_encoding()) != b'\n'
+
+
+def encode_character(character, encoding):
+    """
+    Encodes a delimiter, quote or line break character to search it in the bytes of a file
+    Unlike str.encode, the byte order mark some encodings put at the start of the text is left out
+    """
+    encoder = codecs.getincrementalencoder(encoding)()
+    # The byte order mark comes with the first encoded text
+    encoder.encode('')
+    return encoder.encode(character)
+
+
+def compression_for_path(csv_file_path):
+    """
+    Returns the compression matching the extension of a path, None for a plain file
+    """
+    return COMPRESSION_EXTENSIONS.get(os.path.splitext(csv_file_path)[1].lower())
+
+
+@contextlib.contextmanager
+def open_source(csv_file_path, compression=None):
+    """
+    Opens a file for reading its decompressed contents
+    Yields a tuple of (raw file, binary stream of the contents), the position of the raw file tells the number of
+    bytes of the file consumed by the stream, they are the same object for a plain file
+    The first member of a zip archive which is not a directory is read
+    """
+    with open(csv_file_path, 'rb') as raw_file:
+        if compression is None:
+            yield raw_file, raw_file
+        elif compression == 'zip':
+            with zipfile.ZipFile(raw_file) as archive:
+                members = [member for member in archive.infolist() if not member.is_dir()]
+                if not members:
+                    raise zipfile.BadZipFile('The archive does not contain any file')
+                with archive.open(members[0]) as stream:
+                    yield raw_file, stream
+        else:
+            with _DECOMPRESSORS[compression](raw_file) as stream:
+                yield raw_file, stream
+
+
+def detect_format(csv_file_path, sample_size=SAMPLE_SIZE):
+    """
+    Detects the compression, the encoding and the dialect of a file from a sample of its start
+    Returns a CsvFormat
+    """
+    with open(csv_file_path, 'rb') as raw_file:
+        magic = raw_file.read(8)
+    compression = next((name for prefix, name in COMPRESSION_MAGIC if magic.startswith(prefix)), None)
+
+    with open_source(csv_file_path, compression) as (_, stream):
+        sample = stream.read(sample_size)
+    complete = len(sample) < sample_size
+
+    encoding = detect_encoding(sample, complete)
+    # The sample may end in the middle of a character, the incremental decoder keeps those bytes back
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=complete)
+    delimiter, quotechar = detect_dialect(text, complete)
+    return CsvFormat(delimiter, quotechar, encoding, compression)
+
+
+def detect_encoding(sample, complete=True):
+    """
+    Returns the encoding of a sample of the start of a file
+    The encoding given by a byte order mark wins, otherwise the first of UTF-8, the locale preferred encoding and
+    Windows-1252 which decodes the sample is returned, Latin-1 decodes anything and is the last resort
+    :param complete: whether the sample holds the whole file, else its last character may be truncated
+    """
+    for byte_order_mark, encoding in BYTE_ORDER_MARKS:
+        if sample.startswith(byte_order_mark):
+            return encoding
+
+    for encoding in ('utf-8', default_encoding(), 'cp1252'):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=complete)
+        except (UnicodeDecodeError, LookupError):
+            continue
+        return encoding
+    return 'latin-1'
+
+
+def _decode_legacy(error):
+    """
+    Decoding error handler registered as LEGACY_FALLBACK, the bytes undefined in Windows-1252 are read as Latin-1
+    """
+    invalid = bytes(error.object[error.start:error.end])
+    _fallbacks.count = getattr(_fallbacks, 'count', 0) + len(invalid)
+    try:
+        return invalid.decode('cp1252'), error.end
+    except UnicodeDecodeError:
+        return invalid.decode('latin-1'), error.end
+
+
+codecs.register_error(LEGACY_FALLBACK, _decode_legacy)
+
+
+@contextlib.contextmanager
+def _warn_fallbacks(csv_file_path, encoding):
+    """
+    Logs a warning when the bytes of the file decoded within the context needed the LEGACY_FALLBACK handler
+    """
+    before = getattr(_fallbacks, 'count', 0)
+    try:
+        yield
+    finally:
+        decoded = getattr(_fallbacks, 'count', 0) - before
+        if decoded:
+            logger.warning('%d bytes of %s are not valid %s, they were read as Windows-1252', decoded, csv_file_path,
+                           encoding)
+
+
+def detect_dialect(text, complete=True):
+    """
+    Returns the delimiter and the quote character of a sample of the start of a file
+    Falls back to commas and double quotes when the sample is not conclusive, eg. for a single column
+    :param complete: whether the sample holds the whole file, else its last record may be truncated
+    """
+    if not complete:
+        # Only sniff the complete records, the last one is cut by the end of the sample
+        last_break = max(text.rfind('\n'), text.rfind('\r'))
+        if last_break > 0:
+            text = text[:last_break + 1]
+    # The sniffer expects the line breaks normalized like a file read in universal newlines mode
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=DELIMITERS)
+    except csv.Error:
+        return DELIMITERS[0], '"'
+    return dialect.delimiter, dialect.quotechar or '"'
+
+
+def find_record_end(data, position, quotechar, inside_quotes=False):
+    """
+    Returns the offset just after the first line break at or after position which is outside of a quoted field
+    Returns the length of the data when no such line break exists
+    :param data: bytes like object (or mmap) holding the file contents, or the decoded text of a streamed file
+    :param position: offset to start the search from
+    :param quotechar: quote character encoded as bytes, or empty bytes when the file has no quoting, a str when the
+                      data is text
+    :param inside_quotes: whether position is inside a quoted field
+    """
+    if isinstance(quotechar, str):
+        carriage_return, line_feed, separator = '\r', '\n', '|'
+    else:
+        carriage_return, line_feed, separator = b'\r', b'\n', b'|'
+    tokens = [carriage_return + line_feed, carriage_return, line_feed]
+    if quotechar:
+        tokens.insert(0, quotechar)
+    token = re.compile(separator.join(re.escape(token) for token in tokens))
+
+    while True:
+        match = token.search(data, position)
+        if match is None:
+            return len(data)
+        position = match.end()
+        if match.group() == quotechar:
+            inside_quotes = not inside_quotes
+        elif not inside_quotes:
+            # A \r at the end of the data may be the first half of a \r\n split across a boundary
+            if match.group() == carriage_return and position < len(data) and \
+                    data[position:position + 1] == line_feed:
+                position += 1
+            return position
+
+
+def read_header(csv_file_path, delimiter=',', quotechar='"', encoding=None, compression=None):
+    """
+    Parses the header row of a file
+    Returns the list of headers and the offset at which the data rows start, in bytes of the file, or in characters of
+    the decoded text for a streamed file (see is_streamed)
+    """
+    encoding = encoding or default_encoding()
+    if is_streamed(encoding, compression):
+        text = _read_streamed_header(csv_file_path, quotechar, encoding, compression)
+        header_end = len(text)
+    else:
+        with open(csv_file_path, 'rb') as raw_file:
+            try:
+                data = mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can not be mapped
+                return [], 0
+            with data:
+                header_end = find_record_end(data, 0, encode_character(quotechar, encoding))
+                text = data[:header_end].decode(encoding, LEGACY_FALLBACK)
+
+    headers = next(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter, quotechar=quotechar), [])
+    return headers, header_end
+
+
+def _read_streamed_header(csv_file_path, quotechar, encoding, compression):
+    """
+    Returns the decoded text of the header row of a streamed file, the file is decoded block by block until the end of
+    the header row is found
+    """
+    with open_source(csv_file_path, compression) as (_, stream):
+        text_file = io.TextIOWrapper(stream, encoding=encoding, errors=LEGACY_FALLBACK, newline='')
+        text = ''
+        while True:
+            block = text_file.read(SAMPLE_SIZE)
+            text += block
+            header_end = find_record_end(text, 0, quotechar)
+            # A record ending exactly at the end of the text may go on with the \n of a \r\n in the next block
+            if header_end < len(text) or not block:
+                return text[:header_end]
+
+
+def iter_serial_chunks(csv_file_path, start, chunk_sizes, delimiter=',', quotechar='"', encoding=None,
+                       compression=None):
+    """
+    Parses the file from the offset start with a single csv reader
+    Yields tuples of (list of rows, byte offset reached in the file)
+    The offset reached is counted in bytes of the file as stored, ie. compressed bytes for a compressed file
+    The bytes invalid in the encoding are read as Windows-1252 with a warning, see LEGACY_FALLBACK
+    :param start: offset of the first row to parse, see read_header
+    :param chunk_sizes: iterator giving the number of rows of each chunk
+    """
+    encoding = encoding or default_encoding()
+    with open_source(csv_file_path, compression) as (raw_file, stream), _warn_fallbacks(csv_file_path, encoding):
+        streamed = is_streamed(encoding, compression)
+        if not streamed:
+            raw_file.seek(start)
+        csv_file = io.TextIOWrapper(stream, encoding=encoding, errors=LEGACY_FALLBACK, newline='')
+        if streamed:
+            csv_file.read(start)
+        csv_file_read = csv.reader(csv_file, delimiter=delimiter, quotechar=quotechar)
+
+        rows = []
+        chunk_size = next(chunk_sizes)
+        for row_data in csv_file_read:
+            rows.append(row_data)
+            if len(rows) == chunk_size:
+                # The position of the underlying binary buffer tells the bytes consumed by the text reader
+                yield rows, raw_file.tell()
+                rows = []
+                chunk_size = next(chunk_sizes)
+
+        if rows:
+            yield rows, raw_file.tell()
+
+
+def scan_shard_quotes(csv_file_path, start, end, delimiter, quotechar):
+    """
+    Runs in a worker process, counts the quote characters of a byte range
+    Returns a tuple of (number of quote characters, whether a quote appears in the middle of an unquoted field)
+    """
+    with open(csv_file_path, 'rb') as raw_file:
+        raw_file.seek(start)
+        data = raw_file.read(end - start)
+
+    quote = re.escape(quotechar)
+    others = b'[^' + re.escape(delimiter) + quote + b'\r\n]'
+    # With doubled quote escaping a quote is always next to another quote, a delimiter or a line break
+    ambiguous = re.search(others + quote + others, data) is not None
+    return data.count(quotechar), ambiguous
+
+
+def parse_shard(csv_file_path, start, end, delimiter, quotechar, encoding):
+    """
+    Runs in a worker process, parses the records of a byte range aligned to record boundaries
+    The bytes invalid in the encoding are read as Windows-1252, see LEGACY_FALLBACK
+    The strict reader raises csv.Error when the range does not start or end at a record boundary
+    """
+    with open(csv_file_path, 'rb') as raw_file, _warn_fallbacks(csv_file_path, encoding):
+        raw_file.seek(start)
+        text = raw_file.read(end - start).decode(encoding, LEGACY_FALLBACK)
+
+    return list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter, quotechar=quotechar, strict=True))
+
+
+def shard_boundaries(csv_file_path, data, start, shard_size, delimiter, quotechar, executor):
+    """
+    Splits the byte range from start to the end of the file into shards aligned to record boundaries
+    Returns the list of boundary offsets, the first one being start and the last one the file size
+    :raises ShardingAmbiguous: if the quoting of the file does not allow finding the boundaries reliably
+    """
+    file_size = len(data)
+    raw_points = list(range(start, file_size, shard_size)) + [file_size]
+
+    if not quotechar or data.find(quotechar) == -1:
+        # Without any quotes every line break ends a record
+        boundaries = [start] + [find_record_end(data, point, b'') for point in raw_points[1:-1]] + [file_size]
+        return sorted(set(boundaries))
+
+    # Count the quotes of every raw range in parallel to get the quote parity at every raw point
+    scans = executor.map(scan_shard_quotes, [csv_file_path] * (len(raw_points) - 1), raw_points[:-1],
+                         raw_points[1:], [delimiter] * (len(raw_points) - 1), [quotechar] * (len(raw_points) - 1))
+    boundaries = [start]
+    quote_count = 0
+    for point, (count, ambiguous) in zip(raw_points[1:], scans):
+        if ambiguous:
+            raise ShardingAmbiguous(start)
+        quote_count += count
+        if point < file_size:
+            boundaries.append(find_record_end(data, point, quotechar, inside_quotes=quote_count % 2 == 1))
+
+    # An unbalanced number of quotes means the quoting is broken somewhere
+    if quote_count % 2 == 1:
+        raise ShardingAmbiguous(start)
+
+    boundaries.append(file_size)
+    return sorted(set(boundaries))
+
+
+def iter_parallel_chunks(csv_file_path, start, chunk_sizes, delimiter=',', quotechar='"', encoding=None,
+                         max_workers=None, shard_size=16 * 1024 * 1024):
+    """
+    Parses the file from the byte offset start by sharding it over a pool of processes
+    Yields tuples of (list of rows, byte offset reached in the file) in the order of the file
+    :param chunk_sizes: iterator giving the number of rows of each chunk
+    :raises ShardingAmbiguous: if the shards can not be parsed reliably, all the records before the position of
+                               the exception have been yielded
+    """
+    encoding = encoding or default_encoding()
+    if has_unreliable_quoting(delimiter, quotechar):
+        raise ShardingAmbiguous(start)
+
+    # Spawn the workers instead of forking the multi threaded GUI process
+    max_workers = max_workers or cpu_count()
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    # Keep a bounded window of shards in flight so finished shards do not pile up in memory
+    pending = deque()
+    try:
+        with open(csv_file_path, 'rb') as raw_file:
+            with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                try:
+                    boundaries = shard_boundaries(csv_file_path, data, start, shard_size,
+                                                  encode_character(delimiter, encoding),
+                                                  encode_character(quotechar, encoding), executor)
+                except BrokenProcessPool:
+                    raise ShardingAmbiguous(start)
+
+        for shard_start, shard_end in zip(boundaries[:-1], boundaries[1:]):
+            try:
+                future = executor.submit(parse_shard, csv_file_path, shard_start, shard_end, delimiter, quotechar,
+                                         encoding)
+            except BrokenProcessPool:
+                # The shards in flight failed with the pool, parse serially from the first one not yielded yet
+                raise ShardingAmbiguous(pending[0][0] if pending else shard_start)
+            pending.append((shard_start, shard_end, future))
+            if len(pending) < 2 * max_workers:
+                continue
+
+            for chunk in _collect_shard(pending.popleft(), chunk_sizes):
+                yield chunk
+
+        while pending:
+            for chunk in _collect_shard(pending.popleft(), chunk_sizes):
+                yield chunk
+    finally:
+        # Drop the shards not started yet and wait for the running ones so no worker process outlives the parsing,
+        # the futures are cancelled one by one as shutdown only takes cancel_futures from Python 3.9
+        for _, _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def _collect_shard(shard, chunk_sizes):
+    """
+    Waits for the rows of a shard and splits them into chunks
+    A shard failing to parse or whose worker process died is reported as ambiguous so it is parsed serially
+    """
+    shard_start, shard_end, future = shard
+    try:
+        rows = future.result()
+    except (csv.Error, UnicodeDecodeError, BrokenProcessPool):
+        raise ShardingAmbiguous(shard_start)
+
+    first = 0
+    while first < len(rows):
+        last = min(first + next(chunk_sizes), len(rows))
+        # Interpolate the byte position inside the shard for the progress
+        yield rows[first:last], shard_start + (shard_end - shard_start) * last // len(rows)
+        first = last
+
+
+def has_unreliable_quoting(delimiter, quotechar):
+    """
+    Whether the dialect can not be sharded using the quote parity
+    """
+    return not quotechar or quotechar == delimiter or quotechar in '\r\n'
+
+
+def iter_row_chunks(csv_file_path, start, chunk_sizes, delimiter=',', quotechar='"', encoding=None, compression=None,
+                    parallel=False, max_workers=None):
+    """
+    Parses the data rows of a file starting from the offset start given by read_header
+    Yields tuples of (list of rows, byte offset reached in the file)
+    :param chunk_sizes: iterator giving the number of rows of each chunk
+    :param parallel: whether to parse the file with a pool of processes, falls back to serial parsing when the
+                     shard boundaries are ambiguous or the pool breaks, streamed files are always parsed serially
+    """
+    if parallel and not is_streamed(encoding, compression):
+        try:
+            for chunk in iter_parallel_chunks(csv_file_path, start, chunk_sizes, delimiter, quotechar, encoding,
+                                              max_workers):
+                yield chunk
+            return
+        except ShardingAmbiguous as ambiguous:
+            # Everything before the position has been parsed already, continue from there
+            start = ambiguous.position
+
+    for chunk in iter_serial_chunks(csv_file_path, start, chunk_sizes, delimiter, quotechar, encoding, compression):
+        yield chunk
+
+
+def write_csv(csv_file_path, headers, rows, delimiter=',', quotechar='"', encoding=None, compression=None,
+              batch_size=10000, progress_callback=None):
+    """
+    Writes the header row and the rows to a file, atomically replacing the file if it already exists
+    :param csv_file_path: path of the destination file
+    :param headers: list of the headers written as the first row
+    :param rows: iterable of the rows, each row being a list of values
+    :param delimiter: field delimiter of the file
+    :param quotechar: quote character of the file
+    :param encoding: text encoding of the file, the locale preferred encoding is used by default
+    :param compression: one of the values of COMPRESSION_EXTENSIONS to compress the file, a zip archive holds a single
+                        member named after the file
+    :param batch_size: number of rows handed to the csv writer at once
+    :param progress_callback: optional function called with the number of rows written so far after every batch, it
+                              may raise an exception to abort the writing in which case the destination is untouched
+    """
+    directory = os.path.dirname(os.path.abspath(csv_file_path))
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.csv.tmp')
+    try:
+        with io.open(file_descriptor, 'wb', buffering=1024 * 1024) as raw_file:
+            with _open_target(raw_file, compression, os.path.basename(csv_file_path)) as stream:
+                byte_order_mark, encoding = _split_byte_order_mark(encoding or default_encoding())
+                stream.write(byte_order_mark)
+                csv_file = io.TextIOWrapper(stream, encoding=encoding, newline='')
+                writer = csv.writer(csv_file, delimiter=delimiter, quotechar=quotechar)
+                writer.writerow(headers)
+
+                rows = iter(rows)
+                rows_written = 0
+                while True:
+                    batch = list(itertools.islice(rows, batch_size))
+                    if not batch:
+                        break
+                    writer.writerows(batch)
+                    rows_written += len(batch)
+                    if progress_callback is not None:
+                        progress_callback(rows_written)
+
+                # The stream is closed by its context, and the raw file must stay open until it is synced
+                csv_file.flush()
+                csv_file.detach()
+
+            raw_file.flush()
+            os.fsync(raw_file.fileno())
+
+        _copy_permissions(csv_file_path, temp_path)
+        os.replace(temp_path, csv_file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _split_byte_order_mark(encoding):
+    """
+    Returns the byte order mark written at the start of a file and the encoding of the text following it
+    The text layer omits the byte order mark of UTF-16 and UTF-32 on the streams which can not seek, eg. compressed
+    ones, so it is written explicitly in little endian order
+    """
+    name = codecs.lookup(encoding).name
+    if name == 'utf-16':
+        return codecs.BOM_UTF16_LE, 'utf-16-le'
+    if name == 'utf-32':
+        return codecs.BOM_UTF32_LE, 'utf-32-le'
+    return b'', encoding
+
+
+@contextlib.contextmanager
+def _open_target(raw_file, compression, file_name):
+    """
+    Yields a binary stream writing the contents of a file into a raw file, compressed with the given compression
+    :param file_name: name of the written file, a zip archive names its member after it without the .zip extension
+    """
+    if compression is None:
+        yield raw_file
+    elif compression == 'zip':
+        file_name, extension = os.path.splitext(file_name)
+        if extension.lower() != '.zip':
+            file_name += extension
+        if not os.path.splitext(file_name)[1]:
+            file_name += '.csv'
+        with zipfile.ZipFile(raw_file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            with archive.open(file_name, 'w', force_zip64=True) as stream:
+                yield stream
+    else:
+        with _COMPRESSORS[compression](raw_file) as stream:
+            yield stream
+
+
+def _copy_permissions(csv_file_path, temp_path):
+    """
+    Gives the temporary file the permissions of the file it replaces, or the default permissions of a new file
+    mkstemp creates files readable only by their owner
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(csv_file_path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(temp_path, mode)
+
+
+def cpu_count():
+    return os.cpu_count() or 1
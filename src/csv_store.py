@@ -0,0 +1,875 @@
+# -*- coding: utf-8 -*-
+""" Column Store
+
+Compact column oriented storage for the data of the loaded csv file.
+
+Every column is kept as a single column object instead of one widget item per cell, so the memory used by a table is
+close to the size of the raw data and the Qt view only materializes the cells present in the viewport.
+
+The type of every column is inferred from the first rows appended to it and validated on every following chunk.
+Numeric columns are stored as int64/float64 NumPy arrays with a null mask for the blank cells, the other columns keep
+their text. The text of a numeric cell is formatted back from its value, float columns written with a fixed number of
+decimals (eg. '0.50000') remember it. The few cells whose text still differs from the formatted value (eg. '1e3' or
+'+5') keep their original text in a sparse dictionary so saving never alters the file.
+
+This module does not depend on Qt so that the same storage can be shared by the loader thread and the GUI thread.
+
+"""
+import itertools
+from collections import Counter
+
+import numpy as np
+
+
+# Number of the first values of a column used to infer its type
+INFERENCE_SAMPLE_SIZE = 1000
+
+# Approximate memory used by a str object and its reference in a list, on top of its characters
+STRING_OVERHEAD = 57
+
+# Source of the version stamps of the columns, a stamp is never reused so it identifies the contents of a column
+_version_stamps = itertools.count(1)
+
+
+def next_version():
+    """
+    Returns a new version stamp for a column whose contents have changed
+    """
+    return next(_version_stamps)
+
+
+def format_numbers(values, dtype, decimals=None):
+    """
+    Formats an array of numbers to the text they are displayed and saved with
+    Integral floats are formatted without the decimal part, so an int column promoted to float keeps its text
+    :param decimals: fixed number of decimals of a float column, None for the shortest representation
+    """
+    if dtype == np.int64:
+        return values.astype(str)
+    if decimals is not None:
+        return np.char.mod('%.{}f'.format(decimals), values)
+
+    texts = values.astype(str)
+    with np.errstate(invalid='ignore'):
+        integral = np.isfinite(values) & (np.abs(values) < 1e16) & (values == np.floor(values))
+    if integral.any():
+        texts = texts.astype(object)
+        texts[integral] = values[integral].astype(np.int64).astype(str)
+        texts = texts.astype(str)
+    return texts
+
+
+def parse_numbers(strings, dtype, decimals=None):
+    """
+    Parses a list of strings into an array of numbers of the given dtype
+    Returns a tuple of (values, null mask, texts which differ from the formatted values as {index: text})
+    :param decimals: fixed number of decimals of a float column, None for the shortest representation
+    :raises ValueError: if any non blank string is not a number of the given dtype
+    """
+    texts = np.array(strings, dtype=str)
+    nulls = texts == ''
+    try:
+        values = np.where(nulls, '0', texts).astype(dtype)
+    except OverflowError:
+        raise ValueError('number out of range')
+
+    differing = np.flatnonzero((format_numbers(values, dtype, decimals) != texts) & ~nulls)
+    return values, nulls, {int(index): strings[index] for index in differing}
+
+
+def infer_format(strings):
+    """
+    Infers the type of a column from a sample of its values
+    Returns a tuple of (np.int64, np.float64 or None for text columns, fixed number of decimals of a float column)
+    """
+    sample = [value for value in strings[:INFERENCE_SAMPLE_SIZE] if value != '']
+    if not sample:
+        return None, None
+
+    try:
+        _, _, texts = parse_numbers(sample, np.int64)
+        # Mostly non canonical ints such as zero padded codes are better kept as text
+        if len(texts) * 2 <= len(sample):
+            return np.int64, None
+        return None, None
+    except ValueError:
+        pass
+
+    try:
+        _, _, texts = parse_numbers(sample, np.float64)
+    except ValueError:
+        return None, None
+
+    # Values written with a fixed precision format like '%.5f' are kept formatted that way
+    decimal_counts = Counter(len(value) - value.index('.') - 1 for value in sample
+                             if '.' in value and 'e' not in value and 'E' not in value)
+    if decimal_counts:
+        decimals = decimal_counts.most_common(1)[0][0]
+        _, _, fixed_texts = parse_numbers(sample, np.float64, decimals)
+        if len(fixed_texts) < len(texts):
+            return np.float64, decimals
+    return np.float64, None
+
+
+class TextColumn(object):
+    """
+    Column keeping the text of its cells in a list
+    """
+    dtype = None
+
+    def __init__(self, values=None, untyped=False):
+        self.values = values if values is not None else []
+        # Whether the type of the column is not decided yet as all the cells appended so far are blank
+        self.untyped = untyped
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, row):
+        return self.values[row]
+
+    def set(self, row, value):
+        self.values[row] = value
+        return True
+
+    def clear(self, rows):
+        """
+        Blanks the given rows
+        :param rows: array of row indices
+        """
+        values = self.values
+        for row in rows.tolist():
+            values[row] = ''
+
+    def texts(self, start=0, stop=None):
+        return self.values[start:stop]
+
+    def texts_at(self, rows):
+        """
+        Returns the text of the given rows, in the given order
+        """
+        values = self.values
+        return [values[row] for row in rows]
+
+    def extend(self, strings):
+        self.values.extend(strings)
+        return True
+
+    def insert(self, position, count, value=''):
+        self.values[position:position] = [value] * count
+        return True
+
+    def delete(self, start, stop):
+        del self.values[start:stop]
+
+    def slice(self, start, stop):
+        """
+        Returns a detached column holding a copy of the given range of rows
+        """
+        return TextColumn(self.values[start:stop])
+
+    def take(self, rows):
+        """
+        Returns a detached column holding a copy of the given rows
+        :param rows: sorted array of distinct row indices
+        """
+        return TextColumn(self.texts_at(rows.tolist()))
+
+    def delete_rows(self, rows):
+        """
+        Deletes the given rows
+        :param rows: sorted array of distinct row indices
+        """
+        kept = np.ones(len(self.values), dtype=bool)
+        kept[rows] = False
+        self.values = list(itertools.compress(self.values, kept))
+
+    def splice(self, position, column):
+        """
+        Inserts all the rows of another column before position
+        """
+        self.values[position:position] = column.texts()
+        return True
+
+    def put(self, rows, column):
+        """
+        Inserts all the rows of another column so that they end up at the given indices, the reverse of delete_rows
+        :param rows: sorted array of distinct row indices, one per row of the other column
+        """
+        merged = np.empty(len(self.values) + len(rows), dtype=object)
+        inserted = np.zeros(len(merged), dtype=bool)
+        inserted[rows] = True
+        merged[inserted] = np.array(column.texts(), dtype=object)
+        merged[~inserted] = np.array(self.values, dtype=object)
+        self.values = merged.tolist()
+        return True
+
+    def memory_size(self):
+        """
+        Approximate memory used by the cells in bytes
+        """
+        return sum(STRING_OVERHEAD + len(value) for value in self.values)
+
+
+class NumericColumn(object):
+    """
+    Column storing its cells as an int64 or float64 array with a null mask for the blank cells
+    The arrays have spare capacity at the end so appending chunks does not copy the whole column every time
+    """
+    untyped = False
+
+    def __init__(self, dtype, values, nulls, texts, decimals=None):
+        self.dtype = dtype
+        self.decimals = decimals
+        self._values = values
+        self._nulls = nulls
+        self._length = len(values)
+        # Original text of the cells whose text differs from their formatted value, keyed by row
+        self.texts_by_row = texts
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def values(self):
+        return self._values[:self._length]
+
+    @property
+    def nulls(self):
+        return self._nulls[:self._length]
+
+    def _reserve(self, length):
+        if length <= len(self._values):
+            return
+        capacity = max(length, 2 * len(self._values), 1024)
+        values = np.zeros(capacity, dtype=self.dtype)
+        nulls = np.ones(capacity, dtype=bool)
+        values[:self._length] = self.values
+        nulls[:self._length] = self.nulls
+        self._values = values
+        self._nulls = nulls
+
+    def _parse_value(self, value):
+        """
+        Parses the text of a single cell, promotes an int column to float if needed
+        Returns the parsed number or None if the text is not a number of this column
+        """
+        try:
+            return self.dtype(int(value) if self.dtype == np.int64 else float(value))
+        except (ValueError, OverflowError):
+            pass
+        if self.dtype == np.int64:
+            try:
+                number = float(value)
+            except ValueError:
+                return None
+            self.promote_to_float()
+            return self.dtype(number)
+        return None
+
+    def get(self, row):
+        text = self.texts_by_row.get(row)
+        if text is not None:
+            return text
+        if self._nulls[row]:
+            return ''
+        return str(format_numbers(self._values[row:row + 1], self.dtype, self.decimals)[0])
+
+    def set(self, row, value):
+        """
+        Validates and stores the text of a single cell
+        Returns False if the text is not a number, in which case the column must be converted to text
+        """
+        if value == '':
+            self._nulls[row] = True
+            self.texts_by_row.pop(row, None)
+            return True
+
+        number = self._parse_value(value)
+        if number is None:
+            return False
+
+        self._values[row] = number
+        self._nulls[row] = False
+        if str(format_numbers(self._values[row:row + 1], self.dtype, self.decimals)[0]) != value:
+            self.texts_by_row[row] = value
+        else:
+            self.texts_by_row.pop(row, None)
+        return True
+
+    def clear(self, rows):
+        """
+        Blanks the given rows
+        :param rows: array of row indices
+        """
+        self._nulls[rows] = True
+        # Walk whichever is smaller, the differing texts or the cleared rows
+        if len(self.texts_by_row) < len(rows):
+            cleared = set(rows.tolist())
+            self.texts_by_row = {row: text for row, text in self.texts_by_row.items() if row not in cleared}
+        else:
+            for row in rows.tolist():
+                self.texts_by_row.pop(row, None)
+
+    def texts(self, start=0, stop=None):
+        stop = self._length if stop is None else min(stop, self._length)
+        texts = format_numbers(self._values[start:stop], self.dtype, self.decimals).tolist()
+        nulls = self._nulls[start:stop]
+        for index in np.flatnonzero(nulls):
+            texts[index] = ''
+
+        # Walk whichever is smaller, the differing texts or the rows of the range
+        if len(self.texts_by_row) < stop - start:
+            for row, text in self.texts_by_row.items():
+                if start <= row < stop:
+                    texts[row - start] = text
+        else:
+            for row in range(start, stop):
+                text = self.texts_by_row.get(row)
+                if text is not None:
+                    texts[row - start] = text
+        return texts
+
+    def texts_at(self, rows):
+        """
+        Returns the text of the given rows, in the given order
+        :param rows: array of row indices
+        """
+        texts = format_numbers(self._values[rows], self.dtype, self.decimals).tolist()
+        for index in np.flatnonzero(self._nulls[rows]):
+            texts[index] = ''
+        if self.texts_by_row:
+            for index, row in enumerate(rows.tolist()):
+                text = self.texts_by_row.get(row)
+                if text is not None:
+                    texts[index] = text
+        return texts
+
+    def extend(self, strings):
+        """
+        Validates and appends a chunk of values
+        Returns False if any value is not a number, in which case the column must be converted to text
+        """
+        try:
+            values, nulls, texts = parse_numbers(strings, self.dtype, self.decimals)
+        except ValueError:
+            if self.dtype == np.float64:
+                return False
+            try:
+                values, nulls, texts = parse_numbers(strings, np.float64)
+            except ValueError:
+                return False
+            self.promote_to_float()
+
+        self._reserve(self._length + len(values))
+        self._values[self._length:self._length + len(values)] = values
+        self._nulls[self._length:self._length + len(values)] = nulls
+        for index, text in texts.items():
+            self.texts_by_row[self._length + index] = text
+        self._length += len(values)
+        return True
+
+    def insert(self, position, count, value=''):
+        """
+        Inserts count cells with the given value before position
+        Returns False if the value is not a number, in which case the column must be converted to text
+        """
+        number = None
+        if value != '':
+            number = self._parse_value(value)
+            if number is None:
+                return False
+
+        self._move_tail(position, count)
+        self._values[position:position + count] = number if number is not None else 0
+        self._nulls[position:position + count] = number is None
+
+        self.texts_by_row = {row + count if row >= position else row: text for row, text in self.texts_by_row.items()}
+        if number is not None:
+            for row in range(position, position + count):
+                self.set(row, value)
+        return True
+
+    def _move_tail(self, position, count):
+        """
+        Shifts the rows from position by count rows, towards the end when count is positive
+        """
+        if count > 0:
+            self._reserve(self._length + count)
+        stop = self._length
+        self._values[position + count:stop + count] = self._values[position:stop].copy()
+        self._nulls[position + count:stop + count] = self._nulls[position:stop].copy()
+        self._length += count
+
+    def delete(self, start, stop):
+        count = stop - start
+        self._move_tail(stop, -count)
+        self.texts_by_row = {row - count if row >= stop else row: text
+                             for row, text in self.texts_by_row.items() if not start <= row < stop}
+
+    def slice(self, start, stop):
+        """
+        Returns a detached column holding a copy of the given range of rows
+        """
+        texts = {row - start: text for row, text in self.texts_by_row.items() if start <= row < stop}
+        return NumericColumn(self.dtype, self._values[start:stop].copy(), self._nulls[start:stop].copy(), texts,
+                             self.decimals)
+
+    def take(self, rows):
+        """
+        Returns a detached column holding a copy of the given rows
+        :param rows: sorted array of distinct row indices
+        """
+        texts = {index: self.texts_by_row[row] for index, row in enumerate(rows.tolist()) if row in self.texts_by_row}
+        return NumericColumn(self.dtype, self.values[rows], self.nulls[rows], texts, self.decimals)
+
+    def delete_rows(self, rows):
+        """
+        Deletes the given rows
+        :param rows: sorted array of distinct row indices
+        """
+        kept = np.ones(self._length, dtype=bool)
+        kept[rows] = False
+        self._values = self.values[kept]
+        self._nulls = self.nulls[kept]
+        self._length = len(self._values)
+
+        # Every remaining row moves up by the number of deleted rows before it
+        texts = {}
+        for row, text in self.texts_by_row.items():
+            if kept[row]:
+                texts[row - int(np.searchsorted(rows, row))] = text
+        self.texts_by_row = texts
+
+    def splice(self, position, column):
+        """
+        Inserts all the rows of another column before position
+        Returns False if a value is not a number of this column, in which case the column must be converted to text
+        """
+        if isinstance(column, NumericColumn) and column.dtype == self.dtype and column.decimals == self.decimals:
+            values, nulls, texts = column.values, column.nulls, column.texts_by_row
+        else:
+            try:
+                values, nulls, texts = parse_numbers(column.texts(), self.dtype, self.decimals)
+            except ValueError:
+                return False
+
+        count = len(values)
+        self._move_tail(position, count)
+        self._values[position:position + count] = values
+        self._nulls[position:position + count] = nulls
+        self.texts_by_row = {row + count if row >= position else row: text for row, text in self.texts_by_row.items()}
+        for row, text in texts.items():
+            self.texts_by_row[position + row] = text
+        return True
+
+    def put(self, rows, column):
+        """
+        Inserts all the rows of another column so that they end up at the given indices, the reverse of delete_rows
+        Returns False if a value is not a number of this column, in which case the column must be converted to text
+        :param rows: sorted array of distinct row indices, one per row of the other column
+        """
+        if isinstance(column, NumericColumn) and column.dtype == self.dtype and column.decimals == self.decimals:
+            values, nulls, texts = column.values, column.nulls, column.texts_by_row
+        else:
+            try:
+                values, nulls, texts = parse_numbers(column.texts(), self.dtype, self.decimals)
+            except ValueError:
+                return False
+
+        length = self._length + len(rows)
+        inserted = np.zeros(length, dtype=bool)
+        inserted[rows] = True
+        merged_values = np.empty(length, dtype=self.dtype)
+        merged_nulls = np.empty(length, dtype=bool)
+        merged_values[inserted] = values
+        merged_nulls[inserted] = nulls
+        merged_values[~inserted] = self.values
+        merged_nulls[~inserted] = self.nulls
+
+        kept_rows = np.flatnonzero(~inserted)
+        merged_texts = {int(kept_rows[row]): text for row, text in self.texts_by_row.items()}
+        for row, text in texts.items():
+            merged_texts[int(rows[row])] = text
+
+        self._values = merged_values
+        self._nulls = merged_nulls
+        self._length = length
+        self.texts_by_row = merged_texts
+        return True
+
+    def memory_size(self):
+        """
+        Approximate memory used by the cells in bytes
+        """
+        return self.values.nbytes + self.nulls.nbytes + \
+            sum(2 * STRING_OVERHEAD + len(text) for text in self.texts_by_row.values())
+
+    def promote_to_float(self):
+        """
+        Converts an int column to float, the text of the cells is unchanged as integral floats format like ints
+        The ints which are not formatted back the same as floats, eg. beyond 2 ** 53 or 1e16, keep their text
+        """
+        values = self.values
+        floats = values.astype(np.float64)
+        texts = format_numbers(values, np.int64)
+        changed = np.flatnonzero((format_numbers(floats, np.float64) != texts) & ~self.nulls)
+        for row in changed.tolist():
+            self.texts_by_row.setdefault(row, str(texts[row]))
+        self._values = self._values.astype(np.float64)
+        self.dtype = np.float64
+        self.decimals = None
+
+    def to_text_column(self):
+        return TextColumn(self.texts())
+
+
+def make_column(strings):
+    """
+    Creates a column holding the given values, typed according to the values
+    """
+    dtype, decimals = infer_format(strings)
+    if dtype is not None:
+        # The sample may be ints while the rest of the values are floats
+        for candidate in (np.int64, np.float64) if dtype == np.int64 else (np.float64,):
+            try:
+                values, nulls, texts = parse_numbers(strings, candidate, decimals)
+                return NumericColumn(candidate, values, nulls, texts, decimals)
+            except ValueError:
+                pass
+    return TextColumn(list(strings), untyped=dtype is None and not any(strings))
+
+
+def parse_numeric_column(strings):
+    """
+    Parses the values of a column into numbers if all of them are numeric
+    Returns a tuple of (values, null mask) or None if the column is not numeric
+    """
+    for dtype in (np.int64, np.float64):
+        try:
+            values, nulls, _ = parse_numbers(strings, dtype)
+            return values, nulls
+        except ValueError:
+            pass
+    return None
+
+
+class RemovedRows(object):
+    """
+    Rows removed from a ColumnStore, kept as one detached column per column of the table
+    """
+
+    def __init__(self, count, columns):
+        self.count = count
+        self.columns = columns
+
+    @property
+    def size(self):
+        return sum(column.memory_size() for column in self.columns)
+
+
+class RemovedRowSet(object):
+    """
+    Rows removed from a ColumnStore at scattered indices, kept as one detached column per column of the table
+    """
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+
+    @property
+    def count(self):
+        return len(self.rows)
+
+    @property
+    def size(self):
+        return self.rows.nbytes + sum(column.memory_size() for column in self.columns)
+
+
+class RemovedColumn(object):
+    """
+    Column removed from a ColumnStore with its heading
+    """
+
+    def __init__(self, header, column):
+        self.header = header
+        self.column = column
+
+    @property
+    def size(self):
+        return len(self.header) + self.column.memory_size()
+
+
+class ColumnStore(object):
+    """
+    Stores the table data column wise
+    headers[c] is the heading of column c and columns[c] is the column object holding the cells of column c
+    versions[c] is the version stamp of column c, it changes whenever any cell of the column changes
+    """
+
+    def __init__(self, headers=None):
+        self.headers = []
+        self.columns = []
+        self.versions = []
+        self._row_count = 0
+
+        for header in headers or []:
+            self.headers.append(header)
+            self.columns.append(TextColumn())
+            self.versions.append(next_version())
+
+    @classmethod
+    def from_columns(cls, headers, columns):
+        """
+        Creates a store holding already built columns, eg. the ones read back from the store cache
+        :param headers: list of the headers
+        :param columns: list of the column objects, one per header and all of the same length
+        """
+        store = cls(headers)
+        store.columns = list(columns)
+        store._row_count = len(columns[0]) if columns else 0
+        return store
+
+    def close(self):
+        """
+        Releases the resources held by the store, nothing to release for the in memory store
+        """
+        pass
+
+    def row_count(self):
+        return self._row_count
+
+    def column_count(self):
+        return len(self.columns)
+
+    def column_dtype(self, column):
+        """
+        Returns the dtype of a column, np.int64, np.float64 or None for text columns
+        """
+        return self.columns[column].dtype
+
+    def column_version(self, column):
+        """
+        Returns the version stamp of a column, equal stamps mean equal contents
+        """
+        return self.versions[column]
+
+    def value(self, row, column):
+        """
+        Returns the text of a single cell
+        :param row: index of the row of the cell
+        :param column: index of the column of the cell
+        """
+        return self.columns[column].get(row)
+
+    def set_value(self, row, column, value):
+        """
+        Updates the text of a single cell, only this cell is validated against the type of the column
+        A numeric column is converted to text if the value is not a number
+        :param row: index of the row of the cell
+        :param column: index of the column of the cell
+        :param value: new text of the cell
+        """
+        if not self.columns[column].set(row, value):
+            self.columns[column] = self.columns[column].to_text_column()
+            self.columns[column].set(row, value)
+        self.versions[column] = next_version()
+
+    def clear_cells(self, rows, column):
+        """
+        Blanks many cells of a column at once
+        Returns a tuple of (array of the rows which were not blank, list of their previous texts)
+        :param rows: array of distinct row indices
+        :param column: index of the column of the cells
+        """
+        texts = self.columns[column].texts_at(rows)
+        filled = np.fromiter((text != '' for text in texts), dtype=bool, count=len(texts))
+        rows = rows[filled]
+        self.columns[column].clear(rows)
+        self.versions[column] = next_version()
+        return rows, list(itertools.compress(texts, filled))
+
+    def row(self, row, columns=None):
+        """
+        Returns the values of a row as a list
+        :param row: index of the row
+        :param columns: optional list of the column indices to fetch, all the columns are fetched by default
+        """
+        if columns is None:
+            columns = range(len(self.columns))
+        return [self.columns[column].get(row) for column in columns]
+
+    def iter_rows(self, columns=None, start=0, stop=None, batch_size=10000, order=None):
+        """
+        Yields the rows of the table in order as lists of values
+        :param columns: optional list of the column indices to fetch, all the columns are fetched by default
+        :param start: index of the first row
+        :param stop: index after the last row, the end of the table by default
+        :param batch_size: number of rows whose text is formatted at once
+        :param order: optional permutation of the rows as an array of row indices, start and stop then index it
+        """
+        if columns is None:
+            columns = range(len(self.columns))
+        stop = self._row_count if stop is None else min(stop, self._row_count)
+        for batch_start in range(start, stop, batch_size):
+            batch_stop = min(batch_start + batch_size, stop)
+            if order is None:
+                selected = [self.columns[column].texts(batch_start, batch_stop) for column in columns]
+            else:
+                rows = order[batch_start:batch_stop]
+                selected = [self.columns[column].texts_at(rows) for column in columns]
+            for values in zip(*selected):
+                yield list(values)
+
+    def column_values(self, column):
+        """
+        Returns the list of the text of all the cells of a column
+        """
+        return self.columns[column].texts()
+
+    def column_texts(self, columns, start=0, stop=None):
+        """
+        Returns the texts of a range of rows of the given columns, as one list per column
+        :param columns: list of the column indices to fetch
+        :param start: index of the first row
+        :param stop: index after the last row, the end of the table by default
+        """
+        return [self.columns[column].texts(start, stop) for column in columns]
+
+    def numeric_values(self, column):
+        """
+        Returns the values of a numeric column as a tuple of (values array, null mask array)
+        Returns None for text columns
+        """
+        column = self.columns[column]
+        if column.dtype is None:
+            return None
+        return column.values, column.nulls
+
+    def append_rows(self, rows):
+        """
+        Appends the parsed rows at the end of the table
+        Rows wider than the table add new blank columns and shorter rows are padded with blank cells
+        The first rows appended to a column with a non blank cell decide its type, the following ones are validated
+        against it, so a column starting with blank cells is still typed by its values
+        :param rows: list of rows where each row is a list of cell values
+        """
+        if not rows:
+            return
+
+        widest_row = max(len(row_data) for row_data in rows)
+        while len(self.columns) < widest_row:
+            self.insert_column(len(self.columns), '')
+
+        for column in range(len(self.columns)):
+            strings = [row_data[column] if column < len(row_data) else '' for row_data in rows]
+            if len(self.columns[column]) == 0:
+                self.columns[column] = make_column(strings)
+            elif self.columns[column].untyped and any(strings):
+                self.columns[column] = make_column(self.columns[column].texts() + strings)
+            elif not self.columns[column].extend(strings):
+                self.columns[column] = self.columns[column].to_text_column()
+                self.columns[column].extend(strings)
+            self.versions[column] = next_version()
+
+        self._row_count += len(rows)
+
+    def insert_rows(self, position, count, value=''):
+        """
+        Inserts blank rows in the table
+        :param position: index of the row before which the new rows are inserted
+        :param count: number of rows to insert
+        :param value: default value for the cells of the new rows
+        """
+        for column in range(len(self.columns)):
+            if not self.columns[column].insert(position, count, value):
+                self.columns[column] = self.columns[column].to_text_column()
+                self.columns[column].insert(position, count, value)
+            self.versions[column] = next_version()
+        self._row_count += count
+
+    def remove_rows(self, position, count):
+        """
+        Removes a contiguous range of rows from the table
+        Returns the removed rows, which restore_rows can insert back
+        :param position: index of the first row to remove
+        :param count: number of rows to remove
+        """
+        removed = RemovedRows(count, [column.slice(position, position + count) for column in self.columns])
+        for column in range(len(self.columns)):
+            self.columns[column].delete(position, position + count)
+            self.versions[column] = next_version()
+        self._row_count -= count
+        return removed
+
+    def restore_rows(self, position, removed):
+        """
+        Inserts back rows returned by remove_rows, the columns must be the same as when they were removed
+        :param position: index of the row before which the rows are inserted
+        :param removed: rows returned by remove_rows
+        """
+        for column in range(len(self.columns)):
+            if not self.columns[column].splice(position, removed.columns[column]):
+                self.columns[column] = self.columns[column].to_text_column()
+                self.columns[column].splice(position, removed.columns[column])
+            self.versions[column] = next_version()
+        self._row_count += removed.count
+
+    def remove_row_set(self, rows):
+        """
+        Removes rows at scattered indices in one pass over every column
+        Returns the removed rows, which restore_row_set can insert back
+        :param rows: sorted array of distinct row indices
+        """
+        removed = RemovedRowSet(rows, [column.take(rows) for column in self.columns])
+        for column in range(len(self.columns)):
+            self.columns[column].delete_rows(rows)
+            self.versions[column] = next_version()
+        self._row_count -= len(rows)
+        return removed
+
+    def restore_row_set(self, rows, removed):
+        """
+        Inserts back rows returned by remove_row_set at their former indices
+        :param rows: indices the rows were removed from
+        :param removed: rows returned by remove_row_set
+        """
+        for column in range(len(self.columns)):
+            if not self.columns[column].put(rows, removed.columns[column]):
+                self.columns[column] = self.columns[column].to_text_column()
+                self.columns[column].put(rows, removed.columns[column])
+            self.versions[column] = next_version()
+        self._row_count += len(rows)
+
+    def insert_column(self, position, header, value=''):
+        """
+        Inserts a new column in the table
+        :param position: index of the column before which the new column is inserted
+        :param header: heading of the new column
+        :param value: default value for all the cells of the new column
+        """
+        self.headers.insert(position, header)
+        self.columns.insert(position, make_column([value] * self._row_count))
+        self.versions.insert(position, next_version())
+
+    def remove_column(self, position):
+        """
+        Removes a column from the table
+        Returns the removed column, which restore_column can insert back
+        :param position: index of the column to remove
+        """
+        removed = RemovedColumn(self.headers[position], self.columns[position])
+        del self.headers[position]
+        del self.columns[position]
+        del self.versions[position]
+        return removed
+
+    def restore_column(self, position, removed):
+        """
+        Inserts back a column returned by remove_column, the rows must be the same as when it was removed
+        :param position: index of the column before which the column is inserted
+        :param removed: column returned by remove_column
+        """
+        self.headers.insert(position, removed.header)
+        self.columns.insert(position, removed.column)
+        self.versions.insert(position, next_version())
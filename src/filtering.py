@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+""" Filtering
+
+Row filters typed in the filter bar, eg. status == "FAILED" and latency > 500.
+
+A filter is a boolean expression of comparisons between a column and a value, combined with and, or, not and
+parentheses. Every comparison is evaluated at once over a whole column as a NumPy boolean mask, numeric columns by
+value and the other columns by text, and the masks are combined with the boolean operators. The rows of the data are
+never copied, the mask only tells which rows the view keeps in its index of rows.
+
+The masks are cached by the version stamp of their column and the comparison, so changing one clause of a filter
+only scans the column of that clause again, and an edit of a column only invalidates the masks of this column.
+
+This module does not depend on Qt.
+
+"""
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+# Number of the masks kept by a MaskCache, a mask costs one byte per row
+MAX_CACHED_MASKS = 32
+
+COMPARISON_OPERATORS = ('==', '!=', '<', '<=', '>', '>=', 'contains')
+
+_TOKEN_PATTERN = re.compile(r'''
+    \s*(?:
+        (?P<parenthesis>[()])
+      | (?P<operator>==|!=|<=|>=|<|>|=)
+      | "(?P<double_quoted>[^"]*)"
+      | '(?P<single_quoted>[^']*)'
+      | `(?P<backquoted>[^`]*)`
+      | (?P<word>[^\s()<>=!"'`]+)
+    )''', re.VERBOSE)
+
+_KEYWORDS = ('and', 'or', 'not', 'contains')
+
+
+class FilterSyntaxError(ValueError):
+    """
+    Raised for a filter text which can not be parsed, the message is meant to be shown to the user
+    """
+    pass
+
+
+class Comparison(object):
+    """
+    Comparison of the cells of a column with a value, the leaves of a filter expression
+    """
+
+    def __init__(self, column, operator, value):
+        """
+        :param column: index of the column
+        :param operator: one of COMPARISON_OPERATORS
+        :param value: text of the value as typed, compared as a number with the numeric cells if it is one
+        """
+        self.column = column
+        self.operator = operator
+        self.value = value
+
+    def mask(self, store, cache):
+        return cache.mask(store, self)
+
+    def __repr__(self):
+        return 'Comparison({}, {!r}, {!r})'.format(self.column, self.operator, self.value)
+
+
+class Combination(object):
+    """
+    Boolean operator applied to sub expressions: 'and', 'or' with any number of operands or 'not' with one
+    """
+
+    def __init__(self, operator, operands):
+        self.operator = operator
+        self.operands = operands
+
+    def mask(self, store, cache):
+        masks = [operand.mask(store, cache) for operand in self.operands]
+        if self.operator == 'not':
+            return ~masks[0]
+        combine = np.logical_and if self.operator == 'and' else np.logical_or
+        result = masks[0].copy()
+        for mask in masks[1:]:
+            combine(result, mask, out=result)
+        return result
+
+    def __repr__(self):
+        return 'Combination({!r}, {!r})'.format(self.operator, self.operands)
+
+
+class MaskCache(object):
+    """
+    Least recently used cache of the masks of the comparisons, keyed by the version stamp of their column
+    A new version of a column discards the masks computed for its previous version
+    """
+
+    def __init__(self, max_size=MAX_CACHED_MASKS):
+        self.max_size = max_size
+        self.masks = OrderedDict()
+        # Version of every column the cached masks were computed for
+        self.column_versions = {}
+
+    def clear(self):
+        self.masks.clear()
+        self.column_versions.clear()
+
+    def mask(self, store, comparison):
+        """
+        Returns the boolean mask of the rows of the store matching the comparison, the mask must not be modified
+        """
+        version = store.column_version(comparison.column)
+        previous_version = self.column_versions.get(comparison.column)
+        if previous_version is not None and previous_version != version:
+            for key in [key for key in self.masks if key[0] == previous_version]:
+                del self.masks[key]
+        self.column_versions[comparison.column] = version
+
+        key = (version, comparison.operator, comparison.value)
+        mask = self.masks.get(key)
+        if mask is not None:
+            self.masks.move_to_end(key)
+            return mask
+
+        mask = comparison_mask(store, comparison)
+        mask.flags.writeable = False
+        self.masks[key] = mask
+        while len(self.masks) > self.max_size:
+            self.masks.popitem(last=False)
+        return mask
+
+
+def parse_number(text):
+    """
+    Returns the text as a float, or None if it is not a number
+    """
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def comparison_mask(store, comparison):
+    """
+    Evaluates a comparison over all the rows of a store
+    Blank cells only match == '' and != with a non blank value
+    """
+    operator, value = comparison.operator, comparison.value
+    number = parse_number(value)
+    numeric = store.numeric_values(comparison.column) if operator != 'contains' else None
+
+    if numeric is not None and (number is not None or value == ''):
+        values, nulls = numeric
+        if value == '':
+            return nulls.copy() if operator == '==' else ~nulls if operator == '!=' else np.zeros(len(nulls), bool)
+        with np.errstate(invalid='ignore'):
+            mask = _compare(values, operator, number)
+        if operator == '!=':
+            return mask | nulls
+        return mask & ~nulls
+
+    texts = np.array(store.column_values(comparison.column), dtype=object)
+    if operator == 'contains':
+        value = value.lower()
+        return np.fromiter((value in text.lower() for text in texts), dtype=bool, count=len(texts))
+    if operator in ('==', '!='):
+        return _compare(texts, operator, value)
+
+    blanks = texts == ''
+    if number is not None:
+        # Ordering a text column against a number compares the cells which are numbers, the others never match
+        texts = np.fromiter((_to_float(text) for text in texts), dtype=np.float64, count=len(texts))
+        with np.errstate(invalid='ignore'):
+            return _compare(texts, operator, number) & ~np.isnan(texts)
+    return _compare(texts, operator, value) & ~blanks
+
+
+def _to_float(text):
+    number = parse_number(text) if text else None
+    return np.nan if number is None else number
+
+
+def _compare(values, operator, value):
+    if operator == '==':
+        mask = values == value
+    elif operator == '!=':
+        mask = values != value
+    elif operator == '<':
+        mask = values < value
+    elif operator == '<=':
+        mask = values <= value
+    elif operator == '>':
+        mask = values > value
+    else:
+        mask = values >= value
+    return np.asarray(mask, dtype=bool)
+
+
+def parse(text, headers):
+    """
+    Parses the text of a filter into an expression whose mask(store, cache) method evaluates it
+    Returns None for a blank text
+    The columns are given by their header, quoted in backquotes or double quotes when it has spaces, the values are
+    numbers, words or quoted texts. and binds tighter than or. The keywords and the headers are not case sensitive,
+    an exact match of a header wins.
+    :param text: text typed in the filter bar
+    :param headers: list of the headers of the columns of the table
+    :raises FilterSyntaxError: if the text is not a valid filter
+    """
+    tokens = _tokenize(text)
+    if not tokens:
+        return None
+    parser = _Parser(tokens, headers)
+    expression = parser.parse_or()
+    if parser.position < len(tokens):
+        raise FilterSyntaxError('Unexpected {!r}'.format(tokens[parser.position][1]))
+    return expression
+
+
+def _tokenize(text):
+    """
+    Splits a filter into a list of (kind, text) tokens, the kinds being the group names of _TOKEN_PATTERN, the words
+    which are keywords having the kind 'keyword'
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None:
+            raise FilterSyntaxError('Unexpected {!r}'.format(text[position:].strip()[:20]))
+        kind = match.lastgroup
+        token = match.group(kind)
+        if kind == 'word' and token.lower() in _KEYWORDS:
+            kind, token = 'keyword', token.lower()
+        elif kind == 'operator' and token == '=':
+            token = '=='
+        elif kind in ('double_quoted', 'single_quoted'):
+            kind = 'quoted'
+        tokens.append((kind, token))
+        position = match.end()
+    return tokens
+
+
+class _Parser(object):
+    """
+    Recursive descent parser of the tokens of a filter
+    """
+
+    def __init__(self, tokens, headers):
+        self.tokens = tokens
+        self.headers = headers
+        self.lower_headers = [header.lower() for header in headers]
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def take(self):
+        token = self.peek()
+        if token[0] is None:
+            raise FilterSyntaxError('Incomplete filter')
+        self.position += 1
+        return token
+
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while self.peek() == ('keyword', 'or'):
+            self.position += 1
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else Combination('or', operands)
+
+    def parse_and(self):
+        operands = [self.parse_not()]
+        while self.peek() == ('keyword', 'and'):
+            self.position += 1
+            operands.append(self.parse_not())
+        return operands[0] if len(operands) == 1 else Combination('and', operands)
+
+    def parse_not(self):
+        if self.peek() == ('keyword', 'not'):
+            self.position += 1
+            return Combination('not', [self.parse_not()])
+        if self.peek() == ('parenthesis', '('):
+            self.position += 1
+            expression = self.parse_or()
+            if self.take() != ('parenthesis', ')'):
+                raise FilterSyntaxError('Missing )')
+            return expression
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        kind, name = self.take()
+        if kind not in ('word', 'quoted', 'backquoted'):
+            raise FilterSyntaxError('Expected a column instead of {!r}'.format(name))
+        column = self.find_column(name)
+
+        kind, operator = self.take()
+        if kind not in ('operator', 'keyword') or operator not in COMPARISON_OPERATORS:
+            raise FilterSyntaxError('Expected a comparison after {!r} instead of {!r}'.format(name, operator))
+
+        kind, value = self.take()
+        if kind not in ('word', 'quoted'):
+            raise FilterSyntaxError('Expected a value after {!r} instead of {!r}'.format(operator, value))
+        return Comparison(column, operator, value)
+
+    def find_column(self, name):
+        if name in self.headers:
+            return self.headers.index(name)
+        if name.lower() in self.lower_headers:
+            return self.lower_headers.index(name.lower())
+        raise FilterSyntaxError('No column named {!r}'.format(name))
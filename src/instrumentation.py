@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+""" Instrumentation
+
+Timing and profiling of the operations of the editor, to investigate slow files and attach measures to bug reports.
+
+The operations are timed by named spans, eg. load, parse, populate, save, plot-build and draw. Every span is written
+as one record holding its name, start time, duration, thread and fields such as the number of rows. Tracing is set by
+the CSV_EDITOR_TRACE environment variable:
+    CSV_EDITOR_TRACE=log            the spans are logged by the instrumentation logger at the INFO level
+    CSV_EDITOR_TRACE=spans.jsonl    the spans are appended to the file as JSON lines
+When tracing is off, which is the default, span returns a shared object which does nothing, so a span costs a single
+function call.
+
+Profiles are recorded by cProfile between start_profiling and stop_profiling, which dumps them to a .prof file to be
+read by pstats or snakeviz. The profiler of the thread which starts the profiling is merged with the profilers of the
+worker threads run under thread_profile meanwhile. Setting CSV_EDITOR_PROFILE to the path of a .prof file records the
+whole session, the profile being dumped when the editor exits.
+
+This module does not depend on Qt.
+
+"""
+import atexit
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_VARIABLE = 'CSV_EDITOR_TRACE'
+PROFILE_VARIABLE = 'CSV_EDITOR_PROFILE'
+
+logger = logging.getLogger('instrumentation')
+
+# Writes the ended spans, None when tracing is off
+_sink = None
+
+# Profiling in progress, None when not profiling
+_session = None
+
+
+# Writes the spans to the instrumentation logger
+class LoggingSink(object):
+    def __init__(self):
+        logger.setLevel(logging.INFO)
+        # The records would otherwise only be shown from the WARNING level
+        if not logging.getLogger().handlers:
+            logging.basicConfig(format='%(asctime)s %(name)s %(message)s')
+
+    def write(self, record):
+        fields = {key: value for key, value in record.items() if key not in ('span', 'start', 'seconds')}
+        logger.info('%s %.3fs %s', record['span'], record['seconds'], json.dumps(fields, default=str))
+
+    def close(self):
+        pass
+
+
+# Appends the spans to a JSON lines file, the spans of the worker threads are written under a lock
+class JsonLinesSink(object):
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = io.open(path, 'a', encoding='utf-8', buffering=1)
+
+    def write(self, record):
+        line = json.dumps(record, default=str) + '\n'
+        with self.lock:
+            self.file.write(line)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class Span(object):
+    """
+    Timed operation, written when it ends
+    Used as a context manager around the operation, or ended explicitly by end when the operation is over in another
+    handler, eg. once a worker thread reports that it is done
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        self.end()
+        return False
+
+    def set(self, **fields):
+        """
+        Adds fields to the record of the span, eg. the number of rows once they are known
+        """
+        self.fields.update(fields)
+
+    def end(self, **fields):
+        """
+        Writes the span, only the first call of an ended span does anything
+        """
+        if self.start is None:
+            return
+        seconds = time.perf_counter() - self.start
+        self.start = None
+        self.fields.update(fields)
+
+        sink = _sink
+        if sink is not None:
+            record = {'span': self.name, 'start': self.start_time, 'seconds': seconds,
+                      'thread': threading.current_thread().name}
+            record.update(self.fields)
+            sink.write(record)
+
+
+# Span returned while tracing is off
+class DisabledSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **fields):
+        pass
+
+    def end(self, **fields):
+        pass
+
+
+_DISABLED_SPAN = DisabledSpan()
+
+
+def span(name, **fields):
+    """
+    Starts a span, see Span
+    :param name: name of the operation
+    :param fields: values written with the span
+    """
+    if _sink is None:
+        return _DISABLED_SPAN
+    return Span(name, fields)
+
+
+def configure(trace):
+    """
+    Sets where the spans are written
+    :param trace: 'log' for the instrumentation logger, the path of a JSON lines file, or None to turn tracing off
+    """
+    global _sink
+    previous, _sink = _sink, None
+    if previous is not None:
+        previous.close()
+    if trace == 'log':
+        _sink = LoggingSink()
+    elif trace:
+        _sink = JsonLinesSink(trace)
+
+
+def configure_from_environment():
+    """
+    Sets up the tracing and the profiling requested by the environment variables, see the module description
+    """
+    try:
+        configure(os.environ.get(TRACE_VARIABLE))
+    except OSError as error:
+        logger.warning('Tracing is off, %s could not be opened: %s', os.environ.get(TRACE_VARIABLE), error)
+
+    profile_path = os.environ.get(PROFILE_VARIABLE)
+    if profile_path and not is_profiling():
+        start_profiling()
+        atexit.register(_stop_session_at_exit, _session, profile_path)
+
+
+# Profilers of a profiling in progress
+class ProfilingSession(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiler = cProfile.Profile()
+        # Profilers of the worker threads run since the profiling started
+        self.thread_profilers = []
+
+
+def is_profiling():
+    return _session is not None
+
+
+def start_profiling():
+    """
+    Starts profiling the calling thread, and the worker threads run under thread_profile
+    """
+    global _session
+    if _session is not None:
+        return
+    _session = ProfilingSession()
+    _session.profiler.enable()
+
+
+def stop_profiling(profile_path=None):
+    """
+    Stops profiling
+    :param profile_path: path of the .prof file the profile is written to, the profile is discarded if None
+    :raises OSError: if the file can not be written
+    """
+    global _session
+    session, _session = _session, None
+    if session is None:
+        return
+    session.profiler.disable()
+    if profile_path:
+        _dump_session(session, profile_path)
+
+
+def _stop_session_at_exit(session, profile_path):
+    # The profiling of the session may have been stopped already, eg. from the menu of the editor
+    if _session is session:
+        stop_profiling(profile_path)
+
+
+def _dump_session(session, profile_path):
+    stats = pstats.Stats(session.profiler)
+    with session.lock:
+        for profiler in session.thread_profilers:
+            stats.add(profiler)
+    stats.dump_stats(profile_path)
+
+
+@contextmanager
+def thread_profile():
+    """
+    Profiles the body of the with statement in a worker thread while profiling, cProfile only profiles the thread
+    which enables it
+    """
+    session = _session
+    if session is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12 and later allow a single active profiler, which already sees every thread
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with session.lock:
+            session.thread_profilers.append(profiler)
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+""" Journal
+
+Undo and redo history of the edits of the table.
+
+Every edit is recorded as a command holding only the delta needed to revert it (the previous text of an edited cell,
+the rows of a removed range, ...) instead of a snapshot of the table, so undoing a removal of n rows costs O(n) both
+in time and memory whatever the size of the table.
+
+The commands are applied to a table object providing the following methods, which must not record anything:
+    set_cell(row, column, value)
+    set_cells(list of (row, column, value))
+    clear_column_cells(column, array of rows) -> (array of the rows which were not blank, list of their values)
+    remove_row_range(position, count) -> removed rows
+    restore_rows(position, removed rows)
+    remove_row_set(sorted array of rows) -> removed rows
+    restore_row_set(sorted array of rows, removed rows)
+    remove_column_range(position, count) -> list of removed columns
+    restore_columns(position, list of removed columns)
+The removed rows and columns are opaque objects of the store exposing their approximate size in bytes as size.
+
+The journal keeps the total size of its commands under a cap by discarding the oldest commands first.
+
+This module does not depend on Qt.
+
+"""
+import itertools
+from collections import deque
+from contextlib import contextmanager
+
+# Default cap of the memory held by the journal, in bytes
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# Approximate size in bytes of a command without its delta
+COMMAND_OVERHEAD = 128
+
+
+class CellEdit(object):
+    """
+    A single cell set from one value to another
+    """
+
+    def __init__(self, row, column, old_value, new_value):
+        self.row = row
+        self.column = column
+        self.old_value = old_value
+        self.new_value = new_value
+
+    @property
+    def size(self):
+        return COMMAND_OVERHEAD + len(self.old_value) + len(self.new_value)
+
+    def undo(self, table):
+        table.set_cell(self.row, self.column, self.old_value)
+
+    def redo(self, table):
+        table.set_cell(self.row, self.column, self.new_value)
+
+
+class ColumnCellsCleared(object):
+    """
+    Cells of a column set to blank at once, kept as the array of their rows and the list of their previous values
+    """
+
+    def __init__(self, column, rows, values):
+        self.column = column
+        self.rows = rows
+        self.values = values
+
+    @property
+    def size(self):
+        return COMMAND_OVERHEAD + self.rows.nbytes + sum(56 + len(value) for value in self.values)
+
+    def undo(self, table):
+        table.set_cells(list(zip(self.rows.tolist(), itertools.repeat(self.column), self.values)))
+
+    def redo(self, table):
+        table.clear_column_cells(self.column, self.rows)
+
+
+class CellsEdited(object):
+    """
+    A batch of cells set to new values, kept as a list of (row, column, previous value, new value)
+    """
+
+    def __init__(self, cells):
+        self.cells = cells
+
+    @property
+    def size(self):
+        return COMMAND_OVERHEAD + sum(64 + len(old_value) + len(new_value) for _, _, old_value, new_value in self.cells)
+
+    def undo(self, table):
+        table.set_cells([(row, column, old_value) for row, column, old_value, _ in self.cells])
+
+    def redo(self, table):
+        table.set_cells([(row, column, new_value) for row, column, _, new_value in self.cells])
+
+
+class RowsRemoved(object):
+    """
+    A contiguous range of rows removed from the table, the removed rows are kept while the removal is applied
+    """
+
+    def __init__(self, position, count, removed):
+        self.position = position
+        self.count = count
+        self.removed = removed
+
+    @property
+    def size(self):
+        return COMMAND_OVERHEAD + (self.removed.size if self.removed is not None else 0)
+
+    def undo(self, table):
+        table.restore_rows(self.position, self.removed)
+        self.removed = None
+
+    def redo(self, table):
+        self.removed = table.remove_row_range(self.position, self.count)
+
+
+class RowSetRemoved(object):
+    """
+    Rows removed from the table at scattered indices, like the rows of a range of a sorted view
+    """
+
+    def __init__(self, rows, removed):
+        self.rows = rows
+        self.removed = removed
+
+    @property
+    def size(self):
+        return COMMAND_OVERHEAD + self.rows.nbytes + (self.removed.size if self.removed is not None else 0)
+
+    def undo(self, table):
+        table.restore_row_set(self.rows, self.removed)
+        self.removed = None
+
+    def redo(self, table):
+        self.removed = table.remove_row_set(self.rows)
+
+
+class RowsInserted(object):
+    """
+    A contiguous range of blank rows inserted in the table, the rows are kept while the insertion is undone so redo
+    brings back their exact content
+    """
+
+    def __init__(self, position, count):
+        self.position = position
+        self.count = count
+        self.removed = None
+
+    @property
+    def size(self):
+        return COMMAND_OVERHEAD + (self.removed.size if self.removed is not None else 0)
+
+    def undo(self, table):
+        self.removed = table.remove_row_range(self.position, self.count)
+
+    def redo(self, table):
+        table.restore_rows(self.position, self.removed)
+        self.removed = None
+
+
+class ColumnsRemoved(object):
+    """
+    A contiguous range of columns removed from the table, the removed columns are kept while the removal is applied
+    """
+
+    def __init__(self, position, removed):
+        self.position = position
+        self.count = len(removed)
+        self.removed = removed
+
+    @property
+    def size(self):
+        return COMMAND_OVERHEAD + sum(column.size for column in self.removed or [])
+
+    def undo(self, table):
+        table.restore_columns(self.position, self.removed)
+        self.removed = None
+
+    def redo(self, table):
+        self.removed = table.remove_column_range(self.position, self.count)
+
+
+class ColumnInserted(object):
+    """
+    A column inserted in the table with a default value for all its cells
+    """
+
+    def __init__(self, position):
+        self.position = position
+        self.removed = None
+
+    @property
+    def size(self):
+        return COMMAND_OVERHEAD + sum(column.size for column in self.removed or [])
+
+    def undo(self, table):
+        self.removed = table.remove_column_range(self.position, 1)
+
+    def redo(self, table):
+        table.restore_columns(self.position, self.removed)
+        self.removed = None
+
+
+class CommandGroup(object):
+    """
+    Commands undone and redone together as a single step
+    """
+
+    def __init__(self):
+        self.commands = []
+
+    @property
+    def size(self):
+        return COMMAND_OVERHEAD + sum(command.size for command in self.commands)
+
+    def undo(self, table):
+        for command in reversed(self.commands):
+            command.undo(table)
+
+    def redo(self, table):
+        for command in self.commands:
+            command.redo(table)
+
+
+class Journal(object):
+    """
+    Linear undo and redo history with a cap on the memory held by the commands
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        """
+        :param max_size: maximum total size of the commands in bytes, the oldest commands are discarded beyond it
+        """
+        self.max_size = max_size
+        self._undo_commands = deque()
+        self._redo_commands = []
+        # Total size of the commands of both lists, kept up to date instead of being summed on every record
+        self._size = 0
+        self._group = None
+        self._group_depth = 0
+
+    def clear(self):
+        self._undo_commands.clear()
+        self._redo_commands = []
+        self._size = 0
+
+    def can_undo(self):
+        return bool(self._undo_commands)
+
+    def can_redo(self):
+        return bool(self._redo_commands)
+
+    def size(self):
+        return self._size
+
+    def record(self, command):
+        """
+        Records a command which has just been applied, the commands undone so far can not be redone anymore
+        """
+        if self._group is not None:
+            self._group.commands.append(command)
+            return
+
+        self._size -= sum(undone.size for undone in self._redo_commands)
+        self._redo_commands = []
+        self._undo_commands.append(command)
+        self._size += command.size
+        self._evict()
+
+    @contextmanager
+    def group(self):
+        """
+        Records all the commands of the block as a single step, nested groups are merged into the outermost one
+        """
+        if self._group_depth == 0:
+            self._group = CommandGroup()
+        self._group_depth += 1
+        try:
+            yield
+        finally:
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                group, self._group = self._group, None
+                if group.commands:
+                    self.record(group)
+
+    def undo(self, table):
+        """
+        Reverts the last recorded command, returns False if there is nothing to undo
+        """
+        if not self._undo_commands:
+            return False
+        command = self._undo_commands.pop()
+        # The size of a command changes when it is applied or reverted as it holds the removed rows only when needed
+        self._size -= command.size
+        command.undo(table)
+        self._size += command.size
+        self._redo_commands.append(command)
+        return True
+
+    def redo(self, table):
+        """
+        Applies again the last undone command, returns False if there is nothing to redo
+        """
+        if not self._redo_commands:
+            return False
+        command = self._redo_commands.pop()
+        self._size -= command.size
+        command.redo(table)
+        self._size += command.size
+        self._undo_commands.append(command)
+        self._evict()
+        return True
+
+    def _evict(self):
+        """
+        Discards the oldest commands until the journal fits in its memory cap
+        A single command larger than the cap is discarded too, it can not be undone
+        """
+        while self._undo_commands and self._size > self.max_size:
+            self._size -= self._undo_commands.popleft().size
@@ -0,0 +1,556 @@
+# -*- coding: utf-8 -*-
+""" Paged Store
+
+Read mostly storage for csv files which are too large to be kept in memory.
+
+The file is memory mapped and scanned once to build a compact index holding the byte offset of every record.
+Only the blocks of rows requested by the view are parsed, and the parsed blocks are kept in a bounded LRU cache.
+Edits never touch the mapped file, they are kept in an overlay which is merged when the rows are streamed on save.
+
+The logical order of the rows is kept as a list of runs of row ids (a piece table), so inserting or removing rows
+costs O(number of runs) instead of O(number of rows). Ids below the number of rows of the file refer to the rows of
+the file, higher ids refer to rows added while editing whose cells only live in the overlay.
+
+This module exposes the same interface as csv_store.ColumnStore and does not depend on Qt.
+
+"""
+import csv
+import io
+import locale
+import mmap
+import re
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from csv_io import LEGACY_FALLBACK, encode_character
+from csv_store import next_version, parse_numeric_column
+import numpy as np
+
+
+class RemovedRowRuns(object):
+    """
+    Rows removed from a MappedCsvStore, kept as the runs of their row ids
+    """
+
+    def __init__(self, count, runs):
+        self.count = count
+        self.runs = runs
+
+    @property
+    def size(self):
+        return 64 * len(self.runs)
+
+
+class RemovedRowRunSet(object):
+    """
+    Rows removed from a MappedCsvStore at scattered indices, kept as the removed runs of every range of consecutive rows
+    """
+
+    def __init__(self, rows, removed_ranges):
+        self.rows = rows
+        # List of (position, RemovedRowRuns) from the first range to the last
+        self.removed_ranges = removed_ranges
+
+    @property
+    def count(self):
+        return len(self.rows)
+
+    @property
+    def size(self):
+        return self.rows.nbytes + sum(removed.size for _, removed in self.removed_ranges)
+
+
+class RemovedColumnId(object):
+    """
+    Column removed from a MappedCsvStore, its cells stay in the file and the overlay under its column id
+    """
+
+    def __init__(self, header, column_id):
+        self.header = header
+        self.column_id = column_id
+
+    @property
+    def size(self):
+        return len(self.header)
+
+
+def _token_positions(data, start, end, token):
+    """
+    Returns the sorted array of the offsets of the occurrences of token starting between start and end in data
+    """
+    if len(token) == 1:
+        return np.flatnonzero(np.frombuffer(data[start:end], dtype=np.uint8) == token[0]) + start
+    # A multi byte token may straddle the end of the range
+    text = data[start:end + len(token) - 1]
+    return np.array([match.start() + start for match in re.finditer(re.escape(token), text)], dtype=np.int64)
+
+
+class MappedCsvStore(object):
+    # Number of rows parsed together and kept as one entry of the cache
+    block_size = 1024
+    # Maximum number of parsed blocks kept in memory
+    max_cached_blocks = 64
+    # Number of bytes of the file handled at once by the scan building the offset index
+    scan_block_size = 4 * 1024 * 1024
+
+    def __init__(self, csv_file_path, delimiter=',', quotechar='"', encoding=None, progress_callback=None,
+                 offsets=None, column_count=None):
+        """
+        Maps the file and builds the row offset index in a single scan
+        :param csv_file_path: path of the csv file
+        :param delimiter: field delimiter of the file
+        :param quotechar: quote character of the file
+        :param encoding: text encoding of the file, the locale preferred encoding is used by default
+        :param progress_callback: optional function called with the number of bytes scanned so far, it may raise
+                                  an exception to abort the scan
+        :param offsets: optional row offset index of the file built earlier, see record_offsets, the file is not
+                        scanned then
+        :param column_count: number of fields of the widest record of the file, see source_column_count, given along
+                             with offsets
+        """
+        self.csv_file_path = csv_file_path
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.encoding = encoding or locale.getpreferredencoding(False)
+
+        self._file = open(csv_file_path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can not be mapped
+            self._map = b''
+
+        try:
+            if offsets is not None:
+                self._offsets, widest_record = offsets, column_count or 0
+            else:
+                self._offsets, widest_record = self._build_offset_index(progress_callback)
+        except BaseException:
+            # The progress callback may abort the scan, do not leak the mapping in that case
+            self.close()
+            raise
+        self._cache = OrderedDict()
+
+        header_rows = self._parse_records(0, 1) if len(self._offsets) > 1 else [[]]
+        self.headers = list(header_rows[0])
+        # Records wider than the header add blank columns, like csv_store.ColumnStore.append_rows
+        self.headers += [''] * (widest_record - len(self.headers))
+
+        # Logical layout of the table, see the module docstring
+        self._source_row_count = max(len(self._offsets) - 2, 0)
+        self._source_column_count = len(self.headers)
+        self._next_row_id = self._source_row_count
+        self._runs = [[0, self._source_row_count]] if self._source_row_count else []
+        self._run_starts = []
+        self._row_count = self._source_row_count
+        self._update_run_starts()
+
+        self._column_ids = list(range(self._source_column_count))
+        self._next_column_id = self._source_column_count
+
+        # Version stamp of every column keyed by column id, see csv_store.ColumnStore.column_version
+        self._column_versions = {column_id: next_version() for column_id in self._column_ids}
+
+        # Default value of the added columns and the first row id not existing when the column was added
+        self._column_defaults = {}
+
+        # Edited cell values keyed by (row id, column id)
+        self._overlay = {}
+
+    def _build_offset_index(self, progress_callback):
+        """
+        Scans the mapped file once and returns a tuple of (byte offsets of the start of every record, number of fields
+        of the widest record)
+        The last offset is the end of the file so that record i spans offsets[i] to offsets[i + 1]
+        The file is scanned by blocks, the line breaks and the delimiters of a block are found at once and only those
+        preceded by an even number of quotes in the file, ie. outside of the quoted fields, end a record or a field
+        """
+        data = self._map
+        quote = encode_character(self.quotechar, self.encoding) if self.quotechar else b''
+        quoted = bool(quote) and data.find(quote) != -1
+        delimiter = encode_character(self.delimiter, self.encoding)
+
+        offsets = array('Q', [0])
+        inside_quotes = False
+        widest_record = 0
+        # Delimiters of the record going on in the next block
+        pending_delimiters = 0
+        for block_start in range(0, len(data), self.scan_block_size):
+            block_end = min(block_start + self.scan_block_size, len(data))
+            # Copy the block rather than viewing the mapping so no buffer export keeps the mapping from being closed
+            codes = np.frombuffer(data[block_start:block_end], dtype=np.uint8)
+            breaks = np.flatnonzero((codes == 0x0a) | (codes == 0x0d))
+            delimiters = _token_positions(data, block_start, block_end, delimiter) - block_start
+
+            if quoted:
+                quotes = _token_positions(data, block_start, block_end, quote) - block_start
+                # Parity of the quotes before every line break and delimiter of the block
+                breaks = breaks[(np.searchsorted(quotes, breaks) & 1) == int(inside_quotes)]
+                delimiters = delimiters[(np.searchsorted(quotes, delimiters) & 1) == int(inside_quotes)]
+                inside_quotes ^= len(quotes) % 2 == 1
+
+            # The \r of a \r\n does not end the record, the following \n does
+            following = np.append(codes[1:], np.uint8(data[block_end] if block_end < len(data) else 0))
+            breaks = breaks[(codes[breaks] != 0x0d) | (following[breaks] != 0x0a)]
+
+            # Number of delimiters of every record ending in the block, followed by those of the unterminated one
+            delimiter_counts = np.bincount(np.searchsorted(breaks, delimiters), minlength=len(breaks) + 1)
+            delimiter_counts[0] += pending_delimiters
+            if len(breaks):
+                widest_record = max(widest_record, int(delimiter_counts[:-1].max()) + 1)
+            pending_delimiters = int(delimiter_counts[-1])
+
+            offsets.frombytes((breaks + (block_start + 1)).astype(np.uint64).tobytes())
+            if progress_callback is not None:
+                progress_callback(block_end)
+
+        # The last record may not be terminated by a line break
+        if offsets[-1] < len(data):
+            offsets.append(len(data))
+            widest_record = max(widest_record, pending_delimiters + 1)
+
+        if progress_callback is not None:
+            progress_callback(len(data))
+        return offsets, widest_record
+
+    @property
+    def source_column_count(self):
+        """
+        Number of fields of the widest record of the file, the header included, never modified
+        """
+        return self._source_column_count
+
+    @property
+    def record_offsets(self):
+        """
+        Byte offsets of the start of every record of the file followed by the end of the file, never modified
+        """
+        return self._offsets
+
+    def _parse_records(self, first, count):
+        """
+        Parses count records of the file starting from the record with index first
+        """
+        start = int(self._offsets[first])
+        end = int(self._offsets[min(first + count, len(self._offsets) - 1)])
+        text = self._map[start:end].decode(self.encoding, LEGACY_FALLBACK)
+        return list(csv.reader(io.StringIO(text, newline=''), delimiter=self.delimiter, quotechar=self.quotechar))
+
+    def _block(self, block_index):
+        """
+        Returns the parsed rows of a block, parsing the block if it is not present in the cache
+        """
+        rows = self._cache.get(block_index)
+        if rows is not None:
+            self._cache.move_to_end(block_index)
+            return rows
+
+        # Record 0 is the header, hence the data rows start from record 1
+        rows = self._parse_records(block_index * self.block_size + 1, self.block_size)
+        self._cache[block_index] = rows
+        if len(self._cache) > self.max_cached_blocks:
+            self._cache.popitem(last=False)
+        return rows
+
+    def _default_value(self, row_id, column_id):
+        """
+        Value of a cell which is neither present in the file nor edited
+        The default value of an added column only applies to the rows which existed when it was added
+        """
+        default = self._column_defaults.get(column_id)
+        if default is not None and row_id < default[1]:
+            return default[0]
+        return ''
+
+    def _source_value(self, row_id, column_id):
+        if row_id >= self._source_row_count or column_id >= self._source_column_count:
+            return self._default_value(row_id, column_id)
+        row_data = self._block(row_id // self.block_size)[row_id % self.block_size]
+        if column_id < len(row_data):
+            return row_data[column_id]
+        return ''
+
+    def _touch_all_columns(self):
+        for column_id in self._column_ids:
+            self._column_versions[column_id] = next_version()
+
+    def _update_run_starts(self):
+        self._run_starts = []
+        start = 0
+        for run in self._runs:
+            self._run_starts.append(start)
+            start += run[1]
+
+    def _row_id(self, row):
+        run_index = bisect_right(self._run_starts, row) - 1
+        first_id, _ = self._runs[run_index]
+        return first_id + row - self._run_starts[run_index]
+
+    def _split_runs(self, row):
+        """
+        Splits the run containing the given row so that a run starts at it
+        Returns the index of that run in the run list
+        """
+        if row >= self._row_count:
+            return len(self._runs)
+        run_index = bisect_right(self._run_starts, row) - 1
+        offset = row - self._run_starts[run_index]
+        if offset == 0:
+            return run_index
+        first_id, count = self._runs[run_index]
+        self._runs[run_index:run_index + 1] = [[first_id, offset], [first_id + offset, count - offset]]
+        self._update_run_starts()
+        return run_index + 1
+
+    def close(self):
+        """
+        Releases the mapping and the file handle
+        """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+        self._cache = OrderedDict()
+
+    def row_count(self):
+        return self._row_count
+
+    def column_count(self):
+        return len(self._column_ids)
+
+    def value(self, row, column):
+        row_id = self._row_id(row)
+        column_id = self._column_ids[column]
+        value = self._overlay.get((row_id, column_id))
+        if value is None:
+            value = self._source_value(row_id, column_id)
+        return value
+
+    def set_value(self, row, column, value):
+        column_id = self._column_ids[column]
+        self._overlay[(self._row_id(row), column_id)] = value
+        self._column_versions[column_id] = next_version()
+
+    def clear_cells(self, rows, column):
+        """
+        Blanks many cells of a column at once, see csv_store.ColumnStore.clear_cells
+        """
+        column_id = self._column_ids[column]
+        cleared_rows = []
+        texts = []
+        for row in rows.tolist():
+            row_id = self._row_id(row)
+            value = self._overlay.get((row_id, column_id))
+            if value is None:
+                value = self._source_value(row_id, column_id)
+            if value != '':
+                self._overlay[(row_id, column_id)] = ''
+                cleared_rows.append(row)
+                texts.append(value)
+        self._column_versions[column_id] = next_version()
+        return np.array(cleared_rows, dtype=np.int64), texts
+
+    def row(self, row, columns=None):
+        if columns is None:
+            columns = range(len(self._column_ids))
+        return [self.value(row, column) for column in columns]
+
+    def iter_rows(self, columns=None, start=0, stop=None, order=None):
+        """
+        Yields the rows in order with the edits of the overlay merged in
+        The rows are read block by block, so streaming the whole file keeps only one block parsed at a time
+        :param columns: optional list of the column indices to fetch, all the columns are fetched by default
+        :param start: index of the first row
+        :param stop: index after the last row, the end of the table by default
+        :param order: optional permutation of the rows as an array of row indices, start and stop then index it
+        """
+        if columns is None:
+            columns = range(len(self._column_ids))
+        if order is not None:
+            # Permuted rows are fetched one by one through the block cache
+            for row in order[start:stop].tolist():
+                yield self.row(row, columns)
+            return
+        column_ids = [self._column_ids[column] for column in columns]
+        stop = self._row_count if stop is None else stop
+        overlay = self._overlay
+
+        # Blocks missing from the cache are parsed without being cached, so a full scan does not evict the viewport
+        current_block_index = None
+        current_block = None
+
+        for run_start, (first_id, count) in zip(self._run_starts, self._runs):
+            begin = max(start, run_start)
+            end = min(stop, run_start + count)
+            for row_id in range(first_id + begin - run_start, first_id + end - run_start):
+                if row_id < self._source_row_count:
+                    block_index = row_id // self.block_size
+                    if block_index != current_block_index:
+                        current_block_index = block_index
+                        current_block = self._cache.get(block_index)
+                        if current_block is None:
+                            current_block = self._parse_records(block_index * self.block_size + 1, self.block_size)
+                    row_data = current_block[row_id % self.block_size]
+                else:
+                    row_data = ()
+
+                values = []
+                for column_id in column_ids:
+                    value = overlay.get((row_id, column_id))
+                    if value is None:
+                        if column_id < len(row_data) and column_id < self._source_column_count:
+                            value = row_data[column_id]
+                        else:
+                            value = self._default_value(row_id, column_id)
+                    values.append(value)
+                yield values
+
+    def column_values(self, column):
+        return [values[0] for values in self.iter_rows([column])]
+
+    def column_texts(self, columns, start=0, stop=None):
+        """
+        Returns the texts of a range of rows of the given columns, as one list per column
+        The rows are parsed once for all the columns
+        """
+        texts = [list(values) for values in zip(*self.iter_rows(columns, start, stop))]
+        return texts or [[] for _ in columns]
+
+    def column_dtype(self, column):
+        """
+        The columns of the file are not typed in paged mode, they are parsed on demand by numeric_values
+        """
+        return None
+
+    def column_version(self, column):
+        return self._column_versions[self._column_ids[column]]
+
+    def numeric_values(self, column):
+        """
+        Parses a whole column into numbers, returns a tuple of (values, null mask) or None if it is not numeric
+        """
+        return parse_numeric_column(self.column_values(column))
+
+    def insert_rows(self, position, count, value=''):
+        run_index = self._split_runs(position)
+        first_id = self._next_row_id
+        self._next_row_id += count
+        self._runs.insert(run_index, [first_id, count])
+        self._row_count += count
+        self._update_run_starts()
+        self._touch_all_columns()
+
+        if value != '':
+            for row_id in range(first_id, first_id + count):
+                for column_id in self._column_ids:
+                    self._overlay[(row_id, column_id)] = value
+
+    def remove_rows(self, position, count):
+        """
+        Removes a range of rows, returns the removed runs of row ids which restore_rows can insert back
+        The cells of the removed rows stay in the file and the overlay, so nothing else needs to be kept
+        """
+        first_run = self._split_runs(position)
+        last_run = self._split_runs(position + count)
+        removed = RemovedRowRuns(count, self._runs[first_run:last_run])
+        del self._runs[first_run:last_run]
+        self._row_count -= count
+        self._update_run_starts()
+        self._touch_all_columns()
+        return removed
+
+    def restore_rows(self, position, removed):
+        run_index = self._split_runs(position)
+        self._runs[run_index:run_index] = [list(run) for run in removed.runs]
+        self._row_count += removed.count
+        self._update_run_starts()
+        self._touch_all_columns()
+
+    def remove_row_set(self, rows):
+        """
+        Removes rows at scattered indices, every range of consecutive rows is removed as one range of the piece table
+        """
+        ranges = []
+        for row in rows.tolist():
+            if ranges and ranges[-1][0] + ranges[-1][1] == row:
+                ranges[-1][1] += 1
+            else:
+                ranges.append([row, 1])
+
+        # The runs are split and dropped in a single pass over the piece table, removing the ranges one by one would
+        # rebuild the run starts for every range
+        kept_runs = []
+        removed_ranges = [(position, RemovedRowRuns(count, [])) for position, count in ranges]
+        range_index = 0
+        for (first_id, count), start in zip(self._runs, self._run_starts):
+            end = start + count
+            row = start
+            while range_index < len(ranges) and ranges[range_index][0] < end:
+                range_start, range_count = ranges[range_index]
+                if range_start > row:
+                    kept_runs.append([first_id + row - start, range_start - row])
+                    row = range_start
+                removed_end = min(range_start + range_count, end)
+                removed_ranges[range_index][1].runs.append([first_id + row - start, removed_end - row])
+                row = removed_end
+                if removed_end < range_start + range_count:
+                    # The range goes on in the next run
+                    break
+                range_index += 1
+            if row < end:
+                kept_runs.append([first_id + row - start, end - row])
+
+        self._runs = kept_runs
+        self._row_count -= len(rows)
+        self._update_run_starts()
+        self._touch_all_columns()
+        return RemovedRowRunSet(rows, removed_ranges)
+
+    def restore_row_set(self, rows, removed):
+        """
+        Inserts back rows returned by remove_row_set at their former indices, in a single pass over the piece table
+        """
+        runs = []
+        # Index in the restored rows of the next row of the current runs
+        row = 0
+        current_runs = iter(self._runs)
+        # Rest of the current run not copied yet
+        first_id, count = 0, 0
+        for position, removed_runs in removed.removed_ranges:
+            while row < position:
+                if count == 0:
+                    first_id, count = next(current_runs)
+                copied = min(count, position - row)
+                runs.append([first_id, copied])
+                first_id += copied
+                count -= copied
+                row += copied
+            runs.extend(list(run) for run in removed_runs.runs)
+            row += removed_runs.count
+        if count:
+            runs.append([first_id, count])
+        runs.extend(list(run) for run in current_runs)
+
+        self._runs = runs
+        self._row_count += len(rows)
+        self._update_run_starts()
+        self._touch_all_columns()
+
+    def insert_column(self, position, header, value=''):
+        column_id = self._next_column_id
+        self._next_column_id += 1
+        self.headers.insert(position, header)
+        self._column_ids.insert(position, column_id)
+        self._column_defaults[column_id] = (value, self._next_row_id)
+        self._column_versions[column_id] = next_version()
+
+    def remove_column(self, position):
+        removed = RemovedColumnId(self.headers[position], self._column_ids[position])
+        del self.headers[position]
+        del self._column_versions[self._column_ids[position]]
+        del self._column_ids[position]
+        return removed
+
+    def restore_column(self, position, removed):
+        self.headers.insert(position, removed.header)
+        self._column_ids.insert(position, removed.column_id)
+        self._column_versions[removed.column_id] = next_version()
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+""" Plotting helpers
+
+Data reduction for the plots of the editor.
+
+A canvas can not show more points than it has pixels, so long series are decimated before being handed to matplotlib:
+    1. Min/max per bucket: the series is split into one bucket per pixel column and only the first, last, minimum and
+       maximum points of every bucket are kept. The envelope of the line is exact, this is used for line plots.
+    2. Largest-Triangle-Three-Buckets (LTTB): keeps the one point per bucket forming the largest triangle with its
+       neighbours, which preserves the visual shape of point clouds. This is used for scatter points.
+
+The smooth curve of the scatter-line plots is a cubic spline fitted through the points sorted by x, the points sharing
+the same x value are averaged first as a spline needs strictly increasing x values.
+
+The figures are drawn by draw_figure for the plot tab of the editor and for the command line alike, the series read
+chunk by chunk by the command line are reduced as they are read by a StreamingDecimator.
+
+This module does not depend on Qt.
+
+"""
+import numpy as np
+
+# Plot types, in the order of the plot actions of the editor
+PLOT_SCATTER = 1
+PLOT_SCATTER_LINE = 2
+PLOT_LINE = 3
+
+
+def is_numeric(data):
+    """
+    Whether the data is a numeric NumPy array which can be decimated
+    """
+    return isinstance(data, np.ndarray) and np.issubdtype(data.dtype, np.number)
+
+
+def decimate_min_max(data_x_axis, data_y_axis, bucket_count):
+    """
+    Keeps the first, last, minimum and maximum points of every bucket of consecutive points
+    :param data_x_axis: array of the x values
+    :param data_y_axis: array of the y values
+    :param bucket_count: number of buckets, usually the width of the canvas in pixels
+    """
+    point_count = len(data_y_axis)
+    if point_count <= 4 * bucket_count:
+        return data_x_axis, data_y_axis
+
+    # Equal sized buckets are reshaped into rows to find all the extremes in one vectorized pass
+    bucket_size = point_count // bucket_count
+    full_length = bucket_count * bucket_size
+    buckets = data_y_axis[:full_length].reshape(bucket_count, bucket_size)
+    offsets = np.arange(bucket_count) * bucket_size
+
+    indices = [offsets, offsets + bucket_size - 1, offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1)]
+    if full_length < point_count:
+        # The remaining points form one last smaller bucket
+        remainder = data_y_axis[full_length:]
+        indices.append(np.array([full_length, point_count - 1, full_length + remainder.argmin(),
+                                 full_length + remainder.argmax()]))
+
+    indices = np.unique(np.concatenate(indices))
+    return data_x_axis[indices], data_y_axis[indices]
+
+
+def decimate_lttb(data_x_axis, data_y_axis, threshold):
+    """
+    Downsamples the points with the Largest-Triangle-Three-Buckets algorithm
+    :param data_x_axis: array of the x values
+    :param data_y_axis: array of the y values
+    :param threshold: number of points to keep
+    """
+    point_count = len(data_x_axis)
+    if threshold >= point_count or threshold < 3:
+        return data_x_axis, data_y_axis
+
+    x_values = data_x_axis.astype(np.float64)
+    y_values = data_y_axis.astype(np.float64)
+
+    # The first and last points are always kept, the others are split into threshold - 2 buckets
+    every = (point_count - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = point_count - 1
+
+    selected = 0
+    for bucket in range(threshold - 2):
+        # Average point of the next bucket, the third vertex of the triangles
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, point_count)
+        if next_end <= next_start:
+            next_start, next_end = point_count - 1, point_count
+        average_x = x_values[next_start:next_end].mean()
+        average_y = y_values[next_start:next_end].mean()
+
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        areas = np.abs((x_values[selected] - average_x) * (y_values[start:end] - y_values[selected]) -
+                       (x_values[selected] - x_values[start:end]) * (average_y - y_values[selected]))
+        selected = start + int(areas.argmax())
+        indices[bucket + 1] = selected
+
+    return data_x_axis[indices], data_y_axis[indices]
+
+
+def decimate(data_x_axis, data_y_axis, line, pixel_width):
+    """
+    Reduces the points to what a canvas can actually show, non numeric data is returned unchanged
+    :param line: whether the points are drawn as a line (min/max per pixel) or as points (LTTB)
+    :param pixel_width: width of the canvas in pixels
+    """
+    if not is_numeric(data_x_axis) or not is_numeric(data_y_axis):
+        return data_x_axis, data_y_axis
+    if line:
+        return decimate_min_max(data_x_axis, data_y_axis, pixel_width)
+    return decimate_lttb(data_x_axis, data_y_axis, 2 * pixel_width)
+
+
+class StreamingDecimator(object):
+    """
+    Decimates a numeric series read chunk by chunk in a bounded memory
+    Every chunk is decimated to the same number of points per point read, which is halved, and the points kept so far
+    decimated again, whenever they grow past a few times what the canvas can show, so all the parts of the series keep
+    the same resolution as if the whole series was decimated at once
+    """
+
+    def __init__(self, line, pixel_width):
+        self.line = line
+        self.pixel_width = pixel_width
+        self.max_points = 8 * pixel_width
+        # Number of points kept per point read
+        self.ratio = 1.0
+        self.chunks = []
+        self.point_count = 0
+
+    def add(self, data_x_axis, data_y_axis):
+        data_x_axis, data_y_axis = self._reduce(data_x_axis, data_y_axis, int(np.ceil(len(data_x_axis) * self.ratio)))
+        self.chunks.append((data_x_axis, data_y_axis))
+        self.point_count += len(data_x_axis)
+        while self.point_count > self.max_points:
+            self.ratio /= 2
+            data_x_axis, data_y_axis = self._reduce(*self._concatenate(), point_count=self.point_count // 2)
+            self.chunks = [(data_x_axis, data_y_axis)]
+            self.point_count = len(data_x_axis)
+
+    def _reduce(self, data_x_axis, data_y_axis, point_count):
+        if point_count >= len(data_x_axis):
+            return data_x_axis, data_y_axis
+        if self.line:
+            return decimate_min_max(data_x_axis, data_y_axis, max(point_count // 4, 1))
+        return decimate_lttb(data_x_axis, data_y_axis, max(point_count, 3))
+
+    def _concatenate(self):
+        if not self.chunks:
+            return np.empty(0), np.empty(0)
+        return (np.concatenate([chunk[0] for chunk in self.chunks]),
+                np.concatenate([chunk[1] for chunk in self.chunks]))
+
+    def points(self):
+        """
+        Returns the decimated series as a tuple of (x values, y values)
+        """
+        data_x_axis, data_y_axis = self._concatenate()
+        return decimate(data_x_axis, data_y_axis, self.line, self.pixel_width)
+
+
+class BinnedMeans(object):
+    """
+    Means of the points of a numeric series falling in every bin of equal width of a known x range, computed chunk by
+    chunk in a bounded memory
+    The means give smooth_curve the shape of a series too long to be held in memory, the points of a bin being
+    averaged as the points sharing the same x value are
+    """
+
+    def __init__(self, x_min, x_max, bin_count=2048):
+        self.x_min = x_min
+        self.bin_width = (x_max - x_min) / (bin_count - 1) or 1.0
+        self.sums_x = np.zeros(bin_count)
+        self.sums_y = np.zeros(bin_count)
+        self.counts = np.zeros(bin_count)
+
+    def add(self, data_x_axis, data_y_axis):
+        finite = np.isfinite(data_x_axis) & np.isfinite(data_y_axis)
+        data_x_axis, data_y_axis = data_x_axis[finite], data_y_axis[finite]
+        bins = np.clip(np.rint((data_x_axis - self.x_min) / self.bin_width), 0, len(self.counts) - 1).astype(np.int64)
+        self.sums_x += np.bincount(bins, weights=data_x_axis, minlength=len(self.counts))
+        self.sums_y += np.bincount(bins, weights=data_y_axis, minlength=len(self.counts))
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+    def points(self):
+        """
+        Returns the mean points of the bins holding points as a tuple of (x values, y values) sorted by x
+        """
+        filled = self.counts > 0
+        return self.sums_x[filled] / self.counts[filled], self.sums_y[filled] / self.counts[filled]
+
+
+def draw_figure(figure, data_x_axis, data_y_axis, label_x_axis, label_y_axis, title, plot_type, pixel_width,
+                curve=None):
+    """
+    Draws a plot of two columns on a cleared figure
+    Returns a tuple of (title artist, axes, decimated artists), the decimated artists being (artist, full x data, full
+    y data, whether it is a line) tuples of the series drawn from decimated data
+    :param figure: matplotlib figure to draw on
+    :param title: title of the figure
+    :param plot_type: one of PLOT_SCATTER, PLOT_SCATTER_LINE and PLOT_LINE
+    :param pixel_width: width of the canvas in pixels, the series are decimated to it
+    :param curve: smooth curve of the scatter-line plot as given by smooth_curve, the points are joined by a plain
+                  line without it
+    """
+    # matplotlib is imported by the first plot only, like scipy by the first smooth curve
+    from matplotlib.ticker import MaxNLocator
+
+    figure.clear()
+
+    # Fix for plot having cutoff text or labels
+    figure.tight_layout()
+    figure.subplots_adjust(left=0.1, right=0.9, bottom=0.3, top=0.9)
+
+    suptitle = figure.suptitle(title)
+
+    ax = figure.add_subplot(111)
+
+    # Add another argument fontsize = 10 to change the fontsize of the labels
+    ax.set_xlabel(label_x_axis)
+    ax.set_ylabel(label_y_axis)
+
+    ax.xaxis.set_major_locator(MaxNLocator(10))
+    ax.yaxis.set_major_locator(MaxNLocator(10))
+
+    decimated_artists = []
+
+    if plot_type == PLOT_SCATTER:
+        points = ax.scatter(*decimate(data_x_axis, data_y_axis, False, pixel_width))
+        decimated_artists.append((points, data_x_axis, data_y_axis, False))
+
+    elif plot_type == PLOT_SCATTER_LINE:
+        if curve is not None:
+            points = ax.scatter(*decimate(data_x_axis, data_y_axis, False, pixel_width))
+            decimated_artists.append((points, data_x_axis, data_y_axis, False))
+            ax.plot(curve[0], curve[1], marker='o')
+        else:
+            # Switch to normal plot if the data is not purely numeric in which case a smooth curve is not possible
+            line, = ax.plot(*decimate(data_x_axis, data_y_axis, False, pixel_width), marker='o')
+            decimated_artists.append((line, data_x_axis, data_y_axis, False))
+
+    else:
+        line, = ax.plot(*decimate(data_x_axis, data_y_axis, True, pixel_width))
+        decimated_artists.append((line, data_x_axis, data_y_axis, True))
+
+    return suptitle, ax, decimated_artists
+
+
+def visible_points(data_x_axis, data_y_axis, x_min, x_max):
+    """
+    Returns the points whose x value lies in the given range, in their original order
+    Sorted x values are sliced with a binary search, otherwise a mask is used
+    """
+    if len(data_x_axis) > 1 and data_x_axis[0] <= data_x_axis[-1] and np.all(data_x_axis[1:] >= data_x_axis[:-1]):
+        first, last = np.searchsorted(data_x_axis, [x_min, x_max], side='left')
+        # Keep one point on each side so the line reaches the edges of the view
+        first = max(first - 1, 0)
+        last = min(last + 1, len(data_x_axis))
+        return data_x_axis[first:last], data_y_axis[first:last]
+
+    visible = (data_x_axis >= x_min) & (data_x_axis <= x_max)
+    return data_x_axis[visible], data_y_axis[visible]
+
+
+def smooth_curve(data_x_axis, data_y_axis, point_count=300):
+    """
+    Fits a cubic spline through the points, averaging the y values of duplicate x values
+    Returns a tuple of (x values, y values) of point_count points evenly spread over the x range of the data, or None
+    if the data is not numeric or has less than 4 distinct x values
+    :param data_x_axis: array of the x values, need not be sorted
+    :param data_y_axis: array of the y values
+    :param point_count: number of points of the returned curve
+    """
+    if not is_numeric(data_x_axis) or not is_numeric(data_y_axis):
+        return None
+
+    finite = np.isfinite(data_x_axis) & np.isfinite(data_y_axis)
+    if not finite.all():
+        data_x_axis, data_y_axis = data_x_axis[finite], data_y_axis[finite]
+
+    # np.unique sorts the x values, the inverse maps every point to its distinct x value
+    distinct_x, inverse = np.unique(data_x_axis, return_inverse=True)
+    if len(distinct_x) < 4:
+        return None
+    mean_y = np.bincount(inverse, weights=data_y_axis) / np.bincount(inverse)
+
+    from scipy.interpolate import make_interp_spline
+    spline = make_interp_spline(distinct_x.astype(np.float64), mean_y, k=3)
+    smooth_x = np.linspace(distinct_x[0], distinct_x[-1], point_count)
+    return smooth_x, spline(smooth_x)
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+""" Search
+
+Find and replace of literal texts or regular expressions in the cells of a store.
+
+The cells are searched by batches of rows so a worker thread can report the hits as they are found and stop between
+two batches. A literal text is looked for in the texts of a whole column of a batch joined by newlines, which skips the
+columns without any hit at the cost of a single substring search and locates the hits with a binary search over the
+offsets of the cells.
+
+Repeated literal searches may use a TokenIndex, an inverted index of the words of the cells of a column built the
+second time the column is searched, a single search being faster without it. The words of the searched text tell
+which rows can hold it and only those rows are checked. An edited cell is not indexed again, its row is simply checked
+by every search until the index is dropped, which happens once too many rows are edited or the rows or columns of the
+store are inserted or removed.
+
+This module does not depend on Qt.
+
+"""
+import re
+import threading
+
+import numpy as np
+
+# Number of rows searched between two reports of the hits
+SEARCH_BATCH_SIZE = 20000
+
+# Number of times a batch of rows is read again when the searched columns change while it is read
+MAX_BATCH_READS = 3
+
+# Above this number of distinct words a column is not indexed, the index would cost more than scanning the column
+MAX_INDEXED_TOKENS = 200000
+
+# Above this number of edited rows the index of a column is dropped and built again by the next search
+MAX_EDITED_ROWS = 10000
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+class SearchSyntaxError(ValueError):
+    """
+    Raised for an invalid regular expression or replacement, the message is meant to be shown to the user
+    """
+    pass
+
+
+class SearchQuery(object):
+    """
+    Text to find in the cells, the regular expression is compiled once
+    :raises SearchSyntaxError: if the text is not a valid regular expression
+    """
+
+    def __init__(self, text, regex=False, case_sensitive=False):
+        self.text = text
+        self.regex = regex
+        self.case_sensitive = case_sensitive
+        try:
+            self.pattern = re.compile(text if regex else re.escape(text), 0 if case_sensitive else re.IGNORECASE)
+        except re.error as error:
+            raise SearchSyntaxError('Invalid regular expression: {}'.format(error))
+        self.needle = text if case_sensitive else text.lower()
+
+    def matches(self, text):
+        if self.regex:
+            return self.pattern.search(text) is not None
+        if self.case_sensitive:
+            return self.needle in text
+        return self.needle in text.lower()
+
+    def replace(self, text, replacement):
+        """
+        Returns the text with every match replaced, group references such as \\1 are expanded for regular expressions
+        :raises SearchSyntaxError: if the replacement refers to a group missing from the regular expression
+        """
+        if not self.regex:
+            return self.pattern.sub(lambda match: replacement, text)
+        try:
+            return self.pattern.sub(replacement, text)
+        except re.error as error:
+            raise SearchSyntaxError('Invalid replacement: {}'.format(error))
+
+    def matching_offsets(self, texts):
+        """
+        Returns the list of the offsets in texts of the texts matching the query
+        :param texts: sequence of the texts of cells
+        """
+        if self.regex or '\n' in self.needle:
+            return [offset for offset, text in enumerate(texts) if self.matches(text)]
+
+        joined = '\n'.join(texts)
+        if not self.case_sensitive:
+            lowered = joined.lower()
+            # Lowering a few characters changes their length, the offsets of the cells would no longer apply
+            if len(lowered) != len(joined):
+                return [offset for offset, text in enumerate(texts) if self.matches(text)]
+            joined = lowered
+        position = joined.find(self.needle)
+        if position < 0:
+            return []
+
+        starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+        offsets = []
+        while position >= 0:
+            offset = int(np.searchsorted(starts, position, side='right')) - 1
+            offsets.append(offset)
+            # Go on from the next cell, a cell is reported once whatever the number of matches it holds
+            position = joined.find(self.needle, starts[offset] + len(texts[offset]) + 1) \
+                if offset + 1 < len(texts) else -1
+        return offsets
+
+
+class TokenIndex(object):
+    """
+    Inverted index mapping every lower case word of the cells of a column to the sorted array of the rows holding it
+    edited_rows are the rows whose cells changed since the index was built, they are always candidates
+    """
+
+    def __init__(self, postings):
+        self.postings = postings
+        self.edited_rows = set()
+
+    @classmethod
+    def build(cls, texts):
+        """
+        Returns the index of the given texts, or None if they have too many distinct words to be worth indexing
+        :param texts: iterable of the texts of all the rows of a column
+        """
+        postings = {}
+        for row, text in enumerate(texts):
+            for token in set(_WORD_PATTERN.findall(text.lower())):
+                rows = postings.get(token)
+                if rows is None:
+                    if len(postings) >= MAX_INDEXED_TOKENS:
+                        return None
+                    postings[token] = rows = []
+                rows.append(row)
+        return cls({token: np.array(rows, dtype=np.int64) for token, rows in postings.items()})
+
+    def candidate_rows(self, needle):
+        """
+        Returns the sorted array of the rows whose cell may contain the literal text, or None if its words do not
+        narrow the search
+        :param needle: lower case text searched
+        """
+        words = list(_WORD_PATTERN.finditer(needle))
+        if not words:
+            return None
+
+        candidates = None
+        for word in words:
+            text = word.group()
+            at_start, at_end = word.start() == 0, word.end() == len(needle)
+            # A word cut by the start or the end of the text may be the end or the start of a longer word of a cell
+            if at_start and at_end:
+                tokens = [token for token in self.postings if text in token]
+            elif at_start:
+                tokens = [token for token in self.postings if token.endswith(text)]
+            elif at_end:
+                tokens = [token for token in self.postings if token.startswith(text)]
+            else:
+                tokens = [text] if text in self.postings else []
+            rows = np.unique(np.concatenate([self.postings[token] for token in tokens])) if tokens \
+                else np.empty(0, dtype=np.int64)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+
+        # The set is copied at once, the GUI thread may mark rows edited meanwhile
+        edited_rows = list(self.edited_rows)
+        if edited_rows:
+            candidates = np.union1d(candidates, np.array(edited_rows, dtype=np.int64))
+        return candidates
+
+
+class SearchIndex(object):
+    """
+    Token indices of the columns of a store, built on demand by the searches
+    The indices are keyed by column index, they must be dropped with clear() once the rows or columns of the store
+    are inserted or removed
+    The GUI thread marks the edits while a worker thread builds and reads the indices, the bookkeeping is guarded by a
+    lock which is not held while an index is built
+    """
+
+    def __init__(self):
+        # Index of every indexed column, None for the columns not worth indexing
+        self.indices = {}
+        # Rows edited while the index of a column is being built
+        self.building = {}
+        # Columns searched once without being indexed
+        self.searched_columns = set()
+        # Incremented by clear(), an index built from an older generation of the store is not kept
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.indices = {}
+            self.building = {}
+            self.searched_columns = set()
+            self.generation += 1
+
+    def mark_edited(self, row, column):
+        self.mark_rows_edited([row], column)
+
+    def mark_rows_edited(self, rows, column):
+        """
+        Same as mark_edited for many rows of a column
+        :param rows: list of row indices
+        """
+        with self._lock:
+            edited_rows = self.building.get(column)
+            if edited_rows is not None:
+                edited_rows.update(rows)
+            index = self.indices.get(column)
+            if index is None:
+                return
+            index.edited_rows.update(rows)
+            if len(index.edited_rows) > MAX_EDITED_ROWS:
+                del self.indices[column]
+
+    def column_index(self, store, column):
+        """
+        Returns the token index of a column, or None if the column is searched for the first time or is not worth
+        indexing, the index is built by the second search
+        Safe to call from a worker thread, the edits made while the index is built are marked on it
+        """
+        with self._lock:
+            if column in self.indices:
+                return self.indices[column]
+            if column not in self.searched_columns:
+                self.searched_columns.add(column)
+                return None
+
+            generation = self.generation
+            edited_rows = set()
+            self.building[column] = edited_rows
+
+        index = TokenIndex.build(store.column_texts([column])[0])
+
+        with self._lock:
+            # The store was cleared or another search started building the same index meanwhile
+            if generation != self.generation or self.building.get(column) is not edited_rows:
+                return None
+            del self.building[column]
+            if index is not None:
+                index.edited_rows = edited_rows
+            self.indices[column] = index
+        return index
+
+
+def find(store, query, columns, index=None, batch_size=SEARCH_BATCH_SIZE):
+    """
+    Searches the cells of a store batch by batch of rows
+    Yields a tuple of (number of rows searched so far, list of the hits of the batch as (row, column) tuples in reading
+    order) for every batch, and (0, []) once the index of every column is ready
+    The store may be edited while it is searched, a batch read while the version of a searched column changed is read
+    again so its hits come from a single version of the cells
+    :param store: ColumnStore or MappedCsvStore to search
+    :param query: SearchQuery
+    :param columns: list of the indices of the columns to search
+    :param index: optional SearchIndex used for the literal searches
+    :param batch_size: number of rows searched per batch
+    """
+    # Rows to check for every column narrowed by its index
+    candidates = {}
+    if index is not None and not query.regex:
+        for column in columns:
+            column_index = index.column_index(store, column)
+            rows = column_index.candidate_rows(query.text.lower()) if column_index is not None else None
+            if rows is not None:
+                candidates[column] = rows
+            yield 0, []
+    scanned_columns = [column for column in columns if column not in candidates]
+
+    row_count = store.row_count()
+    for start in range(0, row_count, batch_size):
+        stop = min(start + batch_size, row_count)
+        for _ in range(MAX_BATCH_READS):
+            versions = [store.column_version(column) for column in columns]
+            hits = _find_in_batch(store, query, scanned_columns, candidates, start, stop)
+            if [store.column_version(column) for column in columns] == versions:
+                break
+        yield stop, hits
+
+
+def _find_in_batch(store, query, scanned_columns, candidates, start, stop):
+    """
+    Returns the hits of a batch of rows in reading order, see find
+    """
+    hits = []
+    if scanned_columns:
+        texts = store.column_texts(scanned_columns, start, stop)
+        for column, column_texts in zip(scanned_columns, texts):
+            hits.extend((start + offset, column) for offset in query.matching_offsets(column_texts))
+    for column, rows in candidates.items():
+        batch_rows = rows[np.searchsorted(rows, start):np.searchsorted(rows, stop)].tolist()
+        hits.extend((row, column) for row in batch_rows if query.matches(store.value(row, column)))
+    hits.sort()
+    return hits
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+""" Selection
+
+Summary of a table selection computed from its rectangles instead of its individual cells.
+
+A selection of the whole table is a single rectangle, so counting its cells or finding the fully selected rows and
+columns must not enumerate the cells. The rectangles are swept band by band: the rows are split at every top and
+bottom edge into bands covered by the same rectangles, and the union of the column spans of those rectangles tells
+the number of selected cells of the band and whether its rows are fully selected. Sweeping the transposed
+rectangles gives the fully selected columns the same way. The cost only depends on the number of rectangles.
+
+This module does not depend on Qt.
+
+"""
+
+
+class SelectionSummary(object):
+    """
+    Cell count, fully selected rows and columns, and columns having any selected cell of a selection
+    The rows and columns are kept as lists of (first index, count) ranges in ascending order
+    """
+
+    def __init__(self, cell_count=0, row_ranges=None, column_ranges=None, intersected_column_ranges=None):
+        self.cell_count = cell_count
+        self.row_ranges = row_ranges or []
+        self.column_ranges = column_ranges or []
+        self.intersected_column_ranges = intersected_column_ranges or []
+
+    def columns(self):
+        """
+        Returns the list of the indices of the fully selected columns
+        """
+        return [column for first, count in self.column_ranges for column in range(first, first + count)]
+
+    def intersected_columns(self):
+        """
+        Returns the list of the indices of the columns having at least one selected cell
+        """
+        return [column for first, count in self.intersected_column_ranges for column in range(first, first + count)]
+
+    def row_count(self):
+        """
+        Returns the number of fully selected rows
+        """
+        return sum(count for _, count in self.row_ranges)
+
+
+def summarize(rectangles, row_count, column_count):
+    """
+    Summarizes a selection
+    :param rectangles: list of the selected rectangles as (top, left, bottom, right) tuples, the bounds are inclusive
+                       and the rectangles may overlap
+    :param row_count: number of rows of the table
+    :param column_count: number of columns of the table
+    """
+    cell_count, row_ranges = _sweep(rectangles, column_count)
+    _, column_ranges = _sweep([(left, top, right, bottom) for top, left, bottom, right in rectangles], row_count)
+    return SelectionSummary(cell_count, row_ranges, column_ranges,
+                            _merge_spans(sorted((left, right) for _, left, _, right in rectangles)))
+
+
+def _sweep(rectangles, width):
+    """
+    Sweeps the rectangles from top to bottom
+    Returns the number of covered cells and the ranges of the rows covered across the whole width
+    """
+    rectangles = sorted(rectangles)
+    edges = sorted({top for top, _, _, _ in rectangles} | {bottom + 1 for _, _, bottom, _ in rectangles})
+
+    cell_count = 0
+    full_ranges = []
+    active = []
+    next_rectangle = 0
+    for band_top, band_end in zip(edges[:-1], edges[1:]):
+        while next_rectangle < len(rectangles) and rectangles[next_rectangle][0] <= band_top:
+            active.append(rectangles[next_rectangle])
+            next_rectangle += 1
+        active = [rectangle for rectangle in active if rectangle[2] >= band_top]
+        if not active:
+            continue
+
+        covered = _union_length(sorted((left, right) for _, left, _, right in active))
+        cell_count += covered * (band_end - band_top)
+        if covered >= width:
+            if full_ranges and full_ranges[-1][0] + full_ranges[-1][1] == band_top:
+                full_ranges[-1] = (full_ranges[-1][0], band_end - full_ranges[-1][0])
+            else:
+                full_ranges.append((band_top, band_end - band_top))
+
+    return cell_count, full_ranges
+
+
+def _merge_spans(spans):
+    """
+    Merges sorted inclusive (first, last) spans into ranges of (first index, count)
+    """
+    ranges = []
+    for first, last in spans:
+        if ranges and first <= ranges[-1][0] + ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], last - ranges[-1][0] + 1)
+        else:
+            ranges.append([first, last - first + 1])
+    return [tuple(span_range) for span_range in ranges]
+
+
+def _union_length(spans):
+    """
+    Returns the number of indices covered by sorted inclusive (first, last) spans
+    """
+    length = 0
+    current_first, current_last = spans[0]
+    for first, last in spans[1:]:
+        if first > current_last + 1:
+            length += current_last - current_first + 1
+            current_first, current_last = first, last
+        else:
+            current_last = max(current_last, last)
+    return length + current_last - current_first + 1
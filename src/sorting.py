@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+""" Sorting
+
+Sort order of the rows of a column store by one or more columns.
+
+The rows are never moved, a sort produces a permutation index mapping every position of the view to a row of the
+store. Numeric columns are compared by value and the other columns by text. Every key is first turned into integer
+ranks (np.unique for numbers, the sorted distinct strings for text) and the ranks of all the keys are sorted at once
+by np.lexsort, which is stable so the rows with equal keys keep their order in the store. Blank cells come last
+whatever the direction.
+
+After a few rows are edited or added, the permutation is updated instead of being computed again: the other rows are
+still in order, so only the changed rows are taken out and put back at the position found by a binary search. The
+rows are compared on their keys and then on their index in the store, which gives the same order as a full sort.
+
+This module does not depend on Qt.
+
+"""
+import functools
+
+import numpy as np
+
+# Above this number of rows to place, sorting all the rows with NumPy is faster than binary searches in Python
+INCREMENTAL_LIMIT = 2000
+
+
+class SortKey(object):
+    """
+    Column of the store to sort by and direction of the sort
+    """
+
+    def __init__(self, column, ascending=True):
+        self.column = column
+        self.ascending = ascending
+
+    def __eq__(self, other):
+        return isinstance(other, SortKey) and (self.column, self.ascending) == (other.column, other.ascending)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'SortKey({}, {})'.format(self.column, self.ascending)
+
+
+class RowOrdering(object):
+    """
+    Order of the rows of a store for a list of sort keys, the first key being the most significant
+    The values of the keys are read when the ordering is created, it must be created again once the store changes
+    """
+
+    def __init__(self, store, keys):
+        """
+        :param store: ColumnStore or MappedCsvStore holding the rows
+        :param keys: list of SortKey
+        """
+        self.store = store
+        self.keys = keys
+        # For every key: (numeric values or None, null mask or None, ascending)
+        self._columns = []
+        for key in keys:
+            numeric = store.numeric_values(key.column)
+            if numeric is not None:
+                self._columns.append((numeric[0], numeric[1], key.ascending))
+            else:
+                self._columns.append((None, None, key.ascending))
+        # Whether every key is compared by value, a column turned into text changes the order of all its rows
+        self.numeric_keys = [values is not None for values, _, _ in self._columns]
+        self._ranks = None
+
+    def _key_codes(self, key_index):
+        """
+        Returns the integer codes of a key for all the rows, equal codes for equal values and blank cells last
+        """
+        values, nulls, ascending = self._columns[key_index]
+        if values is not None:
+            distinct, codes = np.unique(values, return_inverse=True)
+            distinct_count = len(distinct)
+        else:
+            strings = self.store.column_values(self.keys[key_index].column)
+            distinct = sorted(set(strings))
+            code_of = {string: code for code, string in enumerate(distinct)}
+            codes = np.fromiter((code_of[string] for string in strings), dtype=np.int64, count=len(strings))
+            nulls = codes == code_of.get('', -1)
+            distinct_count = len(distinct)
+
+        codes = codes.astype(np.int64).reshape(-1)
+        if not ascending:
+            codes = distinct_count - 1 - codes
+        codes[nulls] = distinct_count
+        return codes
+
+    def order(self):
+        """
+        Returns the permutation sorting all the rows, as an int64 array of row indices
+        """
+        if not self.keys:
+            return np.arange(self.store.row_count(), dtype=np.int64)
+        # np.lexsort sorts by the last array first
+        codes = [self._key_codes(key_index) for key_index in reversed(range(len(self.keys)))]
+        return np.lexsort(codes).astype(np.int64)
+
+    def _key_value(self, key_index, row):
+        """
+        Returns a tuple of (whether the cell is blank, value) for comparing a cell
+        """
+        values, nulls, _ = self._columns[key_index]
+        if values is not None:
+            return nulls[row], values[row]
+        text = self.store.value(row, self.keys[key_index].column)
+        return text == '', text
+
+    def compare(self, row, other_row):
+        """
+        Compares two rows, returns a negative number if row comes first, a positive number if other_row comes first
+        """
+        for key_index, (_, _, ascending) in enumerate(self._columns):
+            blank, value = self._key_value(key_index, row)
+            other_blank, other_value = self._key_value(key_index, other_row)
+            if blank or other_blank:
+                if blank != other_blank:
+                    return 1 if blank else -1
+                continue
+            if value != other_value:
+                return (-1 if value < other_value else 1) * (1 if ascending else -1)
+        return row - other_row
+
+    def _bisect(self, order, row):
+        """
+        Returns the index of the first row of order coming after row
+        """
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.compare(int(order[middle]), row) < 0:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def insertion_points(self, order, rows):
+        """
+        Finds where rows missing from a sorted permutation go
+        Returns a tuple of (insertion indices in order, rows) with the rows sorted, ready for np.insert
+        :param order: sorted permutation of the other rows
+        :param rows: list of the row indices to place
+        """
+        if len(rows) <= INCREMENTAL_LIMIT:
+            rows = sorted(rows, key=functools.cmp_to_key(self.compare))
+            return [self._bisect(order, row) for row in rows], rows
+
+        # The rank of every row in a full sort orders the new rows and the existing ones alike
+        if self._ranks is None:
+            full_order = self.order()
+            self._ranks = np.empty(len(full_order), dtype=np.int64)
+            self._ranks[full_order] = np.arange(len(full_order))
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[np.argsort(self._ranks[rows], kind='stable')]
+        return np.searchsorted(self._ranks[order], self._ranks[rows]), rows
+
+    def resort(self, order, rows):
+        """
+        Returns the permutation sorting all the rows, given a permutation where only the given rows may be out of order
+        :param order: permutation of all the rows
+        :param rows: list of the row indices which may be out of order
+        """
+        if len(rows) > INCREMENTAL_LIMIT:
+            return self.order()
+        kept = order[~np.isin(order, rows)]
+        points, rows = self.insertion_points(kept, list(rows))
+        return np.insert(kept, points, rows).astype(np.int64)
+
+
+def index_ranges(indices):
+    """
+    Splits sorted distinct indices into ranges of consecutive indices
+    Returns a list of (first index, count) tuples
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if len(indices) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [len(indices)]))
+    return [(int(indices[start]), int(stop - start)) for start, stop in zip(starts, stops)]
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+""" Store Cache
+
+On disk cache of the parsed csv files, so that reopening an unchanged file skips its parsing.
+
+Every cached file has one cache file named after the hash of its absolute path. The cache file records the size, the
+modification time and a hash of the first MiB of the csv file, and is only used while all three still match. It holds
+the detected format of the file and, for a file loaded in memory, its typed columns:
+    numeric columns     the values and the null mask arrays, and the rows and texts of the cells whose text differs
+                        from their formatted value
+    text columns        the UTF-8 bytes of all the cells concatenated, and the array of the offsets of the cells
+For a file opened in paged mode it holds the byte offset index of the records instead.
+
+The arrays are written one after the other, aligned for their dtype, followed by a JSON manifest describing them and
+the length of the manifest. On reopen the whole cache file is memory mapped copy on write and the arrays are views of
+the mapping, so reopening costs a few page faults whatever the size of the file: only the pages read are loaded, the
+edits of the numeric columns never reach the cache file, and the text of a cell is only decoded when it is read. A
+text column builds its list of strings once it is edited.
+
+The total size of the cache is capped, the least recently used cache files are evicted first. The last use of a cache
+file is its modification time, which is updated on every hit. Cache files are written to a temporary file which
+replaces the previous one once it is complete, like the csv files are saved.
+
+The cache is off unless it is enabled by environment variables:
+    CSV_EDITOR_CACHE=on                     enables the cache in a csv-editor directory of the user cache directory
+    CSV_EDITOR_CACHE=/path/to/directory     enables the cache in the given directory
+    CSV_EDITOR_CACHE_SIZE=1024              maximum size of the cache in MiB, 1 GiB by default
+
+This module does not depend on Qt.
+
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import csv_io
+import instrumentation
+from csv_store import ColumnStore, NumericColumn, TextColumn
+from paged_store import MappedCsvStore
+
+CACHE_VARIABLE = 'CSV_EDITOR_CACHE'
+CACHE_SIZE_VARIABLE = 'CSV_EDITOR_CACHE_SIZE'
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+# Files smaller than this are parsed about as fast as their cache file is read
+MIN_FILE_SIZE = 1024 * 1024
+
+# Number of bytes at the start of a file hashed to tell whether it has been rewritten
+HASHED_PREFIX_SIZE = 1024 * 1024
+
+# Bumped whenever the layout of the cache files changes, the cache files of other versions are ignored
+CACHE_VERSION = 2
+
+# Last bytes of every cache file, after the length of the manifest
+MAGIC = b'CSVCACHE'
+
+# Every array starts at a multiple of this, so the views of the mapping are aligned for any dtype
+ALIGNMENT = 64
+
+# Number of cells of a text column encoded at once when writing it
+TEXT_BATCH_SIZE = 65536
+
+# Temporary files left behind by an interrupted writing are removed once they are this old, in seconds
+STALE_TEMP_AGE = 3600
+
+_FOOTER = struct.Struct('<Q8s')
+
+
+class MappedTextColumn(TextColumn):
+    """
+    Text column whose cells are read from the mapped bytes of a cache file
+    The list of strings of the column is only built when it is accessed, ie. once the column is edited
+    """
+
+    def __init__(self, data, offsets):
+        """
+        :param data: uint8 array of the UTF-8 bytes of all the cells
+        :param offsets: int64 array of the offsets of the cells in data, followed by the length of data
+        """
+        super(MappedTextColumn, self).__init__()
+        self._data = data
+        self._offsets = offsets
+        self._values = None
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = self._decode(0, len(self._offsets) - 1)
+            # The mapping is not needed anymore
+            self._data = self._offsets = None
+        return self._values
+
+    @values.setter
+    def values(self, values):
+        self._values = values
+
+    def _decode(self, start, stop):
+        """
+        Decodes the text of a range of rows
+        """
+        offsets = self._offsets[start:stop + 1]
+        if len(offsets) < 2:
+            return []
+        first = int(offsets[0])
+        encoded = self._data[first:int(offsets[-1])].tobytes()
+        text = encoded.decode('utf-8', 'surrogatepass')
+        bounds = (offsets - first).tolist()
+        if len(text) != len(encoded):
+            # Some characters take several bytes, the byte offsets are not character offsets
+            return [encoded[bounds[index]:bounds[index + 1]].decode('utf-8', 'surrogatepass')
+                    for index in range(len(bounds) - 1)]
+        return [text[bounds[index]:bounds[index + 1]] for index in range(len(bounds) - 1)]
+
+    def __len__(self):
+        if self._values is None:
+            return len(self._offsets) - 1
+        return len(self._values)
+
+    def get(self, row):
+        if self._values is None:
+            return self._decode(row, row + 1)[0]
+        return self._values[row]
+
+    def texts(self, start=0, stop=None):
+        if self._values is None:
+            stop = len(self) if stop is None else min(stop, len(self))
+            return self._decode(start, stop)
+        return self._values[start:stop]
+
+    def texts_at(self, rows):
+        if self._values is None:
+            return [self._decode(row, row + 1)[0] for row in rows]
+        return super(MappedTextColumn, self).texts_at(rows)
+
+    def slice(self, start, stop):
+        return TextColumn(self.texts(start, stop))
+
+    def take(self, rows):
+        return TextColumn(self.texts_at(rows.tolist()))
+
+    def memory_size(self):
+        if self._values is None:
+            # Only the offsets of the cells live in memory, the bytes are paged in from the cache file
+            return self._offsets.nbytes
+        return super(MappedTextColumn, self).memory_size()
+
+
+def file_identity(csv_file_path):
+    """
+    Returns what tells whether a file has changed since it was cached, as a dictionary
+    """
+    status = os.stat(csv_file_path)
+    with open(csv_file_path, 'rb') as csv_file:
+        prefix_hash = hashlib.blake2b(csv_file.read(HASHED_PREFIX_SIZE), digest_size=16).hexdigest()
+    return {'size': status.st_size, 'mtime_ns': status.st_mtime_ns, 'prefix_hash': prefix_hash}
+
+
+def default_directory():
+    """
+    Returns the directory of the cache in the cache directory of the user
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'csv-editor')
+
+
+def default_cache():
+    """
+    Returns the cache set by the environment variables, None when the cache is not enabled
+    """
+    directory = os.environ.get(CACHE_VARIABLE, '')
+    if directory.lower() in ('', 'off'):
+        return None
+    if directory.lower() == 'on':
+        directory = default_directory()
+
+    max_size = DEFAULT_MAX_SIZE
+    if os.environ.get(CACHE_SIZE_VARIABLE):
+        try:
+            max_size = int(os.environ[CACHE_SIZE_VARIABLE]) * 1024 * 1024
+        except ValueError:
+            pass
+    return StoreCache(directory, max_size)
+
+
+class StoreCache(object):
+    """
+    Cache files of the parsed csv files in a directory, see the module docstring
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        """
+        :param directory: directory of the cache files, created when the first one is written
+        :param max_size: maximum total size of the cache files in bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        # Serializes the evictions of the writer threads
+        self._lock = threading.Lock()
+
+    def cache_path(self, csv_file_path):
+        """
+        Returns the path of the cache file of a csv file
+        """
+        key = hashlib.sha1(os.path.abspath(csv_file_path).encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(self.directory, key + '.cache')
+
+    def is_cacheable(self, identity):
+        """
+        Whether a file is worth caching
+        :param identity: identity of the file, see file_identity
+        """
+        return identity['size'] >= MIN_FILE_SIZE
+
+    def load(self, csv_file_path, identity):
+        """
+        Reads the store of a file back from its cache file
+        Returns a tuple of (ColumnStore or MappedCsvStore, csv_io.CsvFormat), or None when the file is not cached or
+        has changed since it was cached
+        :param identity: current identity of the file, see file_identity
+        """
+        cache_path = self.cache_path(csv_file_path)
+        with instrumentation.span('cache-read') as span:
+            try:
+                manifest, buffer = _read_cache_file(cache_path)
+            except (OSError, ValueError):
+                span.set(hit=False)
+                return None
+
+            if manifest.get('version') != CACHE_VERSION or manifest.get('identity') != identity:
+                span.set(hit=False)
+                return None
+
+            csv_format = csv_io.CsvFormat(**manifest['format'])
+            if manifest['kind'] == 'offsets':
+                store = MappedCsvStore(csv_file_path, delimiter=csv_format.delimiter, quotechar=csv_format.quotechar,
+                                       encoding=csv_format.encoding,
+                                       offsets=_array(buffer, manifest['offsets']),
+                                       column_count=manifest['column_count'])
+            else:
+                store = ColumnStore.from_columns(manifest['headers'],
+                                                 [_read_column(buffer, column) for column in manifest['columns']])
+            span.set(hit=True, kind=manifest['kind'])
+
+        # The modification time of the cache file is the time of its last use for the eviction
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return store, csv_format
+
+    def save_columns(self, csv_file_path, identity, csv_format, store, versions):
+        """
+        Writes the typed columns of a file loaded in memory to its cache file
+        The columns are copied on the calling thread while the store may be edited on another one, nothing is written
+        when the store is edited before they are copied, or when the file has changed since its identity was taken, ie.
+        while it was parsed
+        :param identity: identity of the file taken before it was parsed, see file_identity
+        :param csv_format: csv_io.CsvFormat of the file
+        :param store: ColumnStore holding the file
+        :param versions: list of the version stamps of the columns of the store taken once the file was loaded
+        """
+        with instrumentation.span('cache-snapshot', columns=len(versions)) as span:
+            headers = list(store.headers)
+            columns = [column.slice(0, len(column)) for column in list(store.columns)]
+            # Like a sequence lock, the copies are only consistent when no column changed since the stamps were taken
+            if [store.column_version(column) for column in range(store.column_count())] != versions or \
+                    list(store.headers) != headers:
+                span.set(skipped='edited')
+                return
+
+        def write_arrays(cache_file):
+            return {'kind': 'columns', 'headers': list(headers),
+                    'columns': [_write_column(cache_file, column) for column in columns]}
+
+        self._save(csv_file_path, identity, csv_format, write_arrays)
+
+    def save_offsets(self, csv_file_path, identity, csv_format, offsets, column_count):
+        """
+        Writes the record offset index of a file opened in paged mode to its cache file
+        :param identity: identity of the file taken before it was scanned, see file_identity
+        :param csv_format: csv_io.CsvFormat of the file
+        :param offsets: record offset index, see MappedCsvStore.record_offsets
+        :param column_count: number of fields of the widest record, see MappedCsvStore.source_column_count
+        """
+        def write_arrays(cache_file):
+            return {'kind': 'offsets', 'offsets': _write_array(cache_file, np.frombuffer(offsets, dtype=np.uint64)),
+                    'column_count': column_count}
+
+        self._save(csv_file_path, identity, csv_format, write_arrays)
+
+    def save_in_background(self, save, *arguments):
+        """
+        Runs one of the save methods in a new thread, the caller goes on while the cache file is written
+        Returns the thread
+        """
+        def run():
+            with instrumentation.thread_profile():
+                try:
+                    save(*arguments)
+                except (OSError, ValueError, IndexError):
+                    # A cache which can not be written only makes the next opening slower, the index and value errors
+                    # come from copying a store edited meanwhile
+                    pass
+
+        thread = threading.Thread(target=run, name='store-cache-writer', daemon=True)
+        thread.start()
+        return thread
+
+    def _save(self, csv_file_path, identity, csv_format, write_arrays):
+        """
+        Writes a cache file, then evicts the least recently used cache files over the size cap
+        :param write_arrays: function writing the arrays to the open cache file, returns the manifest describing them
+        """
+        with instrumentation.span('cache-write', file_size=identity['size']) as span:
+            if file_identity(csv_file_path) != identity:
+                span.set(skipped='changed')
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            cache_path = self.cache_path(csv_file_path)
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.', suffix='.tmp')
+            try:
+                with open(file_descriptor, 'wb') as cache_file:
+                    manifest = write_arrays(cache_file)
+                    manifest.update(version=CACHE_VERSION, source=os.path.abspath(csv_file_path), identity=identity,
+                                    format={'delimiter': csv_format.delimiter, 'quotechar': csv_format.quotechar,
+                                            'encoding': csv_format.encoding,
+                                            'compression': csv_format.compression})
+                    encoded = json.dumps(manifest).encode('utf-8')
+                    cache_file.write(encoded)
+                    cache_file.write(_FOOTER.pack(len(encoded), MAGIC))
+                    cache_size = cache_file.tell()
+
+                if cache_size > self.max_size:
+                    os.remove(temp_path)
+                    span.set(skipped='too large')
+                    return
+                os.replace(temp_path, cache_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            span.set(cache_size=cache_size)
+
+        self.evict(keep=cache_path)
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used cache files until the cache fits its size cap
+        :param keep: path of a cache file never removed, eg. the one just written
+        """
+        with self._lock:
+            entries = []
+            now = time.time()
+            for entry in os.scandir(self.directory):
+                try:
+                    status = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith('.tmp'):
+                    if now - status.st_mtime > STALE_TEMP_AGE:
+                        _remove(entry.path)
+                elif entry.name.endswith('.cache'):
+                    entries.append((status.st_mtime, status.st_size, entry.path))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                if path != keep and _remove(path):
+                    total_size -= size
+
+
+def _remove(path):
+    """
+    Removes a file, returns whether it has been removed
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        return False
+    return True
+
+
+def _write_array(cache_file, array):
+    """
+    Writes an array at the next aligned offset of the cache file
+    Returns the description of the array in the manifest
+    """
+    padding = -cache_file.tell() % ALIGNMENT
+    cache_file.write(b'\0' * padding)
+    array = np.ascontiguousarray(array)
+    description = {'offset': cache_file.tell(), 'dtype': array.dtype.str, 'length': len(array)}
+    cache_file.write(memoryview(array).cast('B'))
+    return description
+
+
+def _write_texts(cache_file, texts):
+    """
+    Writes a list of strings as their concatenated UTF-8 bytes and the offsets of every string
+    Returns the descriptions of the two arrays in the manifest
+    """
+    padding = -cache_file.tell() % ALIGNMENT
+    cache_file.write(b'\0' * padding)
+    start = cache_file.tell()
+
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    for batch_start in range(0, len(texts), TEXT_BATCH_SIZE):
+        encoded = [text.encode('utf-8', 'surrogatepass') for text in texts[batch_start:batch_start + TEXT_BATCH_SIZE]]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        offsets[batch_start + 1:batch_start + 1 + len(encoded)] = offsets[batch_start] + np.cumsum(lengths)
+        cache_file.write(b''.join(encoded))
+
+    data = {'offset': start, 'dtype': '|u1', 'length': int(offsets[-1])}
+    return data, _write_array(cache_file, offsets)
+
+
+def _write_column(cache_file, column):
+    """
+    Writes a column, returns its description in the manifest
+    """
+    if column.dtype is None:
+        data, offsets = _write_texts(cache_file, column.texts())
+        return {'dtype': None, 'data': data, 'offsets': offsets}
+
+    rows = sorted(column.texts_by_row)
+    text_data, text_offsets = _write_texts(cache_file, [column.texts_by_row[row] for row in rows])
+    return {'dtype': np.dtype(column.dtype).name, 'decimals': column.decimals,
+            'values': _write_array(cache_file, column.values), 'nulls': _write_array(cache_file, column.nulls),
+            'text_rows': _write_array(cache_file, np.array(rows, dtype=np.int64)),
+            'text_data': text_data, 'text_offsets': text_offsets}
+
+
+def _read_cache_file(cache_path):
+    """
+    Maps a cache file
+    Returns a tuple of (manifest, uint8 array of the copy on write mapping of the whole file)
+    :raises ValueError: if the file is not a complete cache file
+    """
+    buffer = np.memmap(cache_path, dtype=np.uint8, mode='c')
+    if len(buffer) < _FOOTER.size:
+        raise ValueError('Truncated cache file')
+    manifest_size, magic = _FOOTER.unpack(buffer[-_FOOTER.size:].tobytes())
+    if magic != MAGIC or manifest_size > len(buffer) - _FOOTER.size:
+        raise ValueError('Not a cache file')
+    manifest = json.loads(buffer[-_FOOTER.size - manifest_size:-_FOOTER.size].tobytes().decode('utf-8'))
+    return manifest, buffer
+
+
+def _array(buffer, description):
+    """
+    Returns the view of the mapping described in the manifest
+    """
+    dtype = np.dtype(description['dtype'])
+    start = description['offset']
+    return buffer[start:start + description['length'] * dtype.itemsize].view(dtype)
+
+
+def _read_column(buffer, description):
+    """
+    Returns the column object described in the manifest, its arrays being views of the mapping
+    """
+    if description['dtype'] is None:
+        return MappedTextColumn(_array(buffer, description['data']), _array(buffer, description['offsets']))
+
+    texts = MappedTextColumn(_array(buffer, description['text_data']), _array(buffer, description['text_offsets']))
+    texts_by_row = dict(zip(_array(buffer, description['text_rows']).tolist(), texts.texts()))
+    return NumericColumn(np.dtype(description['dtype']).type, _array(buffer, description['values']),
+                         _array(buffer, description['nulls']), texts_by_row, description['decimals'])
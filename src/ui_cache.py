@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+""" UI cache
+
+Loading of the Qt Designer .ui files of the editor without parsing them on every launch.
+
+A .ui file is compiled to a Python module by uic the first time it is loaded, and the module is kept in the cache
+directory of the user, where Python also keeps its byte code. The name of the module is derived from the path, size and
+modification time of the .ui file and the version of PyQt, so an edited file or an upgraded PyQt compiles a new module.
+The widgets built by the compiled module are set as attributes of the loaded widget like uic.loadUi does, and the .ui
+file is parsed by uic.loadUi whenever the cache can not be used.
+
+"""
+import hashlib
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+
+from PyQt5 import uic
+from PyQt5.QtCore import PYQT_VERSION_STR
+
+# Form classes of the .ui files loaded by this process, by path
+_form_classes = {}
+
+
+def cache_directory():
+    """
+    Returns the directory where the compiled .ui files are cached
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'gui-csv-editor', 'ui')
+
+
+def load_ui(ui_file_path, widget):
+    """
+    Builds the widgets described by a .ui file into widget, like uic.loadUi
+    :param ui_file_path: path of the .ui file
+    :param widget: instance of the top level class of the .ui file to set up
+    """
+    try:
+        form_class = compiled_form_class(ui_file_path)
+    except (OSError, SyntaxError, ImportError):
+        uic.loadUi(ui_file_path, widget)
+        return
+
+    form = form_class()
+    form.setupUi(widget)
+    # uic.loadUi makes every named object of the file an attribute of the widget, the compiled form keeps them
+    for name, value in vars(form).items():
+        setattr(widget, name, value)
+
+
+def compiled_form_class(ui_file_path):
+    """
+    Returns the form class generated by uic for a .ui file, compiling it first if it is not cached
+    :raises OSError: if the .ui file can not be read or the compiled module can not be written
+    """
+    ui_file_path = os.path.abspath(ui_file_path)
+    if ui_file_path in _form_classes:
+        return _form_classes[ui_file_path]
+
+    status = os.stat(ui_file_path)
+    key = '{}|{}|{}|{}'.format(ui_file_path, status.st_size, status.st_mtime_ns, PYQT_VERSION_STR)
+    module_name = '{}_ui_{}'.format(os.path.splitext(os.path.basename(ui_file_path))[0],
+                                    hashlib.sha1(key.encode('utf-8')).hexdigest()[:16])
+    directory = cache_directory()
+    module_path = os.path.join(directory, module_name + '.py')
+
+    if not os.path.exists(module_path):
+        # The pixmaps of the file are referred to by absolute paths, as the compiled module is not next to it
+        source = io.StringIO()
+        uic.compileUi(ui_file_path, source)
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.py.tmp')
+        try:
+            with io.open(file_descriptor, 'w', encoding='utf-8') as module_file:
+                module_file.write(source.getvalue())
+            # Another instance of the editor compiling the same file at the same time writes the same module
+            os.replace(temp_path, module_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    form_class = next(value for name, value in vars(module).items() if name.startswith('Ui_'))
+    _form_classes[ui_file_path] = form_class
+    return form_class
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+""" Column Visibility
+
+Visibility of the columns of the table, kept as one flag per column index.
+
+The columns are identified by their index and not by their header, so files with thousands of columns or with
+duplicate headers are handled the same way. The flags follow the columns inserted and removed in the table, and
+applying a new layout reports only the columns whose flag has changed so the view updates just those.
+
+This module does not depend on Qt.
+
+"""
+import numpy as np
+
+
+class ColumnVisibility(object):
+    """
+    Visibility flags of the columns of a table, all the columns are visible at first
+    """
+
+    def __init__(self, column_count=0):
+        self.flags = np.ones(column_count, dtype=bool)
+
+    def reset(self, column_count):
+        """
+        Makes all the columns of a table of column_count columns visible
+        """
+        self.flags = np.ones(column_count, dtype=bool)
+
+    def insert(self, position, count):
+        """
+        Inserts count visible columns before the given column index
+        """
+        self.flags = np.insert(self.flags, position, np.ones(count, dtype=bool))
+
+    def remove(self, position, count):
+        """
+        Removes the flags of count columns starting at the given column index
+        """
+        self.flags = np.delete(self.flags, np.s_[position:position + count])
+
+    def is_visible(self, column):
+        return bool(self.flags[column])
+
+    def visible_columns(self):
+        """
+        Returns the list of the indices of the visible columns in ascending order
+        """
+        return np.flatnonzero(self.flags).tolist()
+
+    def apply(self, flags):
+        """
+        Replaces the visibility of all the columns
+        Returns the list of the indices of the columns whose visibility has changed
+        :param flags: sequence of one boolean per column, True for the visible columns
+        """
+        flags = np.asarray(flags, dtype=bool)
+        changed = np.flatnonzero(flags != self.flags).tolist()
+        self.flags = flags.copy()
+        return changed
+
+
+def matching_columns(headers, text):
+    """
+    Returns the list of the indices of the columns whose header contains the text, ignoring the case
+    Every column matches an empty text
+    :param headers: list of the headers of the columns
+    :param text: text typed in the filter box
+    """
+    text = text.strip().lower()
+    if not text:
+        return list(range(len(headers)))
+    return [column for column, header in enumerate(headers) if text in header.lower()]
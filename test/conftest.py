@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+Makes the modules of src importable by the tests, the editor runs them from that directory
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the distinct count sketch and of the incrementally updated statistics of column_stats
+"""
+import numpy as np
+import pytest
+
+import column_stats
+from csv_store import ColumnStore
+
+# The texts hash differently in every process, four standard errors keep the bounds from being flaky
+TOLERANCE = 4
+
+
+@pytest.mark.parametrize('cardinality', [10, 1000, 50000, 1000000])
+def test_sketch_estimate_of_numbers_is_within_bounds(cardinality):
+    sketch = column_stats.HyperLogLog()
+    sketch.add(np.arange(cardinality, dtype=np.float64))
+    assert abs(sketch.estimate() - cardinality) <= TOLERANCE * sketch.relative_error() * cardinality
+
+
+def test_sketch_estimate_of_texts_is_within_bounds():
+    cardinality = 200000
+    sketch = column_stats.HyperLogLog()
+    sketch.add(['value {}'.format(number) for number in range(cardinality)])
+    assert abs(sketch.estimate() - cardinality) <= TOLERANCE * sketch.relative_error() * cardinality
+
+
+def test_sketch_ignores_duplicates():
+    sketch = column_stats.HyperLogLog()
+    sketch.add(np.arange(5000, dtype=np.float64))
+    registers = sketch.registers.copy()
+    sketch.add(np.arange(5000, dtype=np.float64))
+    sketch.add(np.array([-0.0, 0.0]))
+    assert np.array_equal(sketch.registers, registers)
+
+
+def test_sketch_precision_sets_the_error():
+    sketch = column_stats.HyperLogLog(precision=10)
+    assert len(sketch.registers) == 1024
+    assert sketch.relative_error() == pytest.approx(1.04 / 32)
+    assert sketch.estimate() == 0
+
+
+def test_numeric_column_statistics():
+    store = ColumnStore(['a'])
+    store.append_rows([['1'], ['2'], [''], ['4'], ['4']])
+    statistics = column_stats.ColumnStatistics.compute(store, 0)
+
+    assert (statistics.count, statistics.nulls) == (4, 1)
+    assert statistics.distinct_count() == (3, True)
+    assert (statistics.minimum, statistics.maximum) == (1.0, 4.0)
+    assert statistics.mean() == pytest.approx(2.75)
+    assert statistics.standard_deviation() == pytest.approx(np.std([1, 2, 4, 4], ddof=1))
+    assert statistics.top_values(1) == [(4.0, 2)]
+
+
+def test_many_distinct_values_are_sketched(monkeypatch):
+    monkeypatch.setattr(column_stats, 'EXACT_DISTINCT_LIMIT', 1000)
+    store = ColumnStore(['a'])
+    store.append_rows([['text {}'.format(number)] for number in range(20000)])
+    statistics = column_stats.ColumnStatistics.compute(store, 0)
+
+    distinct, exact = statistics.distinct_count()
+    assert not exact
+    assert abs(distinct - 20000) <= TOLERANCE * statistics.sketch.relative_error() * 20000
+
+
+def test_cache_follows_the_edits():
+    store = ColumnStore(['a'])
+    store.append_rows([[str(number)] for number in range(100)])
+    cache = column_stats.StatisticsCache()
+    cache.statistics(store, 0)
+
+    cache.cells_changing(store, [(0, 0), (99, 0)])
+    store.set_value(0, 0, '1000')
+    store.set_value(99, 0, '')
+    cache.cells_changed(store, [(0, 0), (99, 0)])
+
+    version = store.column_version(0)
+    rows, texts = store.clear_cells(np.arange(10, 20), 0)
+    cache.cells_cleared(store, 0, version, texts)
+
+    updated = cache.statistics(store, 0)
+    computed = column_stats.ColumnStatistics.compute(store, 0)
+    assert updated is cache.columns[0]
+    for name in ('count', 'nulls', 'minimum', 'maximum'):
+        assert getattr(updated, name) == getattr(computed, name)
+    assert updated.mean() == pytest.approx(computed.mean())
+    assert updated.standard_deviation() == pytest.approx(computed.standard_deviation())
+    assert updated.distinct_count() == computed.distinct_count()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the format detection of csv_io, a saved file must be read back with the format it was written in
+"""
+import itertools
+
+import pytest
+
+import csv_io
+
+HEADERS = ['id', 'name', 'note']
+ROWS = [[str(number), 'café {}'.format(number), 'a;b,c|d\t"quoted" it\'s\nsecond line' if number % 4 == 0 else '']
+        for number in range(200)]
+
+DIALECTS = [(',', '"'), (';', '"'), ('\t', "'"), ('|', '"')]
+ENCODINGS = ['utf-8', 'utf-8-sig', 'utf-16', 'cp1252']
+COMPRESSIONS = [None, 'gzip', 'bz2', 'xz', 'zip']
+EXTENSIONS = {None: '', 'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zip': '.zip'}
+
+
+def read_rows(path, csv_format):
+    headers, start = csv_io.read_header(path, csv_format.delimiter, csv_format.quotechar, csv_format.encoding,
+                                        csv_format.compression)
+    chunks = csv_io.iter_row_chunks(path, start, itertools.repeat(64), csv_format.delimiter, csv_format.quotechar,
+                                    csv_format.encoding, csv_format.compression)
+    return headers, [row for rows, _ in chunks for row in rows]
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+@pytest.mark.parametrize('encoding', ENCODINGS)
+@pytest.mark.parametrize('delimiter, quotechar', DIALECTS)
+def test_saved_file_round_trips(tmp_path, delimiter, quotechar, encoding, compression):
+    path = str(tmp_path / ('table.csv' + EXTENSIONS[compression]))
+    assert csv_io.compression_for_path(path) == compression
+    csv_io.write_csv(path, HEADERS, ROWS, delimiter, quotechar, encoding, compression)
+
+    csv_format = csv_io.detect_format(path)
+    assert (csv_format.delimiter, csv_format.quotechar, csv_format.compression) == (delimiter, quotechar, compression)
+    # The byte order mark of UTF-16 is written explicitly, it is detected as such
+    assert csv_format.encoding == encoding
+    assert read_rows(path, csv_format) == (HEADERS, ROWS)
+
+
+def test_encoding_is_detected_from_the_byte_order_mark():
+    assert csv_io.detect_encoding('a,b'.encode('utf-8-sig')) == 'utf-8-sig'
+    assert csv_io.detect_encoding('a,b'.encode('utf-16')) == 'utf-16'
+    assert csv_io.detect_encoding('a,b'.encode('utf-32')) == 'utf-32'
+
+
+def test_truncated_sample_keeps_utf_8():
+    sample = 'name,café\n'.encode('utf-8')
+    assert csv_io.detect_encoding(sample[:-2], complete=False) == 'utf-8'
+
+
+def test_invalid_bytes_after_the_sample_are_read_as_windows_1252(tmp_path):
+    path = str(tmp_path / 'mixed.csv')
+    with open(path, 'wb') as csv_file:
+        csv_file.write(b'a,b\n' + b'1,plain\n' * (csv_io.SAMPLE_SIZE // 8) + 'café,x'.encode('cp1252') + b'\n')
+
+    csv_format = csv_io.detect_format(path)
+    assert csv_format.encoding == 'utf-8'
+    headers, rows = read_rows(path, csv_format)
+    assert rows[-1] == ['café', 'x']
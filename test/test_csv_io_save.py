@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the atomic saving of csv_io.write_csv
+"""
+import os
+import stat
+
+import pytest
+
+import csv_io
+
+
+class Aborted(Exception):
+    pass
+
+
+def test_save_replaces_the_file_and_reports_progress(tmp_path):
+    path = str(tmp_path / 'table.csv')
+    progress = []
+    csv_io.write_csv(path, ['a', 'b'], ([str(number), 'x'] for number in range(25)), batch_size=10,
+                     progress_callback=progress.append)
+
+    assert progress == [10, 20, 25]
+    with open(path, newline='') as csv_file:
+        assert csv_file.read().splitlines()[:2] == ['a,b', '0,x']
+    assert os.listdir(str(tmp_path)) == ['table.csv']
+
+
+def test_aborted_save_leaves_the_file_untouched(tmp_path):
+    path = tmp_path / 'table.csv'
+    path.write_text('old contents\n')
+
+    def abort(rows_written):
+        raise Aborted()
+
+    with pytest.raises(Aborted):
+        csv_io.write_csv(str(path), ['a'], [['1']] * 100, batch_size=10, progress_callback=abort)
+
+    assert path.read_text() == 'old contents\n'
+    assert os.listdir(str(tmp_path)) == ['table.csv']
+
+
+def test_save_keeps_the_permissions_of_the_replaced_file(tmp_path):
+    path = tmp_path / 'table.csv'
+    path.write_text('old contents\n')
+    os.chmod(str(path), 0o640)
+
+    csv_io.write_csv(str(path), ['a'], [['1']])
+    assert stat.S_IMODE(os.stat(str(path)).st_mode) == 0o640
+
+
+def test_new_file_gets_the_default_permissions(tmp_path):
+    path = str(tmp_path / 'table.csv')
+    csv_io.write_csv(path, ['a'], [['1']])
+    # The umask of the process is read once when csv_io is imported
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~csv_io._UMASK
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the parallel parsing of csv_io, the shards must end on record boundaries whatever the quoted line breaks
+"""
+import csv
+import io
+import itertools
+
+import pytest
+
+import csv_io
+
+ROWS = [['id', 'text', 'value']] + [
+    [str(number), 'line\nbreak "{}"\r\nand, comma'.format(number) if number % 3 == 0 else 'plain {}'.format(number),
+     '' if number % 5 == 0 else str(number * 1.5)]
+    for number in range(400)]
+
+
+def write_rows(path, rows, line_terminator='\n'):
+    with open(str(path), 'w', encoding='utf-8', newline='') as csv_file:
+        csv.writer(csv_file, lineterminator=line_terminator).writerows(rows)
+
+
+def parse(path, parallel, shard_size=64):
+    headers, start = csv_io.read_header(str(path), ',', '"', 'utf-8')
+    if parallel:
+        chunks = csv_io.iter_parallel_chunks(str(path), start, itertools.repeat(50), ',', '"', 'utf-8',
+                                             max_workers=2, shard_size=shard_size)
+    else:
+        chunks = csv_io.iter_row_chunks(str(path), start, itertools.repeat(50), ',', '"', 'utf-8')
+    return [headers] + [row for rows, _ in chunks for row in rows]
+
+
+@pytest.mark.parametrize('line_terminator', ['\n', '\r\n'])
+def test_shards_split_on_record_boundaries(tmp_path, line_terminator):
+    path = tmp_path / 'quoted.csv'
+    write_rows(path, ROWS, line_terminator)
+
+    assert parse(path, parallel=True) == ROWS
+    assert parse(path, parallel=True) == parse(path, parallel=False)
+
+
+def test_shard_offsets_cover_the_file(tmp_path):
+    path = tmp_path / 'quoted.csv'
+    write_rows(path, ROWS)
+    data = path.read_bytes()
+    start = data.index(b'\n') + 1
+
+    boundaries = csv_io.shard_boundaries(str(path), data, start, 100, b',', b'"', _SerialExecutor())
+    assert boundaries[0] == start and boundaries[-1] == len(data)
+    records = [list(csv.reader(io.StringIO(data[begin:end].decode('utf-8'), newline='')))
+               for begin, end in zip(boundaries[:-1], boundaries[1:])]
+    assert [row for shard in records for row in shard] == ROWS[1:]
+
+
+def test_ambiguous_quoting_falls_back_to_serial_parsing(tmp_path):
+    path = tmp_path / 'ambiguous.csv'
+    # A quote in the middle of an unquoted field does not follow the doubled quote escaping
+    path.write_bytes(b'a,b\nx"y,z\n' + b''.join(b'%d,"quoted\n%d"\n' % (number, number) for number in range(100)))
+    headers, start = csv_io.read_header(str(path), ',', '"', 'utf-8')
+
+    with pytest.raises(csv_io.ShardingAmbiguous) as raised:
+        list(csv_io.iter_parallel_chunks(str(path), start, itertools.repeat(50), ',', '"', 'utf-8', max_workers=2,
+                                         shard_size=64))
+    assert raised.value.position == start
+
+    parsed = [row for chunk, _ in csv_io.iter_row_chunks(str(path), start, itertools.repeat(50), ',', '"', 'utf-8',
+                                                         parallel=True, max_workers=2) for row in chunk]
+    assert [headers] + parsed == list(csv.reader(io.open(str(path), encoding='utf-8', newline='')))
+
+
+class _SerialExecutor(object):
+    """
+    Runs the quote scans of shard_boundaries in the test process
+    """
+
+    def map(self, function, *iterables):
+        return map(function, *iterables)
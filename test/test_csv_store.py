@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the type inference and the promotion of the columns of csv_store.ColumnStore
+"""
+import numpy as np
+
+from csv_store import ColumnStore, make_column
+
+
+def make_store(headers, *chunks):
+    store = ColumnStore(headers)
+    for rows in chunks:
+        store.append_rows(rows)
+    return store
+
+
+def test_columns_are_typed_by_their_values():
+    store = make_store(['int', 'float', 'text'], [['1', '1.5', 'a'], ['2', '', 'b'], ['', '2.25', '']])
+
+    assert store.column_dtype(0) == np.int64
+    assert store.column_dtype(1) == np.float64
+    assert store.column_dtype(2) is None
+    values, nulls = store.numeric_values(0)
+    assert values[:2].tolist() == [1, 2]
+    assert nulls.tolist() == [False, False, True]
+    assert store.numeric_values(2) is None
+
+
+def test_numbers_keep_their_text():
+    column = make_column(['007', '1'])
+    assert column.dtype == np.int64
+    assert column.get(0) == '007'
+
+    column = make_column(['1.50', '2.0'])
+    assert column.dtype == np.float64
+    assert [column.get(0), column.get(1)] == ['1.50', '2.0']
+
+
+def test_edit_promotes_int_column_to_float():
+    store = make_store(['a'], [['1'], ['2']])
+    store.set_value(0, 0, '2.5')
+
+    assert store.column_dtype(0) == np.float64
+    assert store.column_values(0) == ['2.5', '2']
+
+
+def test_edit_with_text_converts_numeric_column_to_text():
+    store = make_store(['a'], [['1.5'], ['2']])
+    store.set_value(1, 0, 'abc')
+
+    assert store.column_dtype(0) is None
+    assert store.column_values(0) == ['1.5', 'abc']
+
+
+def test_later_chunks_promote_the_type():
+    store = make_store(['a'], [['1']] * 10, [['1.5']])
+    assert store.column_dtype(0) == np.float64
+    assert store.value(0, 0) == '1'
+
+    store.append_rows([['z']])
+    assert store.column_dtype(0) is None
+    assert store.value(10, 0) == '1.5'
+    assert store.row_count() == 12
+
+
+def test_promotion_keeps_the_ints_floats_cannot_hold():
+    store = make_store(['a'], [['9007199254740993'], ['1'], ['']], [['1.5']])
+
+    assert store.column_dtype(0) == np.float64
+    assert store.column_values(0) == ['9007199254740993', '1', '', '1.5']
+
+
+def test_leading_blank_chunks_do_not_fix_the_type():
+    store = make_store(['a', 'b'], [['', 'x']] * 600, [[str(number), 'y'] for number in range(1000)])
+
+    assert store.column_dtype(0) == np.int64
+    values, nulls = store.numeric_values(0)
+    assert nulls[:600].all() and not nulls[600:].any()
+    assert values[600:].tolist() == list(range(1000))
+    assert store.value(0, 0) == '' and store.value(1599, 0) == '999'
+
+
+def test_wider_rows_add_blank_columns():
+    store = make_store(['a'], [['1']], [['2', 'x']])
+
+    assert store.column_count() == 2
+    assert store.column_values(1) == ['', 'x']
+
+
+def test_clear_cells_returns_the_previous_texts():
+    store = make_store(['a'], [['1.50'], ['2'], ['']])
+    rows, texts = store.clear_cells(np.arange(3), 0)
+
+    assert rows.tolist() == [0, 1]
+    assert texts == ['1.50', '2']
+    assert store.column_values(0) == ['', '', '']
+    assert store.column_dtype(0) == np.float64
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the filter expressions of filtering and of the cache of their masks
+"""
+import pytest
+
+import filtering
+from csv_store import ColumnStore
+
+HEADERS = ['status', 'latency', 'Host Name']
+
+
+@pytest.fixture
+def store():
+    store = ColumnStore(HEADERS)
+    store.append_rows([['FAILED', '700', 'a'], ['OK', '100', 'b'], ['FAILED', '', 'c d'], ['ok', '550.5', '']])
+    return store
+
+
+def rows_matching(store, text, cache=None):
+    expression = filtering.parse(text, store.headers)
+    return expression.mask(store, cache or filtering.MaskCache()).nonzero()[0].tolist()
+
+
+@pytest.mark.parametrize('text, rows', [
+    ('status == "FAILED" and latency > 500', [0]),
+    ('status == FAILED or latency<200', [0, 1, 2]),
+    ('latency >= 550.5', [0, 3]),
+    ('not (latency >= 550)', [1, 2]),
+    ('`Host Name` contains C', [2]),
+    ('"Host Name" == \'c d\'', [2]),
+    ('STATUS != ok', [0, 1, 2]),
+    ('latency == ""', [2]),
+    ('latency != 100', [0, 2, 3]),
+    ('status == FAILED and (latency > 600 or latency == "")', [0, 2]),
+])
+def test_filter_matches(store, text, rows):
+    assert rows_matching(store, text) == rows
+
+
+def test_ordering_a_text_column_against_a_number_compares_the_numbers():
+    store = ColumnStore(['mixed'])
+    store.append_rows([['5'], ['x'], ['12'], ['']])
+    assert rows_matching(store, 'mixed > 6') == [2]
+
+
+def test_blank_filter_is_none():
+    assert filtering.parse('  ', HEADERS) is None
+
+
+@pytest.mark.parametrize('text', ['status ==', 'nope == 1', 'status == 1 )', '(status == 1', 'status ~ 1',
+                                  '== 1'])
+def test_invalid_filters_raise(text):
+    with pytest.raises(filtering.FilterSyntaxError):
+        filtering.parse(text, HEADERS)
+
+
+def test_edit_only_invalidates_the_masks_of_its_column(store):
+    cache = filtering.MaskCache()
+    assert rows_matching(store, 'status == OK and latency < 200', cache) == [1]
+    status_mask = cache.mask(store, filtering.Comparison(0, '==', 'OK'))
+    latency_mask = cache.mask(store, filtering.Comparison(1, '<', '200'))
+
+    store.set_value(3, 1, '150')
+    assert cache.mask(store, filtering.Comparison(0, '==', 'OK')) is status_mask
+    assert cache.mask(store, filtering.Comparison(1, '<', '200')) is not latency_mask
+    assert rows_matching(store, 'latency < 200', cache) == [1, 3]
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the undo and redo history of journal, applied to a column store through the table interface of the journal
+"""
+import numpy as np
+
+import journal
+from csv_store import ColumnStore
+
+
+class StoreTable(object):
+    """
+    Table interface of the journal over a column store, what the table model of the editor does without the view
+    """
+
+    def __init__(self, rows):
+        self.store = ColumnStore(['a', 'b'])
+        self.store.append_rows(rows)
+
+    def contents(self):
+        return [self.store.headers] + [self.store.row(row) for row in range(self.store.row_count())]
+
+    def set_cell(self, row, column, value):
+        self.store.set_value(row, column, value)
+
+    def set_cells(self, cells):
+        for row, column, value in cells:
+            self.store.set_value(row, column, value)
+
+    def clear_column_cells(self, column, rows):
+        return self.store.clear_cells(rows, column)
+
+    def remove_row_range(self, position, count):
+        return self.store.remove_rows(position, count)
+
+    def restore_rows(self, position, removed):
+        self.store.restore_rows(position, removed)
+
+    def remove_row_set(self, rows):
+        return self.store.remove_row_set(rows)
+
+    def restore_row_set(self, rows, removed):
+        self.store.restore_row_set(rows, removed)
+
+    def remove_column_range(self, position, count):
+        return [self.store.remove_column(position) for _ in range(count)]
+
+    def restore_columns(self, position, removed):
+        for offset, column in enumerate(removed):
+            self.store.restore_column(position + offset, column)
+
+
+def make_table():
+    return StoreTable([[str(number), 'text {}'.format(number)] for number in range(10)])
+
+
+def test_undo_and_redo_restore_every_edit():
+    table = make_table()
+    history = journal.Journal()
+    states = [table.contents()]
+
+    table.set_cell(0, 1, 'edited')
+    history.record(journal.CellEdit(0, 1, 'text 0', 'edited'))
+    states.append(table.contents())
+
+    rows = np.array([1, 4, 5])
+    history.record(journal.RowSetRemoved(rows, table.remove_row_set(rows)))
+    states.append(table.contents())
+
+    history.record(journal.RowsRemoved(0, 2, table.remove_row_range(0, 2)))
+    states.append(table.contents())
+
+    history.record(journal.ColumnsRemoved(0, table.remove_column_range(0, 1)))
+    states.append(table.contents())
+
+    cleared_rows, values = table.clear_column_cells(0, np.arange(3))
+    history.record(journal.ColumnCellsCleared(0, cleared_rows, values))
+    states.append(table.contents())
+
+    for state in reversed(states[:-1]):
+        assert history.undo(table)
+        assert table.contents() == state
+    assert not history.undo(table)
+
+    for state in states[1:]:
+        assert history.redo(table)
+        assert table.contents() == state
+    assert not history.redo(table)
+
+
+def test_group_is_undone_as_one_step():
+    table = make_table()
+    history = journal.Journal()
+    original = table.contents()
+
+    with history.group():
+        table.set_cell(0, 0, '5.5')
+        history.record(journal.CellEdit(0, 0, '0', '5.5'))
+        with history.group():
+            history.record(journal.RowsRemoved(2, 3, table.remove_row_range(2, 3)))
+
+    assert history.undo(table)
+    assert table.contents() == original
+    assert not history.can_undo()
+
+
+def test_recording_drops_the_redo_history():
+    table = make_table()
+    history = journal.Journal()
+    table.set_cell(0, 0, 'x')
+    history.record(journal.CellEdit(0, 0, '0', 'x'))
+    history.undo(table)
+    assert history.can_redo()
+
+    table.set_cell(1, 0, 'y')
+    history.record(journal.CellEdit(1, 0, '1', 'y'))
+    assert not history.can_redo()
+
+
+def test_oldest_commands_are_evicted_over_the_size_cap():
+    history = journal.Journal(max_size=3 * journal.COMMAND_OVERHEAD + 100)
+    for number in range(10):
+        history.record(journal.CellEdit(number, 0, 'old', 'new'))
+        assert history.size() <= history.max_size
+
+    table = make_table()
+    undone = 0
+    while history.undo(table):
+        undone += 1
+    assert undone == 3
+    assert table.store.column_values(0)[7:] == ['old'] * 3
+
+
+def test_command_larger_than_the_cap_is_not_kept():
+    history = journal.Journal(max_size=journal.COMMAND_OVERHEAD)
+    history.record(journal.CellEdit(0, 0, 'x' * 100, 'y'))
+    assert not history.can_undo()
+    assert history.size() == 0
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the record offset index and the piece table of paged_store.MappedCsvStore
+"""
+import csv
+import io
+
+import numpy as np
+import pytest
+
+from paged_store import MappedCsvStore
+
+TEXT = ('id,text\r\n1,plain\n2,"quoted\r\nbreak"\r3,"with ""quotes"", and\nbreak"\n4,é\r\n5,"\n"\r\n'
+        '6,"last, unterminated\n"')
+
+
+def expected_rows(text):
+    return list(csv.reader(io.StringIO(text, newline='')))
+
+
+@pytest.mark.parametrize('scan_block_size', [1, 2, 3, 7, 64, 4 * 1024 * 1024])
+def test_records_match_the_csv_reader(tmp_path, monkeypatch, scan_block_size):
+    path = tmp_path / 'table.csv'
+    path.write_bytes(TEXT.encode('utf-8'))
+    monkeypatch.setattr(MappedCsvStore, 'scan_block_size', scan_block_size)
+
+    store = MappedCsvStore(str(path), encoding='utf-8')
+    try:
+        rows = expected_rows(TEXT)
+        assert store.headers == rows[0]
+        assert [store.row(row) for row in range(store.row_count())] == rows[1:]
+        assert store.record_offsets[-1] == len(TEXT.encode('utf-8'))
+    finally:
+        store.close()
+
+
+def test_multi_byte_quote_straddling_the_blocks(tmp_path, monkeypatch):
+    text = 'a,b\n1,«x\ny«\n2,z\n'
+    path = tmp_path / 'table.csv'
+    path.write_bytes(text.encode('utf-8'))
+    monkeypatch.setattr(MappedCsvStore, 'scan_block_size', 7)
+
+    store = MappedCsvStore(str(path), quotechar='«', encoding='utf-8')
+    try:
+        assert store.row_count() == 2
+        assert store.row(1) == ['2', 'z']
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize('scan_block_size', [1, 5, 64])
+def test_records_wider_than_the_header_add_blank_columns(tmp_path, monkeypatch, scan_block_size):
+    text = 'a,b\n1,2,3\n4,"5,6"\n7,8,9,"10\n"'
+    path = tmp_path / 'table.csv'
+    path.write_bytes(text.encode('utf-8'))
+    monkeypatch.setattr(MappedCsvStore, 'scan_block_size', scan_block_size)
+
+    store = MappedCsvStore(str(path), encoding='utf-8')
+    try:
+        assert store.headers == ['a', 'b', '', '']
+        assert list(store.iter_rows()) == [['1', '2', '3', ''], ['4', '5,6', '', ''], ['7', '8', '9', '10\n']]
+    finally:
+        store.close()
+
+def test_aborted_scan_releases_the_file(tmp_path, monkeypatch):
+    path = tmp_path / 'table.csv'
+    path.write_bytes(b'a,b\n' + b'1,x\n' * 1000)
+    monkeypatch.setattr(MappedCsvStore, 'scan_block_size', 64)
+
+    def abort(position):
+        if position > 128:
+            raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        MappedCsvStore(str(path), progress_callback=abort)
+    path.unlink()
+
+
+def test_row_set_removal_across_split_runs(tmp_path):
+    path = tmp_path / 'table.csv'
+    path.write_bytes(b'n\n' + b''.join(b'%d\n' % number for number in range(100)))
+    store = MappedCsvStore(str(path), encoding='utf-8')
+    try:
+        # Rows inserted and removed beforehand leave several runs in the piece table
+        store.insert_rows(30, 5, 'new')
+        store.remove_rows(60, 10)
+        before = [store.value(row, 0) for row in range(store.row_count())]
+
+        rows = np.array([0, 1, 2, 29, 30, 31, 33, 34, 35, 59, 60, 61] + list(range(70, 95, 2)))
+        removed = store.remove_row_set(rows)
+        expected = [value for row, value in enumerate(before) if row not in set(rows.tolist())]
+        assert [store.value(row, 0) for row in range(store.row_count())] == expected
+
+        store.restore_row_set(rows, removed)
+        assert [store.value(row, 0) for row in range(store.row_count())] == before
+    finally:
+        store.close()
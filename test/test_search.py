@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the token indices of search.SearchIndex built while the store is edited
+"""
+from csv_store import ColumnStore
+from search import SearchIndex
+
+
+class EditedWhileIndexed(ColumnStore):
+    """
+    Store running an edit on the GUI side while the texts of a column are read to build its index
+    """
+
+    def __init__(self, headers, rows, edit):
+        super(EditedWhileIndexed, self).__init__(headers)
+        self.append_rows(rows)
+        self.edit = edit
+
+    def column_texts(self, columns, start=0, stop=None):
+        texts = super(EditedWhileIndexed, self).column_texts(columns, start, stop)
+        self.edit()
+        return texts
+
+
+def test_index_is_built_by_the_second_search():
+    store = ColumnStore(['a'])
+    store.append_rows([['red apple'], ['green pear'], ['red pear']])
+    index = SearchIndex()
+
+    assert index.column_index(store, 0) is None
+    assert index.column_index(store, 0).candidate_rows('pear').tolist() == [1, 2]
+
+
+def test_edits_made_while_the_index_is_built_are_candidates():
+    index = SearchIndex()
+    store = EditedWhileIndexed(['a'], [['red apple'], ['green pear']], lambda: index.mark_edited(0, 0))
+
+    index.column_index(store, 0)
+    assert index.column_index(store, 0).candidate_rows('pear').tolist() == [0, 1]
+
+
+def test_index_built_while_the_store_is_cleared_is_dropped():
+    index = SearchIndex()
+    store = EditedWhileIndexed(['a'], [['red apple'], ['green pear']], index.clear)
+
+    index.column_index(store, 0)
+    assert index.column_index(store, 0) is None
+    assert index.building == {} and index.indices == {}
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the cache files of store_cache, a cache file must only be used while its csv file is unchanged
+"""
+import itertools
+import os
+
+import numpy as np
+import pytest
+
+import csv_io
+import store_cache
+from csv_store import ColumnStore
+from paged_store import MappedCsvStore
+
+ROWS = [[str(number), '{:.2f}'.format(number / 3), 'name é {}'.format(number), '' if number % 7 else 'x']
+        for number in range(500)]
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / 'table.csv')
+    csv_io.write_csv(path, ['id', 'ratio', 'name', 'flag'], ROWS, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return store_cache.StoreCache(str(tmp_path / 'cache'))
+
+
+def load_store(csv_path):
+    csv_format = csv_io.detect_format(csv_path)
+    headers, start = csv_io.read_header(csv_path, csv_format.delimiter, csv_format.quotechar, csv_format.encoding)
+    store = ColumnStore(headers)
+    for chunk, _ in csv_io.iter_row_chunks(csv_path, start, itertools.repeat(100), csv_format.delimiter,
+                                           csv_format.quotechar, csv_format.encoding):
+        store.append_rows(chunk)
+    return store, csv_format
+
+
+def save_store(cache, csv_path):
+    identity = store_cache.file_identity(csv_path)
+    store, csv_format = load_store(csv_path)
+    versions = [store.column_version(column) for column in range(store.column_count())]
+    cache.save_columns(csv_path, identity, csv_format, store, versions)
+    return store
+
+
+def contents(store):
+    return [store.headers] + [store.row(row) for row in range(store.row_count())]
+
+
+def test_unchanged_file_is_read_back(cache, csv_path):
+    store = save_store(cache, csv_path)
+    store_format = csv_io.detect_format(csv_path)
+
+    cached = cache.load(csv_path, store_cache.file_identity(csv_path))
+    assert cached is not None
+    cached_store, csv_format = cached
+    assert contents(cached_store) == contents(store)
+    assert [cached_store.column_dtype(column) for column in range(4)] == \
+        [store.column_dtype(column) for column in range(4)]
+    assert vars(csv_format) == vars(store_format)
+
+
+def test_edits_of_the_cached_store_do_not_reach_the_cache_file(cache, csv_path):
+    save_store(cache, csv_path)
+    identity = store_cache.file_identity(csv_path)
+    store, _ = cache.load(csv_path, identity)
+    store.set_value(0, 0, '99')
+    store.set_value(0, 2, 'edited')
+
+    reloaded, _ = cache.load(csv_path, identity)
+    assert reloaded.row(0) == ROWS[0]
+
+
+def test_grown_file_is_not_read_back(cache, csv_path):
+    save_store(cache, csv_path)
+    with open(csv_path, 'a') as csv_file:
+        csv_file.write('500,1.00,more,\n')
+    assert cache.load(csv_path, store_cache.file_identity(csv_path)) is None
+
+
+def test_touched_file_is_not_read_back(cache, csv_path):
+    save_store(cache, csv_path)
+    status = os.stat(csv_path)
+    os.utime(csv_path, ns=(status.st_atime_ns, status.st_mtime_ns + 10 ** 9))
+    assert cache.load(csv_path, store_cache.file_identity(csv_path)) is None
+
+
+def test_rewritten_file_with_same_size_and_time_is_not_read_back(cache, csv_path):
+    save_store(cache, csv_path)
+    status = os.stat(csv_path)
+    with open(csv_path, 'r+b') as csv_file:
+        csv_file.seek(status.st_size // 2)
+        byte = csv_file.read(1)
+        csv_file.seek(status.st_size // 2)
+        csv_file.write(b'9' if byte != b'9' else b'8')
+    os.utime(csv_path, ns=(status.st_atime_ns, status.st_mtime_ns))
+
+    identity = store_cache.file_identity(csv_path)
+    assert (identity['size'], identity['mtime_ns']) == (status.st_size, status.st_mtime_ns)
+    assert cache.load(csv_path, identity) is None
+
+
+def test_cache_file_of_another_version_is_ignored(cache, csv_path, monkeypatch):
+    save_store(cache, csv_path)
+    monkeypatch.setattr(store_cache, 'CACHE_VERSION', store_cache.CACHE_VERSION + 1)
+    assert cache.load(csv_path, store_cache.file_identity(csv_path)) is None
+
+
+def test_truncated_cache_file_is_ignored(cache, csv_path):
+    save_store(cache, csv_path)
+    cache_path = cache.cache_path(csv_path)
+    with open(cache_path, 'r+b') as cache_file:
+        cache_file.truncate(os.path.getsize(cache_path) // 2)
+    assert cache.load(csv_path, store_cache.file_identity(csv_path)) is None
+
+
+def test_file_changed_while_parsed_is_not_cached(cache, csv_path):
+    identity = store_cache.file_identity(csv_path)
+    store, csv_format = load_store(csv_path)
+    with open(csv_path, 'a') as csv_file:
+        csv_file.write('500,1.00,more,\n')
+
+    cache.save_columns(csv_path, identity, csv_format, store,
+                       [store.column_version(column) for column in range(store.column_count())])
+    assert not os.path.exists(cache.cache_path(csv_path))
+
+
+def test_store_edited_before_it_is_copied_is_not_cached(cache, csv_path):
+    identity = store_cache.file_identity(csv_path)
+    store, csv_format = load_store(csv_path)
+    versions = [store.column_version(column) for column in range(store.column_count())]
+    store.set_value(0, 2, 'edited')
+
+    cache.save_columns(csv_path, identity, csv_format, store, versions)
+    assert not os.path.exists(cache.cache_path(csv_path))
+
+
+def test_offsets_of_a_paged_file_are_read_back(cache, csv_path):
+    identity = store_cache.file_identity(csv_path)
+    paged = MappedCsvStore(csv_path, encoding='utf-8')
+    cache.save_offsets(csv_path, identity, csv_io.detect_format(csv_path), paged.record_offsets,
+                       paged.source_column_count)
+
+    cached, _ = cache.load(csv_path, identity)
+    try:
+        assert isinstance(cached, MappedCsvStore)
+        assert np.array_equal(np.asarray(cached.record_offsets), np.asarray(paged.record_offsets))
+        assert contents(cached) == contents(paged)
+    finally:
+        cached.close()
+        paged.close()
+
+
+def test_least_recently_used_cache_files_are_evicted(tmp_path):
+    cache = store_cache.StoreCache(str(tmp_path / 'cache'))
+    paths = []
+    for number in range(3):
+        path = str(tmp_path / 'table{}.csv'.format(number))
+        csv_io.write_csv(path, ['id', 'ratio', 'name', 'flag'], ROWS, encoding='utf-8')
+        save_store(cache, path)
+        # Order the last uses explicitly, the cache files may be written within the resolution of the clock
+        os.utime(cache.cache_path(path), (number, number))
+        paths.append(path)
+
+    cache.max_size = 2 * os.path.getsize(cache.cache_path(paths[0]))
+    cache.evict()
+    assert [os.path.exists(cache.cache_path(path)) for path in paths] == [False, True, True]
+
+
+def test_cache_is_off_unless_enabled(tmp_path, monkeypatch):
+    monkeypatch.delenv(store_cache.CACHE_VARIABLE, raising=False)
+    assert store_cache.default_cache() is None
+    monkeypatch.setenv(store_cache.CACHE_VARIABLE, 'off')
+    assert store_cache.default_cache() is None
+
+    monkeypatch.setenv(store_cache.CACHE_VARIABLE, str(tmp_path))
+    monkeypatch.setenv(store_cache.CACHE_SIZE_VARIABLE, '10')
+    cache = store_cache.default_cache()
+    assert (cache.directory, cache.max_size) == (str(tmp_path), 10 * 1024 * 1024)
+
+    monkeypatch.setenv(store_cache.CACHE_VARIABLE, 'on')
+    monkeypatch.delenv(store_cache.CACHE_SIZE_VARIABLE)
+    cache = store_cache.default_cache()
+    assert (cache.directory, cache.max_size) == (store_cache.default_directory(), store_cache.DEFAULT_MAX_SIZE)